@@ -1,56 +1,86 @@
 from flask import Flask, render_template, jsonify, request
 import psutil
 import json
-import joblib
 import numpy as np
-import pandas as pd
 from datetime import datetime
 import os
 import time
 import random
 import threading
+from collections import deque
 
 # Import new modules
 import database
-from sniffer import PacketSniffer
+from log_writer import TrafficLogWriter
+import detector
+from detector import predict_traffic, make_log_entry, get_tier_stats, get_model_stats, verdict_cache, DetectionLoop
+import records
+from inference_pool import PoolBusyError
 
 app = Flask(__name__)
 
-# Load trained model
-try:
-    model = joblib.load('models/fl_ids_model.pkl')
-    scaler = joblib.load('models/scaler.pkl')
-    feature_names = joblib.load('models/feature_names.pkl')
-    
-    # Load DL Models
-    import tensorflow as tf
-    cnn_model = tf.keras.models.load_model('models/cnn_ids_model.h5')
-    lstm_model = tf.keras.models.load_model('models/lstm_ids_model.h5')
-    scaler_dl = joblib.load('models/scaler_dl.pkl')
-    
-    print("✅ All Models (RF, CNN, LSTM) loaded successfully!")
-except Exception as e:
-    print(f"⚠️  Error loading models: {e}")
-    model = None
-    scaler = None
-    feature_names = None
-    cnn_model = None
-    lstm_model = None
-    scaler_dl = None
-
 # Global variables
 attack_detected = False
 system_metrics_before = {'cpu': [], 'memory': [], 'network': []}
 system_metrics_after = {'cpu': [], 'memory': [], 'network': []}
 
-# Initialize Sniffer
-packet_sniffer = PacketSniffer()
+# Captured traffic is scored in micro-batches in the background; the dashboard shows the latest verdicts
+recent_detections = deque(maxlen=100)
+
+def handle_detections(batch, predictions):
+    global attack_detected
+    for traffic, prediction in zip(batch, predictions):
+        log_entry = make_log_entry(traffic, prediction)
+        if prediction.get('is_malicious', False):
+            attack_detected = True
+            database.block_ip(traffic['src_ip'], reason=f"Detected {prediction['prediction']}")
+            log_entry['blocked'] = True
+        database.log_traffic(log_entry)
+        recent_detections.append(log_entry)
+
+# Sniffer, detection loop and database are set up on first request (or in __main__), not at import,
+# so importing this module (workers, tests, tools) stays cheap
+packet_sniffer = None
+detection_loop = None
+inference_pool = None
+log_writer = None
+# IDS_INFERENCE_WORKERS=N scores in N worker processes (inference_pool.py) instead of in this process
+INFERENCE_WORKERS = int(os.environ.get('IDS_INFERENCE_WORKERS', '0'))
+_services_lock = threading.Lock()
+startup_ms = {}
 
-# Initialize Database
-try:
-    database.init_db()
-except Exception as e:
-    print(f"⚠️ Database Init Error: {e}")
+def init_services():
+    """Prepares the database, starts the traffic log writer and creates the sniffer and detection loop (once)."""
+    global packet_sniffer, detection_loop, log_writer
+    if packet_sniffer is not None:
+        return
+    with _services_lock:
+        if packet_sniffer is not None:
+            return
+
+        start = time.perf_counter()
+        try:
+            database.init_db()
+        except Exception as e:
+            print(f"⚠️ Database Init Error: {e}")
+        startup_ms['database'] = round((time.perf_counter() - start) * 1000, 1)
+
+        # Traffic logs are inserted in batches in the background; detection only queues them
+        log_writer = TrafficLogWriter()
+        log_writer.start()
+        database.use_log_writer(log_writer)
+
+        start = time.perf_counter()
+        from sniffer import PacketSniffer  # Imports scapy
+        sniffer = PacketSniffer()
+        detection_loop = DetectionLoop(sniffer, handle_detections, batch_size=256, max_wait_ms=20,
+                                       threads=max(1, INFERENCE_WORKERS))
+        packet_sniffer = sniffer
+        startup_ms['sniffer'] = round((time.perf_counter() - start) * 1000, 1)
+
+@app.before_request
+def ensure_services():
+    init_services()
 
 def get_system_metrics():
     cpu_percent = psutil.cpu_percent(interval=0.1)
@@ -129,111 +159,6 @@ def simulate_network_traffic():
     
     return traffic, is_malicious
 
-def predict_traffic(traffic_data):
-    if model is None or scaler is None:
-        return {'prediction': 'unknown', 'confidence': 0}
-    
-    try:
-        # 1. Prepare Features for Random Forest
-        features = []
-        for fname in feature_names:
-            if fname in traffic_data:
-                val = traffic_data[fname]
-                if isinstance(val, str):
-                    val = hash(val) % 100
-                features.append(val)
-            else:
-                features.append(0)
-        
-        features_array = np.array(features).reshape(1, -1)
-        features_scaled = scaler.transform(features_array)
-        
-        # 2. Random Forest Prediction
-        rf_prediction = model.predict(features_scaled)[0]
-        rf_probs = model.predict_proba(features_scaled)[0]
-        rf_confidence = float(max(rf_probs))
-        
-        # 3. Deep Learning Prediction (CNN & LSTM)
-        # Reshape for DL (1, 1, features)
-        if scaler_dl:
-             dl_features_scaled = scaler_dl.transform(features_array)
-             dl_input = dl_features_scaled.reshape((1, 1, dl_features_scaled.shape[1]))
-             
-             cnn_probs = cnn_model.predict(dl_input, verbose=0)[0]
-             lstm_probs = lstm_model.predict(dl_input, verbose=0)[0]
-             
-             # Ensemble DL probabilities (Average)
-             dl_probs = (cnn_probs + lstm_probs) / 2
-             dl_confidence = float(max(dl_probs))
-             dl_prediction = np.argmax(dl_probs)
-        else:
-             dl_confidence = 0
-             dl_prediction = rf_prediction # Fallback
-        
-        # 4. RQA Analysis (Get metrics from traffic_data)
-        rqa_det = traffic_data.get('rqa_det', 0)
-        rqa_rr = traffic_data.get('rqa_rr', 0)
-        
-        # 5. Decision-Level Fusion Logic
-        threat_types = ['Normal', 'DoS', 'Probe', 'R2L', 'U2R', 'Unknown']
-        
-        # Map numeric predictions to labels
-        rf_label = threat_types[min(rf_prediction, len(threat_types)-1)]
-        dl_label = threat_types[min(dl_prediction, len(threat_types)-1)]
-        
-        is_malicious = False
-        final_prediction = "Normal"
-        fusion_score = 0
-        threat_level = 'Low'
-        
-        # Logic:
-        # If RQA DET > 90%, it's a high confidence anomaly (likely Bot/DDoS)
-        if rqa_det > 90:
-            is_malicious = True
-            final_prediction = "Anomaly (RQA)"
-            fusion_score = 0.95
-            threat_level = 'Critical'
-        
-        # Else, trust the ML models
-        elif rf_label != 'Normal' or dl_label != 'Normal':
-            is_malicious = True
-            # If both agree
-            if rf_label == dl_label:
-                final_prediction = rf_label
-                fusion_score = (rf_confidence + dl_confidence) / 2
-            else:
-                # Trust the one with higher confidence
-                if rf_confidence > dl_confidence:
-                    final_prediction = rf_label
-                    fusion_score = rf_confidence
-                else:
-                    final_prediction = dl_label
-                    fusion_score = dl_confidence
-            
-            threat_level = 'High' if fusion_score > 0.8 else 'Medium'
-            
-        else:
-            # All Normal
-            is_malicious = False
-            final_prediction = "Normal"
-            fusion_score = (rf_confidence + dl_confidence) / 2
-            threat_level = 'Low'
-
-        return {
-            'prediction': final_prediction,
-            'is_malicious': is_malicious,
-            'confidence': fusion_score,
-            'threat_level': threat_level,
-            'details': {
-                'rf_label': rf_label,
-                'dl_label': dl_label,
-                'rqa_det': rqa_det
-            }
-        }
-    except Exception as e:
-        print(f"Prediction error: {e}")
-        return {'prediction': 'error', 'confidence': 0, 'is_malicious': False}
-
 @app.route('/')
 def index():
     return render_template('dashboard.html')
@@ -288,48 +213,44 @@ def system_metrics():
 def traffic_monitor():
     global attack_detected
     
-    # 1. Try to get real packet
-    traffic = packet_sniffer.get_packet()
+    # 1. Try to get the latest verdict on real traffic (scored by the detection loop)
     is_simulated = False
-    
+    try:
+        log_entry = recent_detections.popleft()
+    except IndexError:
+        log_entry = None
+
     # 2. If no real packet, simulate
-    if not traffic:
+    if log_entry is None:
         traffic, _ = simulate_network_traffic()
         is_simulated = True
-        
+
         # Update RQA with simulated packet length
         packet_sniffer.rqa.add_data_point(traffic['src_bytes'])
         rqa_metrics = packet_sniffer.rqa.calculate_rqa()
         traffic['rqa_rr'] = rqa_metrics['rr']
         traffic['rqa_det'] = rqa_metrics['det']
-    
-    # 3. Predict
-    prediction = predict_traffic(traffic)
-    
-    # 4. Prepare Log Entry
-    log_entry = {
-        'timestamp': traffic['timestamp'],
-        'src_ip': traffic['src_ip'],
-        'dst_ip': traffic['dst_ip'],
-        'protocol': traffic.get('protocol_type', 'unknown'),
-        'service': traffic.get('service', 'unknown'),
-        'prediction': prediction['prediction'],
-        'confidence': prediction['confidence'],
-        'threat_level': prediction.get('threat_level', 'Low'),
-        'blocked': False,
-        'rqa_rr': traffic.get('rqa_rr', 0),
-        'rqa_det': traffic.get('rqa_det', 0)
-    }
-    
-    # 5. Handle Malicious Traffic
-    if prediction.get('is_malicious', False):
-        attack_detected = True
-        database.block_ip(traffic['src_ip'], reason=f"Detected {prediction['prediction']}")
-        log_entry['blocked'] = True
-    
-    # 6. Log to Database
-    database.log_traffic(log_entry)
-    
+        traffic = records.from_dict(traffic)
+
+        # 3. Predict
+        try:
+            prediction = predict_traffic(traffic)
+        except (PoolBusyError, TimeoutError) as e:
+            # Saturated inference workers: report it rather than log an 'error' verdict
+            return jsonify({'status': 'busy', 'message': str(e)}), 503
+
+        # 4. Prepare Log Entry
+        log_entry = make_log_entry(traffic, prediction)
+
+        # 5. Handle Malicious Traffic
+        if prediction.get('is_malicious', False):
+            attack_detected = True
+            database.block_ip(traffic['src_ip'], reason=f"Detected {prediction['prediction']}")
+            log_entry['blocked'] = True
+
+        # 6. Log to Database
+        database.log_traffic(log_entry)
+
     # 7. Fetch recent logs for UI
     recent_logs = database.get_recent_logs(limit=10)
     blocked_count = database.get_stats()['blocked_count']
@@ -356,7 +277,16 @@ def statistics():
         'blocked_ips': stats['blocked_count'],
         'detection_rate': detection_rate,
         'threat_distribution': stats['threat_distribution'],
-        'blocked_ip_list': database.get_blocked_ips()[:10]
+        'blocked_ip_list': database.get_blocked_ips(limit=10),
+        'capture_queue': packet_sniffer.packet_queue.get_stats(),
+        'detection': detection_loop.get_stats(),
+        'inference_tiers': get_tier_stats(),
+        'verdict_cache': verdict_cache.get_stats(),
+        'models': get_model_stats(),
+        'inference_pool': inference_pool.get_stats() if inference_pool else None,
+        'database': database.get_db_stats(),
+        'log_writer': log_writer.get_stats() if log_writer else None,
+        'startup_ms': startup_ms
     })
 
 @app.route('/api/generate-report')
@@ -390,6 +320,21 @@ def generate_report():
     
     return jsonify({'report': report, 'saved_to': report_file})
 
+@app.route('/api/models')
+def model_status():
+    return jsonify(get_model_stats())
+
+@app.route('/api/models/reload', methods=['POST'])
+def reload_models():
+    # Loads and warms up in the background; detection keeps using the current version until the swap
+    version = (request.get_json(silent=True) or {}).get('version')
+    try:
+        detector.resolve_version(version)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 404
+    detector.reload_models(version)
+    return jsonify({'status': 'reloading', 'version': version, 'serving': detector.models.version}), 202
+
 @app.route('/api/reset')
 def reset_system():
     global attack_detected, system_metrics_before, system_metrics_after
@@ -405,10 +350,39 @@ def reset_system():
 if __name__ == '__main__':
     print("🚀 Starting Cybersecurity IDS Dashboard (Major Project Edition)...")
     
+    # Models load lazily on first use unless IDS_EAGER_MODELS=1 (then loaded and warmed up before serving)
+    detector.load_models()
+    if INFERENCE_WORKERS > 0:
+        from inference_pool import InferencePool
+        inference_pool = InferencePool(workers=INFERENCE_WORKERS, max_rows=256)
+        inference_pool.start()
+        detector.use_inference_pool(inference_pool)
+    init_services()
+    # Publishing/activating a model version (python model_registry.py publish) swaps it in without a restart
+    model_watcher = detector.ModelWatcher(interval=5.0)
+    model_watcher.start()
+    # Hourly: create upcoming daily traffic_logs partitions, drop those past IDS_LOG_RETENTION_DAYS
+    retention_job = database.PeriodicJob(database.maintain_partitions, interval=3600.0)
+    retention_job.start()
+    # Statistics counters are saved every 10 s (and on shutdown) so a restart resumes from them
+    stats_job = database.PeriodicJob(database.persist_stats, interval=10.0)
+    stats_job.start()
+
     # Start Sniffer
     packet_sniffer.start()
+    detection_loop.start()
     
     try:
         app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=False) # use_reloader=False to prevent double sniffer threads
     finally:
-        packet_sniffer.stop()
\ No newline at end of file
+        model_watcher.stop()
+        retention_job.stop()
+        stats_job.stop()
+        packet_sniffer.stop(drain=detection_loop.drain)
+        detection_loop.stop()
+        if inference_pool:
+            inference_pool.stop()
+        # Write out the buffered traffic logs
+        database.use_log_writer(None)
+        log_writer.stop()
+        database.persist_stats()
\ No newline at end of file
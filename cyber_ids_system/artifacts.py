@@ -0,0 +1,87 @@
+import json
+import os
+
+import numpy as np
+
+# Model artifacts as directories of raw .npy arrays (plus meta.json). Loading memory-maps them
+# read-only, so every worker process on a host shares one physical copy through the page cache.
+
+def save_arrays(directory, arrays, meta=None):
+    """Writes each array to <directory>/<name>.npy and meta (JSON-serialisable) to meta.json."""
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+    if meta is not None:
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+def load_arrays(directory, mmap_mode='r'):
+    """
+    Maps every .npy file of a directory written by save_arrays.
+    :param mmap_mode: 'r' (shared, read-only) or None to read private copies.
+    :return: (arrays, meta) with arrays keyed by file name.
+    """
+    arrays = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith('.npy'):
+            arrays[filename[:-4]] = np.load(os.path.join(directory, filename), mmap_mode=mmap_mode,
+                                            allow_pickle=False)
+    meta = None
+    if os.path.exists(os.path.join(directory, 'meta.json')):
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+    return arrays, meta
+
+class ArrayScaler:
+    def __init__(self, mean, scale):
+        """StandardScaler.transform from its fitted mean_/scale_ arrays (no sklearn import needed)."""
+        self.mean_ = mean
+        self.scale_ = scale
+
+    @classmethod
+    def from_sklearn(cls, scaler):
+        return cls(scaler.mean_, scaler.scale_)
+
+    def transform(self, X):
+        # Same operations and order as sklearn, so results are bit-identical
+        X = np.array(X, dtype=np.float64)
+        X -= self.mean_
+        X /= self.scale_
+        return X
+
+    def save(self, directory):
+        save_arrays(directory, {'mean': self.mean_, 'scale': self.scale_})
+
+    @classmethod
+    def load(cls, directory):
+        arrays, _ = load_arrays(directory)
+        return cls(arrays['mean'], arrays['scale'])
+
+def export_artifacts(models_dir='models'):
+    """
+    Converts the pickled RF/scalers and the .npz CNN/LSTM exports in models_dir into
+    memory-mappable directories (e.g. models/fl_ids_model/). Needs sklearn; loading them does not.
+    """
+    import joblib
+    from forest import FlatForest
+    from nn_runtime import NumpyModel
+
+    exported = []
+    if os.path.exists(os.path.join(models_dir, 'fl_ids_model.pkl')):
+        FlatForest.from_sklearn(joblib.load(os.path.join(models_dir, 'fl_ids_model.pkl'))).save(
+            os.path.join(models_dir, 'fl_ids_model'))
+        exported.append('fl_ids_model')
+    for name in ('scaler', 'scaler_dl'):
+        if os.path.exists(os.path.join(models_dir, f"{name}.pkl")):
+            ArrayScaler.from_sklearn(joblib.load(os.path.join(models_dir, f"{name}.pkl"))).save(
+                os.path.join(models_dir, name))
+            exported.append(name)
+    for name in ('cnn_ids_model', 'lstm_ids_model'):
+        if os.path.exists(os.path.join(models_dir, f"{name}.npz")):
+            NumpyModel(os.path.join(models_dir, f"{name}.npz")).save(os.path.join(models_dir, name))
+            exported.append(name)
+    return exported
+
+if __name__ == "__main__":
+    for name in export_artifacts():
+        print(f"✅ Exported models/{name}/")
@@ -0,0 +1,758 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from rqa import RQAAnalyzer, batch_rqa, sliding_windows
+
+def _packet_lengths(count, seed=42):
+    """Generates a reproducible stream of packet lengths with some repetition."""
+    rng = random.Random(seed)
+    common = [60, 64, 576, 1500]
+    return [rng.choice(common) if rng.random() < 0.5 else rng.randint(40, 1500) for _ in range(count)]
+
+def bench_rqa(window_sizes=(50, 200, 1000), packets=5000, epsilon=100):
+    """Measures packets/sec of RQAAnalyzer (add + calculate per packet) in both modes."""
+    print("=" * 60)
+    print("RQA Benchmark (add_data_point + calculate_rqa per packet)")
+    print("=" * 60)
+    print(f"{'window':>8} | {'full pkt/s':>12} | {'incremental pkt/s':>18} | {'speedup':>8} | match")
+    print("-" * 60)
+
+    for window in window_sizes:
+        # The full path rebuilds the O(window^2) recurrence matrix (vectorized batch_rqa) on every packet,
+        # so it gets a shorter stream
+        full_packets = max(window + 50, min(packets, 200000 // window))
+        lengths = _packet_lengths(max(packets, full_packets))
+
+        full = RQAAnalyzer(window_size=window, epsilon=epsilon, incremental=False)
+        start = time.perf_counter()
+        full_results = []
+        for value in lengths[:full_packets]:
+            full.add_data_point(value)
+            full_results.append(full.calculate_rqa())
+        full_rate = full_packets / (time.perf_counter() - start)
+
+        inc = RQAAnalyzer(window_size=window, epsilon=epsilon)
+        start = time.perf_counter()
+        inc_results = []
+        for value in lengths[:packets]:
+            inc.add_data_point(value)
+            inc_results.append(inc.calculate_rqa())
+        inc_rate = packets / (time.perf_counter() - start)
+
+        match = inc_results[:full_packets] == full_results
+        print(f"{window:>8} | {full_rate:>12,.0f} | {inc_rate:>18,.0f} | {inc_rate / full_rate:>7.1f}x | {match}")
+
+def bench_rqa_batch(num_windows=2000, window=50, epsilon=100):
+    """Compares scoring windows one call at a time against a single batch_rqa call."""
+    print("=" * 60)
+    print(f"Batch RQA Benchmark ({num_windows} windows of {window} points)")
+    print("=" * 60)
+
+    windows = sliding_windows(_packet_lengths(num_windows + window - 1), window)
+
+    start = time.perf_counter()
+    single = [batch_rqa(row[None, :], epsilon)['det'][0] for row in windows]
+    single_rate = num_windows / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    metrics = batch_rqa(windows, epsilon)
+    batch_rate = num_windows / (time.perf_counter() - start)
+
+    match = np.array_equal(metrics['det'], np.array(single))
+    print(f"   - One by one: {single_rate:,.0f} windows/s")
+    print(f"   - batch_rqa:  {batch_rate:,.0f} windows/s (RR, DET, LAM, Lmax, ENTR)")
+    print(f"   - DET match:  {match}")
+
+def _synthetic_frames(count, seed=42):
+    """Builds a reproducible mix of raw Ethernet frames (TCP handshakes/data, UDP DNS, ICMP)."""
+    from scapy.all import Ether, IP, IPv6, TCP, UDP, ICMP, raw
+
+    rng = random.Random(seed)
+    frames = []
+    for i in range(count):
+        src = f"10.0.{rng.randint(0, 3)}.{rng.randint(1, 254)}"
+        dst = f"192.168.1.{rng.randint(1, 20)}"
+        kind = rng.random()
+        if kind < 0.6:
+            layer = IP(src=src, dst=dst) / TCP(sport=rng.randint(1024, 65535), dport=rng.choice([80, 443, 22, 8080]),
+                                               flags=rng.choice(['S', 'SA', 'A', 'PA', 'FA', 'R']))
+        elif kind < 0.85:
+            layer = IP(src=src, dst=dst) / UDP(sport=rng.randint(1024, 65535), dport=53)
+        elif kind < 0.95:
+            layer = IP(src=src, dst=dst) / ICMP()
+        else:
+            layer = IPv6(src="fd00::1", dst="fd00::2") / TCP(sport=40000, dport=443, flags='A')
+        frames.append(raw(Ether(src="02:00:00:00:00:01", dst="02:00:00:00:00:02") / layer / (b'x' * rng.randint(0, 1200))))
+    return frames
+
+def _measure(func, items):
+    """
+    Calls func on every item.
+    :return: (items/sec, CPU% of one core needed to sustain 1,000 items/sec)
+    """
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for item in items:
+        func(item)
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+    return len(items) / wall, cpu / len(items) * 1000 * 100
+
+def bench_capture(packets=20000):
+    """Compares scapy dissection against the struct-based header parser."""
+    from scapy.all import Ether
+    from capture import parse_frame, LINKTYPE_ETHERNET
+    from sniffer import PacketSniffer
+
+    print("=" * 60)
+    print(f"Capture Parser Benchmark ({packets} synthetic frames)")
+    print("=" * 60)
+
+    frames = _synthetic_frames(packets)
+
+    scapy_rate, scapy_cpu = _measure(Ether, frames)
+    fast_rate, fast_cpu = _measure(parse_frame, frames)
+    print(f"   - Parse only, scapy:   {scapy_rate:>10,.0f} pkt/s  (CPU at 1k pkt/s: {scapy_cpu:.1f}%)")
+    print(f"   - Parse only, struct:  {fast_rate:>10,.0f} pkt/s  (CPU at 1k pkt/s: {fast_cpu:.1f}%)")
+
+    # Full path: parse + RQA + flow assembly + feature records
+    sniffer = PacketSniffer()
+    sniffer.is_running = True
+    def scapy_path(frame):
+        packet = Ether(frame)
+        packet.time = time.time()
+        sniffer._process_packet(packet)
+    scapy_rate, scapy_cpu = _measure(scapy_path, frames)
+
+    sniffer = PacketSniffer(backend='raw')
+    sniffer.is_running = True
+    fast_rate, fast_cpu = _measure(lambda frame: sniffer._process_frame(time.time(), frame, LINKTYPE_ETHERNET), frames)
+    print(f"   - Pipeline, scapy:     {scapy_rate:>10,.0f} pkt/s  (CPU at 1k pkt/s: {scapy_cpu:.1f}%)")
+    print(f"   - Pipeline, struct:    {fast_rate:>10,.0f} pkt/s  (CPU at 1k pkt/s: {fast_cpu:.1f}%)")
+    print(f"   - Speedup:             {fast_rate / scapy_rate:.1f}x")
+
+def bench_sharding(packets=20000, max_workers=None, score=False):
+    """Measures end-to-end packets/sec of the sharded pipeline for 1, 2, 4, ... workers."""
+    import os
+    from capture import LINKTYPE_ETHERNET
+    from sharded_pipeline import ShardedPipeline
+
+    max_workers = max_workers or os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+
+    print("=" * 60)
+    print(f"Sharded Pipeline Scaling ({packets} frames, scoring={'on' if score else 'off'}, "
+          f"{os.cpu_count()} CPUs)")
+    print("=" * 60)
+    print(f"{'workers':>8} | {'pkt/s':>10} | {'speedup':>8} | {'efficiency':>10}")
+    print("-" * 60)
+
+    frames = _synthetic_frames(packets)
+    baseline = None
+    for workers in counts:
+        pipeline = ShardedPipeline(num_workers=workers, log_to_db=False, score=score)
+        pipeline.start()
+        start = time.perf_counter()
+        for i, frame in enumerate(frames):
+            pipeline.submit(i * 0.001, frame, LINKTYPE_ETHERNET)
+        pipeline.stop()
+        rate = packets / (time.perf_counter() - start)
+
+        baseline = baseline or rate
+        print(f"{workers:>8} | {rate:>10,.0f} | {rate / baseline:>7.2f}x | {rate / baseline / workers:>9.0%}")
+
+def _feature_rows(rows, seed=42):
+    """
+    Synthetic (rows, 41) record rows spread around the training distribution of the scaler,
+    with categorical columns holding ids of real KDD values.
+    """
+    import detector
+    from records import FEATURE_INDEX, category_id
+    from feature_encoder import KDD_VOCABULARY
+
+    rng = np.random.default_rng(seed)
+    scaler = detector.models.get('scaler')
+    std = np.where(scaler.scale_ == 1.0, 0.0, scaler.scale_)  # scale_ is 1 for constant columns
+    spread = std * rng.choice([0.1, 1.0, 3.0], size=(rows, 1))
+    features = np.abs(scaler.mean_ + rng.standard_normal((rows, len(scaler.mean_))) * spread)
+    for name, values in KDD_VOCABULARY.items():
+        ids = np.array([category_id(name, value) for value in values])
+        features[:, FEATURE_INDEX[name]] = rng.choice(ids, rows)
+    return features
+
+def bench_predict(batch_sizes=(1, 32, 256, 4096), rows=8192):
+    """Measures rows/sec of detector.predict_batch (RF + CNN + LSTM + fusion) per batch size."""
+    import detector
+
+    print("=" * 60)
+    print("Batched Inference Benchmark (predict_batch, verdict cache off)")
+    print("=" * 60)
+    print(f"{'batch':>8} | {'rows':>8} | {'rows/s':>10} | {'ms/batch':>10}")
+    print("-" * 60)
+
+    features = _feature_rows(rows)
+    rqa_det = np.zeros(rows)
+    # Cache off: the rows repeat across runs, so cached verdicts would hide the model cost
+    detector.predict_batch(features[:max(batch_sizes)], rqa_det[:max(batch_sizes)], use_cache=False)  # Warm-up
+
+    for batch in batch_sizes:
+        # Small batches are dominated by fixed per-call cost, so they get fewer rows
+        count = min(rows, max(64, batch * 8))
+        start = time.perf_counter()
+        for offset in range(0, count, batch):
+            detector.predict_batch(features[offset:offset + batch], rqa_det[offset:offset + batch], use_cache=False)
+        elapsed = time.perf_counter() - start
+        print(f"{batch:>8} | {count:>8} | {count / elapsed:>10,.0f} | {elapsed / (count / batch) * 1000:>10.2f}")
+
+def bench_forest(batch_sizes=(1, 32, 256, 4096), rows=8192):
+    """Compares sklearn predict + predict_proba against the flattened forest (one traversal)."""
+    import warnings
+    import joblib
+    import detector
+    from forest import FlatForest
+
+    warnings.filterwarnings('ignore', message="X does not have valid feature names")
+    print("=" * 60)
+    print("Random Forest Benchmark (sklearn vs FlatForest)")
+    print("=" * 60)
+
+    model = joblib.load('models/fl_ids_model.pkl')
+    start = time.perf_counter()
+    forest = FlatForest.from_sklearn(model)
+    print(f"   - Compile: {(time.perf_counter() - start) * 1000:.1f} ms, {len(forest.feature):,} nodes")
+
+    features = detector.models.get('scaler').transform(detector.models.get('rf_encoder').encode(_feature_rows(rows)))
+    labels, proba = forest.predict_with_proba(features)
+    identical = (np.array_equal(proba, model.predict_proba(features))
+                 and np.array_equal(labels, model.predict(features)))
+    print(f"   - Identical to sklearn on {rows:,} rows: {identical}")
+    print(f"{'batch':>8} | {'sklearn us':>11} | {'flat us':>9} | {'sklearn rows/s':>14} | {'flat rows/s':>11}")
+    print("-" * 60)
+
+    for batch in batch_sizes:
+        calls = max(1, 2000 // batch)
+        chunk = features[:batch]
+        start = time.perf_counter()
+        for _ in range(calls):
+            model.predict(chunk)
+            model.predict_proba(chunk)
+        sklearn_time = (time.perf_counter() - start) / calls
+        start = time.perf_counter()
+        for _ in range(calls):
+            forest.predict_with_proba(chunk)
+        flat_time = (time.perf_counter() - start) / calls
+        print(f"{batch:>8} | {sklearn_time * 1e6:>11,.0f} | {flat_time * 1e6:>9,.0f} | "
+              f"{batch / sklearn_time:>14,.0f} | {batch / flat_time:>11,.0f}")
+
+# Prototypical KDD'99 connections (feature values typical of each kind in the training data),
+# for benchmarks that need rows the models recognise; held-out KDD rows need the dataset download
+KDD_PROTOTYPES = {
+    'normal http': {'protocol_type': 'tcp', 'service': 'http', 'flag': 'SF', 'src_bytes': 230, 'dst_bytes': 2000,
+                    'logged_in': 1, 'count': 8, 'srv_count': 8, 'same_srv_rate': 1, 'dst_host_count': 255,
+                    'dst_host_srv_count': 255, 'dst_host_same_srv_rate': 1, 'dst_host_same_src_port_rate': 0.01},
+    'normal smtp': {'protocol_type': 'tcp', 'service': 'smtp', 'flag': 'SF', 'src_bytes': 1200, 'dst_bytes': 330,
+                    'logged_in': 1, 'count': 1, 'srv_count': 1, 'same_srv_rate': 1, 'dst_host_count': 100,
+                    'dst_host_srv_count': 120, 'dst_host_same_srv_rate': 0.5, 'dst_host_diff_srv_rate': 0.02},
+    'normal dns': {'protocol_type': 'udp', 'service': 'domain_u', 'flag': 'SF', 'src_bytes': 44, 'dst_bytes': 80,
+                   'count': 2, 'srv_count': 2, 'same_srv_rate': 1, 'dst_host_count': 255, 'dst_host_srv_count': 250,
+                   'dst_host_same_srv_rate': 0.98, 'dst_host_diff_srv_rate': 0.01},
+    'smurf': {'protocol_type': 'icmp', 'service': 'ecr_i', 'flag': 'SF', 'src_bytes': 1032, 'count': 511,
+              'srv_count': 511, 'same_srv_rate': 1, 'dst_host_count': 255, 'dst_host_srv_count': 255,
+              'dst_host_same_srv_rate': 1, 'dst_host_same_src_port_rate': 1},
+    'neptune': {'protocol_type': 'tcp', 'service': 'private', 'flag': 'S0', 'count': 120, 'srv_count': 10,
+                'serror_rate': 1, 'srv_serror_rate': 1, 'same_srv_rate': 0.08, 'diff_srv_rate': 0.06,
+                'dst_host_count': 255, 'dst_host_srv_count': 10, 'dst_host_same_srv_rate': 0.04,
+                'dst_host_diff_srv_rate': 0.06, 'dst_host_serror_rate': 1, 'dst_host_srv_serror_rate': 1}
+}
+
+def _kdd_rows(rows, seed=42):
+    """(rows, 41) record rows drawn from KDD_PROTOTYPES (4 in 5 normal), with byte counts varied +-20%."""
+    from records import FEATURE_INDEX, CATEGORICAL_FEATURES, NUM_FEATURES, category_id
+
+    prototypes = []
+    for values in KDD_PROTOTYPES.values():
+        row = np.zeros(NUM_FEATURES)
+        for name, value in values.items():
+            row[FEATURE_INDEX[name]] = category_id(name, value) if name in CATEGORICAL_FEATURES else value
+        prototypes.append(row)
+
+    rng = np.random.default_rng(seed)
+    weights = np.array([0.4, 0.2, 0.2, 0.1, 0.1])
+    features = np.array(prototypes)[rng.choice(len(prototypes), rows, p=weights)]
+    for name in ('src_bytes', 'dst_bytes'):
+        features[:, FEATURE_INDEX[name]] = np.round(features[:, FEATURE_INDEX[name]] * rng.uniform(0.8, 1.2, rows))
+    return features
+
+def bench_cascade(batch=256, rows=8192, threshold=None):
+    """
+    Compares the full ensemble against the RF-first cascade on KDD-like connections (KDD_PROTOTYPES)
+    and on the synthetic spread of _feature_rows, with the share of rows escalated and why, and
+    reports the per-row cost of each tier so the saving can be projected for other escalation rates.
+    """
+    import warnings
+    import detector
+
+    warnings.filterwarnings('ignore', message="X does not have valid feature names")
+    threshold = detector.CASCADE_THRESHOLD if threshold is None else threshold
+    models = detector.models
+    print("=" * 60)
+    print(f"Cascade Benchmark (batch {batch}, RF confidence threshold {threshold})")
+    print("=" * 60)
+
+    def run(features, cascade):
+        start = time.perf_counter()
+        for offset in range(0, rows, batch):
+            detector.predict_batch(features[offset:offset + batch], np.zeros(min(batch, rows - offset)),
+                                   cascade=cascade, threshold=threshold, use_cache=False)
+        return (time.perf_counter() - start) / rows * 1e6
+
+    for name, features in (("KDD-like connections", _kdd_rows(rows)), ("Synthetic spread", _feature_rows(rows))):
+        run(features, False)  # Warm-up
+        full_us = run(features, False)
+        before = detector.get_tier_stats()
+        cascade_us = run(features, True)
+        after = detector.get_tier_stats()
+        escalated = (after['ensemble'] - before['ensemble']) / (after['rf'] - before['rf'])
+
+        # Why rows escalate: an unsure RF, or an RF label other than Normal (THREAT_TYPES index 0)
+        scaled = models.get('scaler').transform(models.get('rf_encoder').encode(features))
+        rf_prediction, rf_probs = models.get('forest').predict_with_proba(scaled)
+        unsure = rf_probs.max(axis=1) < threshold
+        not_normal = np.minimum(rf_prediction, len(detector.THREAT_TYPES) - 1) != 0
+        labels = np.bincount(rf_prediction)
+
+        print(f"{name}:")
+        print(f"   - Full ensemble:   {full_us:.2f} us/row")
+        print(f"   - Cascade:         {cascade_us:.2f} us/row ({full_us / cascade_us:.2f}x, {escalated:.1%} escalated: "
+              f"{unsure.mean():.1%} below the threshold, {not_normal.mean():.1%} labelled non-Normal)")
+        print(f"   - RF labels:       {', '.join(f'class {label}: {count / rows:.0%}' for label, count in enumerate(labels) if count)}")
+        if name.startswith("KDD") and not_normal.mean() > 0.5:
+            print("   ⚠️  The RF labels most of these (4 in 5 normal) connections non-Normal: its class codes do not "
+                  "follow THREAT_TYPES, so the cascade escalates them all")
+
+    # Per-tier cost: RF (scaler + forest) vs CNN/LSTM ensemble (scaler + both networks)
+    chunk = _kdd_rows(batch)
+    start = time.perf_counter()
+    for _ in range(20):
+        models.get('forest').predict_with_proba(models.get('scaler').transform(models.get('rf_encoder').encode(chunk)))
+    rf_us = (time.perf_counter() - start) / (20 * batch) * 1e6
+    start = time.perf_counter()
+    for _ in range(20):
+        dl_input = models.get('scaler_dl').transform(models.get('dl_encoder').encode(chunk)).reshape(batch, 1, -1)
+        models.get('cnn').predict_on_batch(dl_input)
+        models.get('lstm').predict_on_batch(dl_input)
+    dl_us = (time.perf_counter() - start) / (20 * batch) * 1e6
+
+    print(f"Tier cost: RF {rf_us:.2f} us/row, CNN+LSTM {dl_us:.2f} us/row")
+    for settled in (0.5, 0.9, 0.99):
+        projected = rf_us + (1 - settled) * dl_us
+        print(f"   - {settled:.0%} settled by RF: ~{projected:.2f} us/row ({(rf_us + dl_us) / projected:.1f}x less)")
+
+def bench_cache(batch=256, rows=16384, patterns=200, jitter=0.02):
+    """
+    Flood-like traffic (rows drawn from a few hundred patterns whose src/dst bytes jitter slightly),
+    scored with and without the verdict cache.
+    """
+    import warnings
+    import detector
+    from records import FEATURE_INDEX
+
+    warnings.filterwarnings('ignore', message="X does not have valid feature names")
+    print("=" * 60)
+    print(f"Verdict Cache Benchmark ({rows} rows from {patterns} patterns, +/-{jitter:.0%} jitter)")
+    print("=" * 60)
+
+    rng = np.random.default_rng(7)
+    # Counts/bytes are integers and rates have two decimals, as the sniffer produces them
+    base = np.round(_feature_rows(patterns))
+    rates = [index for name, index in FEATURE_INDEX.items() if name.endswith('_rate')]
+    base[:, rates] = np.round(np.clip(_feature_rows(patterns)[:, rates], 0, 1), 2)
+    features = base[rng.integers(0, patterns, rows)]
+    for name in ('src_bytes', 'dst_bytes'):
+        column = FEATURE_INDEX[name]
+        features[:, column] = np.round(features[:, column] * (1 + rng.uniform(-jitter, jitter, rows)))
+    rqa_det = np.zeros(rows)
+
+    def run(use_cache):
+        start = time.perf_counter()
+        for offset in range(0, rows, batch):
+            detector.predict_batch(features[offset:offset + batch], rqa_det[offset:offset + batch],
+                                   use_cache=use_cache)
+        return rows / (time.perf_counter() - start)
+
+    run(False)  # Warm-up
+    uncached = run(False)
+    detector.load_models()  # Starts from an empty cache
+    cached = run(True)
+    stats = detector.verdict_cache.get_stats()
+    print(f"   - Without cache: {uncached:>10,.0f} rows/s")
+    print(f"   - With cache:    {cached:>10,.0f} rows/s ({cached / uncached:.1f}x)")
+    print(f"   - Hit rate:      {stats['hit_rate']:.1%} ({stats['entries']:,} entries)")
+
+# Statement timed in a fresh interpreter per startup probe
+STARTUP_PROBES = [
+    ('import app', "import app"),
+    ('import detector', "import detector"),
+    ('worker cold start', "import detector; detector.predict_traffic({})"),
+    ('eager load + warm-up', "import detector; detector.load_models(eager=True)")
+]
+
+def _run_startup_probe(statement):
+    """Runs statement in a new interpreter; returns (in-process ms, wall ms incl. interpreter start, model stats)."""
+    import json
+    import os
+    import subprocess
+    import sys
+
+    code = (f"import json, time\n_start = time.perf_counter()\n{statement}\n"
+            f"_ms = (time.perf_counter() - _start) * 1000\n"
+            f"import detector\nprint('STARTUP', json.dumps([_ms, detector.get_model_stats()]))")
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-W', 'ignore', '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout
+    wall_ms = (time.perf_counter() - start) * 1000
+    line = next(line for line in output.splitlines() if line.startswith('STARTUP '))
+    ms, stats = json.loads(line[len('STARTUP '):])
+    return ms, wall_ms, stats
+
+def bench_startup(budget_ms=2000, runs=3):
+    """
+    Cold-start times, each in a fresh interpreter (median of runs). The worker cold start
+    (import detector + first verdict, interpreter start included) is checked against budget_ms.
+    :return: True if within budget.
+    """
+    print("=" * 60)
+    print(f"Startup Benchmark (median of {runs} fresh interpreters, worker budget {budget_ms} ms)")
+    print("=" * 60)
+    print(f"{'probe':>22} | {'in-process ms':>13} | {'wall ms':>8}")
+    print("-" * 60)
+
+    results = {}
+    for name, statement in STARTUP_PROBES:
+        samples = [_run_startup_probe(statement) for _ in range(runs)]
+        ms = float(np.median([sample[0] for sample in samples]))
+        wall_ms = float(np.median([sample[1] for sample in samples]))
+        results[name] = (ms, wall_ms, samples[-1][2])
+        print(f"{name:>22} | {ms:>13,.1f} | {wall_ms:>8,.1f}")
+
+    stats = results['eager load + warm-up'][2]
+    print("   - Per-component load ms:    " + ", ".join(f"{k} {v}" for k, v in stats['load_ms'].items()))
+    print("   - Per-component warm-up ms: " + ", ".join(f"{k} {v}" for k, v in stats['warm_up_ms'].items()))
+
+    worker_ms = results['worker cold start'][1]
+    within = worker_ms <= budget_ms
+    print(f"   - Worker cold start {worker_ms:,.0f} ms: {'within' if within else 'OVER'} budget ({budget_ms} ms)")
+    return within
+
+# How a worker loads the models: unpickled private copies (as before artifacts.py) vs memory-mapped artifacts
+MEMORY_LOADERS = {
+    'pickle': ("import joblib\nfrom forest import FlatForest\nfrom nn_runtime import NumpyModel\n"
+               "models = [FlatForest.from_sklearn(joblib.load('models/fl_ids_model.pkl')),\n"
+               "          joblib.load('models/scaler.pkl'), joblib.load('models/scaler_dl.pkl'),\n"
+               "          NumpyModel('models/cnn_ids_model.npz'), NumpyModel('models/lstm_ids_model.npz')]"),
+    'mmap': "import detector\ndetector.load_models(eager=True)"
+}
+
+def _memory_kb(pid):
+    """Rss, Pss and Uss (private pages) of a process in kB, from /proc/<pid>/smaps_rollup (Linux)."""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return fields['Rss'], fields['Pss'], fields['Private_Clean'] + fields['Private_Dirty']
+
+def bench_memory(workers=4):
+    """
+    Starts `workers` processes that each load the models, then reports per-worker memory for both
+    loading schemes. Rss counts shared pages in full; Pss splits them between the processes sharing them.
+    """
+    import os
+    import subprocess
+    import sys
+
+    print("=" * 60)
+    print(f"Model Memory Benchmark ({workers} worker processes)")
+    print("=" * 60)
+    print(f"{'loader':>8} | {'RSS MB/worker':>13} | {'PSS MB/worker':>13} | {'USS MB/worker':>13} | {'total PSS MB':>12}")
+    print("-" * 60)
+
+    for loader, code in MEMORY_LOADERS.items():
+        code += "\nimport sys\nprint('ready', flush=True)\nsys.stdin.readline()"
+        procs = [subprocess.Popen([sys.executable, '-W', 'ignore', '-c', code], stdin=subprocess.PIPE,
+                                  stdout=subprocess.PIPE, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+                 for _ in range(workers)]
+        try:
+            for proc in procs:
+                while proc.stdout.readline().strip() != 'ready':
+                    pass
+            usage = np.array([_memory_kb(proc.pid) for proc in procs]) / 1024
+        finally:
+            for proc in procs:
+                proc.communicate('\n')
+        rss, pss, uss = usage.mean(axis=0)
+        print(f"{loader:>8} | {rss:>13.1f} | {pss:>13.1f} | {uss:>13.1f} | {usage[:, 1].sum():>12.1f}")
+
+def bench_pool(worker_counts=(1, 2, 4), batch=256, rows=16384, submitters=4):
+    """
+    Scoring throughput in-process vs through the InferencePool, with `submitters` threads submitting
+    batches concurrently (as DetectionLoop threads / request handlers do). A ticker thread stands in
+    for the web tier: its worst wake-up delay shows how long scoring keeps other threads off the GIL.
+    """
+    import os
+    import threading
+    import warnings
+    import detector
+    from inference_pool import InferencePool
+
+    warnings.filterwarnings('ignore', message="X does not have valid feature names")
+    print("=" * 60)
+    print(f"Inference Pool Benchmark (batch {batch}, {submitters} submitting threads, cache off, {os.cpu_count()} CPUs)")
+    print("=" * 60)
+    print(f"{'mode':>12} | {'rows/s':>10} | {'web tick p99 ms':>15} | {'web tick max ms':>15} | utilization")
+    print("-" * 60)
+
+    features = _feature_rows(rows)
+    rqa_det = np.zeros(rows)
+    offsets = list(range(0, rows, batch))
+
+    def run():
+        next_offset = iter(offsets)
+        lock = threading.Lock()
+        done = threading.Event()
+        delays = []
+
+        def submit():
+            while True:
+                with lock:
+                    offset = next(next_offset, None)
+                if offset is None:
+                    return
+                detector.predict_batch(features[offset:offset + batch], rqa_det[offset:offset + batch], use_cache=False)
+
+        def tick():
+            while not done.is_set():
+                start = time.perf_counter()
+                time.sleep(0.001)
+                delays.append(time.perf_counter() - start - 0.001)
+
+        ticker = threading.Thread(target=tick)
+        ticker.start()
+        threads = [threading.Thread(target=submit) for _ in range(submitters)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        done.set()
+        ticker.join()
+        return rows / elapsed, np.percentile(delays, 99) * 1000, max(delays) * 1000
+
+    run()  # Warm-up
+    throughput, p99, worst = run()
+    print(f"{'in-process':>12} | {throughput:>10,.0f} | {p99:>15.2f} | {worst:>15.2f} |")
+
+    for workers in worker_counts:
+        pool = InferencePool(workers=workers, max_rows=batch)
+        pool.start()
+        detector.use_inference_pool(pool)
+        try:
+            run()  # Warm-up
+            throughput, p99, worst = run()
+            utilization = [stats['utilization'] for stats in pool.get_stats()['per_worker'].values()]
+        finally:
+            detector.use_inference_pool(None)
+            pool.stop()
+        print(f"{f'pool x{workers}':>12} | {throughput:>10,.0f} | {p99:>15.2f} | {worst:>15.2f} | "
+              f"{', '.join(f'{u:.0%}' for u in utilization)}")
+
+def bench_db(calls=500, thread_counts=(1, 4)):
+    """
+    Database operations/second with a new connection per call (as before the pool) vs reused pooled
+    connections, both through database.py. Needs the MySQL server of DB_CONFIG; the traffic_logs
+    rows it inserts have src_ip 198.51.100.1.
+    """
+    import threading
+    import database
+    from datetime import datetime
+
+    if database.get_connection() is None:
+        print("MySQL is not reachable (see DB_CONFIG in database.py); skipping the database benchmark")
+        return
+    database.init_db()
+
+    print("=" * 60)
+    print(f"Database Benchmark ({calls} calls per run)")
+    print("=" * 60)
+    print(f"{'operation':>16} | {'threads':>7} | {'per-call ops/s':>14} | {'pooled ops/s':>12} | speedup")
+    print("-" * 60)
+
+    log_entry = {'timestamp': datetime.now(), 'src_ip': '198.51.100.1', 'dst_ip': '127.0.0.1', 'protocol': 'TCP',
+                 'service': 'http', 'prediction': 'Normal', 'confidence': 1.0, 'threat_level': 'Low',
+                 'blocked': False}
+    operations = [('log_traffic', lambda: database.log_traffic(log_entry)),
+                  ('get_recent_logs', lambda: database.get_recent_logs(limit=10)),
+                  ('get_stats', database.get_stats)]
+
+    def ops_per_second(call, num_threads):
+        per_thread = calls // num_threads
+
+        def worker():
+            for _ in range(per_thread):
+                call()
+
+        threads = [threading.Thread(target=worker) for _ in range(num_threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return per_thread * num_threads / (time.perf_counter() - start)
+
+    for name, call in operations:
+        for num_threads in thread_counts:
+            results = []
+            for reuse in (False, True):
+                database.configure_pool(pool_size=max(thread_counts), reuse_connections=reuse)
+                call()  # Warm-up
+                results.append(ops_per_second(call, num_threads))
+            print(f"{name:>16} | {num_threads:>7} | {results[0]:>14,.0f} | {results[1]:>12,.0f} | "
+                  f"{results[1] / results[0]:.1f}x")
+    database.configure_pool(reuse_connections=True)
+
+def bench_log_writer(rows=20000, sync_rows=1000):
+    """
+    traffic_logs ingest: one INSERT per entry (synchronous log_traffic) vs the batched background
+    TrafficLogWriter, plus how long the caller spends per entry. Needs the MySQL server of DB_CONFIG;
+    the rows it inserts have src_ip 198.51.100.1.
+    """
+    import database
+    from datetime import datetime
+    from log_writer import TrafficLogWriter
+
+    if database.get_connection() is None:
+        print("MySQL is not reachable (see DB_CONFIG in database.py); skipping the log writer benchmark")
+        return
+    database.init_db()
+
+    print("=" * 60)
+    print("Traffic Log Writer Benchmark")
+    print("=" * 60)
+    print(f"{'mode':>12} | {'rows':>7} | {'rows/s':>10} | {'caller us/row':>13}")
+    print("-" * 60)
+
+    log_entry = {'timestamp': datetime.now(), 'src_ip': '198.51.100.1', 'dst_ip': '127.0.0.1', 'protocol': 'TCP',
+                 'service': 'http', 'prediction': 'Normal', 'confidence': 1.0, 'threat_level': 'Low',
+                 'blocked': False}
+
+    start = time.perf_counter()
+    for _ in range(sync_rows):
+        database.log_traffic(log_entry)
+    elapsed = time.perf_counter() - start
+    print(f"{'per-row':>12} | {sync_rows:>7} | {sync_rows / elapsed:>10,.0f} | {elapsed / sync_rows * 1e6:>13.1f}")
+
+    writer = TrafficLogWriter(maxsize=rows)
+    writer.start()
+    database.use_log_writer(writer)
+    try:
+        start = time.perf_counter()
+        for _ in range(rows):
+            database.log_traffic(log_entry)
+        caller = time.perf_counter() - start
+    finally:
+        database.use_log_writer(None)
+        writer.stop()  # Flushes what is still buffered
+    elapsed = time.perf_counter() - start
+    stats = writer.get_stats()
+    print(f"{'batched':>12} | {stats['rows_written']:>7} | {stats['rows_written'] / elapsed:>10,.0f} | "
+          f"{caller / rows * 1e6:>13.1f}")
+    print(f"   - {stats['batches']} batches (mean {stats['mean_batch']} rows), flush mean {stats['mean_flush_ms']} ms / "
+          f"max {stats['max_flush_ms']} ms, dropped {stats['dropped']}, failed {stats['failed_rows']}")
+
+def bench_blocklist(sizes=(1000, 100000), networks=1000, lookups=100000):
+    """
+    Blocklist.contains() cost per lookup as the blocklist grows: an exact (hash set) hit, a hit
+    through a CIDR range (prefix tree walk) and a miss, vs scanning the ranges with ipaddress.
+    """
+    import ipaddress
+    from blocklist import Blocklist
+
+    print("=" * 60)
+    print(f"Blocklist Benchmark ({networks} CIDR ranges)")
+    print("=" * 60)
+    print(f"{'addresses':>10} | {'exact hit ns':>12} | {'range hit ns':>12} | {'miss ns':>8} | {'range scan ns':>13}")
+    print("-" * 60)
+
+    rng = random.Random(42)
+    for size in sizes:
+        blocklist = Blocklist()
+        addresses = [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(size)]
+        ranges = [f"{ipaddress.IPv4Address(rng.getrandbits(16) << 16)}/16" for _ in range(networks)]
+        for entry in addresses + ranges:
+            blocklist.add(entry)
+        parsed_ranges = [ipaddress.ip_network(entry) for entry in ranges]
+        in_range = [str(network.network_address + 1234) for network in parsed_ranges]
+        misses = [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(1000)]
+        misses = [address for address in misses if not blocklist.contains(address)]
+
+        def per_lookup(candidates, lookup, count=lookups):
+            start = time.perf_counter()
+            for i in range(count):
+                lookup(candidates[i % len(candidates)])
+            return (time.perf_counter() - start) / count * 1e9
+
+        def scan(address):
+            ip = ipaddress.ip_address(address)
+            return any(ip in network for network in parsed_ranges)
+
+        print(f"{size:>10,} | {per_lookup(addresses, blocklist.contains):>12,.0f} | "
+              f"{per_lookup(in_range, blocklist.contains):>12,.0f} | {per_lookup(misses, blocklist.contains):>8,.0f} | "
+              f"{per_lookup(misses, scan, count=200):>13,.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Performance benchmarks for the IDS pipeline")
+    parser.add_argument('suite', choices=['rqa', 'rqa-batch', 'capture', 'sharding', 'predict', 'forest', 'cascade', 'cache', 'startup', 'memory', 'pool', 'db', 'log-writer', 'blocklist'], help="Benchmark suite to run")
+    parser.add_argument('--packets', type=int, default=5000, help="Packets to feed per run")
+    parser.add_argument('--workers', type=int, default=None, help="Maximum worker processes (sharding suite), worker processes (memory suite)")
+    parser.add_argument('--score', action='store_true', help="Run the models in the workers (sharding suite)")
+    parser.add_argument('--budget-ms', type=float, default=2000, help="Worker cold-start budget (startup suite)")
+    args = parser.parse_args()
+
+    if args.suite == 'rqa':
+        bench_rqa(packets=args.packets)
+    elif args.suite == 'rqa-batch':
+        bench_rqa_batch()
+    elif args.suite == 'capture':
+        bench_capture()
+    elif args.suite == 'sharding':
+        bench_sharding(packets=args.packets, max_workers=args.workers, score=args.score)
+    elif args.suite == 'predict':
+        bench_predict()
+    elif args.suite == 'forest':
+        bench_forest()
+    elif args.suite == 'cascade':
+        bench_cascade()
+    elif args.suite == 'cache':
+        bench_cache()
+    elif args.suite == 'startup':
+        if not bench_startup(budget_ms=args.budget_ms):
+            raise SystemExit(1)
+    elif args.suite == 'memory':
+        bench_memory(workers=args.workers or 4)
+    elif args.suite == 'pool':
+        bench_pool()
+    elif args.suite == 'db':
+        bench_db()
+    elif args.suite == 'log-writer':
+        bench_log_writer()
+    elif args.suite == 'blocklist':
+        bench_blocklist()
@@ -0,0 +1,164 @@
+import ipaddress
+import socket
+import threading
+from functools import lru_cache
+
+@lru_cache(maxsize=65536)
+def parse_entry(address):
+    """
+    Canonical form of a blocklist entry: an address (ipaddress.IPv4Address/IPv6Address) or,
+    for 'a.b.c.d/n' ranges, a network. A /32 or /128 range is the single address.
+    :return: None if it is neither.
+    """
+    try:
+        if '/' not in address:
+            return ipaddress.ip_address(address)
+        network = ipaddress.ip_network(address, strict=False)
+    except (TypeError, ValueError):
+        return None
+    return network.network_address if network.prefixlen == network.max_prefixlen else network
+
+def address_key(address):
+    """(IP version, address as int) for an address text, via inet_pton (much cheaper than ipaddress); None if invalid."""
+    for version, family in ((4, socket.AF_INET), (6, socket.AF_INET6)):
+        try:
+            return version, int.from_bytes(socket.inet_pton(family, address), 'big')
+        except (OSError, TypeError):
+            pass
+    return None
+
+class PrefixTree:
+    # Radix-256 tree: one level per address byte. A node is [children by byte value, byte values
+    # covered by a prefix ending inside this byte, whether a prefix ends exactly here].
+    STRIDE = 8
+
+    def __init__(self, bits):
+        """Prefix tree over `bits`-bit addresses; a lookup visits at most one node per address byte."""
+        self.bits = bits
+        self._root = [{}, set(), False]
+        self._prefixes = set()
+
+    @property
+    def size(self):
+        return len(self._prefixes)
+
+    def add(self, network, prefix_len):
+        """:return: False if the prefix was already present."""
+        if (network, prefix_len) in self._prefixes:
+            return False
+        self._prefixes.add((network, prefix_len))
+
+        node = self._root
+        full, partial = divmod(prefix_len, self.STRIDE)
+        for level in range(full):
+            byte = (network >> (self.bits - self.STRIDE * (level + 1))) & 0xFF
+            node = node[0].setdefault(byte, [{}, set(), False])
+        if partial:
+            # A prefix ending inside a byte covers a run of 2^(8 - partial) values of that byte
+            first = (network >> (self.bits - self.STRIDE * (full + 1))) & 0xFF
+            node[1].update(range(first, first + (1 << (self.STRIDE - partial))))
+        else:
+            node[2] = True
+        return True
+
+    def contains(self, address):
+        """True if any stored prefix covers the address."""
+        node = self._root
+        for shift in range(self.bits - self.STRIDE, -1, -self.STRIDE):
+            if node[2]:
+                return True
+            byte = (address >> shift) & 0xFF
+            if byte in node[1]:
+                return True
+            node = node[0].get(byte)
+            if node is None:
+                return False
+        return node[2]
+
+    def covers(self, network, prefix_len):
+        """True if a stored prefix no longer than prefix_len covers the whole network (itself included)."""
+        for length in range(prefix_len, -1, -1):
+            mask = ((1 << length) - 1) << (self.bits - length)
+            if (network & mask, length) in self._prefixes:
+                return True
+        return False
+
+class Blocklist:
+    def __init__(self):
+        """
+        In-memory copy of blocked_ips: single addresses in a hash set, CIDR ranges in a prefix tree
+        per IP version, so contains() answers without a query. database.py loads it once and
+        writes through to it (see database.block_ip).
+        """
+        self._texts = set()      # Blocked addresses as text: the common lookup is a single set probe
+        self._addresses = set()  # ... and as address_key(), for other spellings of the same address
+        self._networks = {4: PrefixTree(32), 6: PrefixTree(128)}
+        self._entries = {}  # Entry text -> (blocked_at, reason), in block order
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def contains(self, address):
+        """True if the address is blocked, by itself or by a range covering it."""
+        if address in self._texts:
+            return True
+        key = address_key(address)
+        if key is None:
+            return False
+        if key in self._addresses:
+            return True
+        tree = self._networks[key[0]]
+        return tree.size > 0 and tree.contains(key[1])
+
+    def covers(self, entry):
+        """True if blocking a parse_entry() result would change nothing: it, or a range covering it, is blocked."""
+        if isinstance(entry, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
+            return self._networks[entry.version].covers(int(entry.network_address), entry.prefixlen)
+        return self.contains(str(entry))
+
+    def add(self, address, blocked_at=None, reason=None):
+        """
+        Adds an address or CIDR range as stored in blocked_ips.
+        :return: False if it is invalid or already present.
+        """
+        entry = parse_entry(address)
+        if entry is None:
+            return False
+        with self._lock:
+            if isinstance(entry, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
+                added = self._networks[entry.version].add(int(entry.network_address), entry.prefixlen)
+            else:
+                key = (entry.version, int(entry))
+                added = key not in self._addresses
+                self._addresses.add(key)
+                self._texts.update((address, str(entry)))
+            if added:
+                self._entries[address] = (blocked_at, reason)
+            return added
+
+    def load(self, rows):
+        """Replaces the contents with (ip_address, blocked_at, reason) rows, oldest first."""
+        with self._lock:
+            self._texts = set()
+            self._addresses = set()
+            self._networks = {4: PrefixTree(32), 6: PrefixTree(128)}
+            self._entries = {}
+        for address, blocked_at, reason in rows:
+            self.add(address, blocked_at, reason)
+        self.loaded = True
+
+    def recent(self, limit=None):
+        """Entries, most recently blocked first."""
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        return entries if limit is None else entries[:limit]
+
+    def get_stats(self):
+        return {
+            'addresses': len(self._addresses),
+            'networks': self._networks[4].size + self._networks[6].size,
+            'loaded': self.loaded
+        }
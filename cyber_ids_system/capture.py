@@ -0,0 +1,282 @@
+import mmap
+import socket
+import struct
+import time
+
+# Link-layer types (pcap LINKTYPE_*)
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+
+ETH_P_ALL = 0x0003
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86DD
+ETH_P_8021Q = 0x8100
+ETH_P_8021AD = 0x88A8
+
+IPPROTO_ICMP = 1
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+IPPROTO_ICMPV6 = 58
+
+_ETHERTYPE = struct.Struct('!H')
+_IPV4 = struct.Struct('!BBHHHBBH4s4s')
+_IPV6 = struct.Struct('!IHBB16s16s')
+_PORTS = struct.Struct('!HH')
+
+_PROTOCOLS = {IPPROTO_TCP: 'tcp', IPPROTO_UDP: 'udp', IPPROTO_ICMP: 'icmp', IPPROTO_ICMPV6: 'icmp'}
+
+def classify_service(protocol, sport, dport):
+    """Maps a protocol and port pair to the KDD service name used by the models."""
+    if protocol == 'tcp':
+        if dport == 80 or sport == 80:
+            return 'http'
+        elif dport == 443 or sport == 443:
+            return 'http_ssl'
+        elif dport == 22:
+            return 'ssh'
+        elif dport == 21:
+            return 'ftp'
+        elif dport == 25:
+            return 'smtp'
+        return 'private'
+    elif protocol == 'udp':
+        return 'domain_u' if dport == 53 else 'private'
+    elif protocol == 'icmp':
+        return 'ecr_i'
+    return 'other'
+
+def parse_frame(frame, linktype=LINKTYPE_ETHERNET):
+    """
+    Extracts the fields the pipeline needs straight from the raw header bytes.
+    No per-layer objects are built; only the IP address strings are allocated.
+    :param frame: bytes/bytearray/memoryview holding one captured frame.
+    :return: (src_ip, dst_ip, sport, dport, protocol, length, payload, tcp_flags) or None for non-IP frames.
+    """
+    length = len(frame)
+    offset = 0
+
+    if linktype == LINKTYPE_ETHERNET:
+        if length < 14:
+            return None
+        ethertype = _ETHERTYPE.unpack_from(frame, 12)[0]
+        offset = 14
+        # Skip 802.1Q / 802.1ad VLAN tags
+        while ethertype in (ETH_P_8021Q, ETH_P_8021AD) and length >= offset + 4:
+            ethertype = _ETHERTYPE.unpack_from(frame, offset + 2)[0]
+            offset += 4
+    elif linktype == LINKTYPE_LINUX_SLL:
+        if length < 16:
+            return None
+        ethertype = _ETHERTYPE.unpack_from(frame, 14)[0]
+        offset = 16
+    elif linktype == LINKTYPE_RAW:
+        if length < 1:
+            return None
+        ethertype = ETH_P_IP if frame[0] >> 4 == 4 else ETH_P_IPV6
+    else:
+        return None
+
+    if ethertype == ETH_P_IP:
+        if length < offset + 20:
+            return None
+        ver_ihl, _, total_length, _, frag, _, proto, _, src, dst = _IPV4.unpack_from(frame, offset)
+        header_len = (ver_ihl & 0x0F) * 4
+        src_ip = socket.inet_ntoa(src)
+        dst_ip = socket.inet_ntoa(dst)
+        ip_end = min(offset + total_length, length)
+        offset += header_len
+        # Non-first fragments carry no transport header
+        if frag & 0x1FFF:
+            return (src_ip, dst_ip, 0, 0, _PROTOCOLS.get(proto, 'other'), length, ip_end - offset, 0)
+    elif ethertype == ETH_P_IPV6:
+        if length < offset + 40:
+            return None
+        _, payload_length, proto, _, src, dst = _IPV6.unpack_from(frame, offset)
+        src_ip = socket.inet_ntop(socket.AF_INET6, src)
+        dst_ip = socket.inet_ntop(socket.AF_INET6, dst)
+        offset += 40
+        ip_end = min(offset + payload_length, length)
+    else:
+        return None
+
+    protocol = _PROTOCOLS.get(proto, 'other')
+    sport, dport, tcp_flags = 0, 0, 0
+
+    if protocol == 'tcp' and ip_end >= offset + 14:
+        sport, dport = _PORTS.unpack_from(frame, offset)
+        data_offset = (frame[offset + 12] >> 4) * 4
+        tcp_flags = frame[offset + 13]
+        payload = ip_end - offset - data_offset
+    elif protocol == 'udp' and ip_end >= offset + 8:
+        sport, dport = _PORTS.unpack_from(frame, offset)
+        payload = ip_end - offset - 8
+    elif protocol == 'icmp':
+        payload = ip_end - offset - 8
+    else:
+        payload = ip_end - offset
+
+    return (src_ip, dst_ip, sport, dport, protocol, length, max(payload, 0), tcp_flags)
+
+class RawSocketCapture:
+    def __init__(self, interface=None, snaplen=65535):
+        """
+        Reads raw Ethernet frames from an AF_PACKET socket (Linux only, needs root/CAP_NET_RAW).
+        :param interface: Interface to bind to, or None for all interfaces.
+        """
+        if not hasattr(socket, 'AF_PACKET'):
+            raise OSError("AF_PACKET capture is only available on Linux")
+
+        self.linktype = LINKTYPE_ETHERNET
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        self.sock.settimeout(1.0)
+        if interface:
+            self.sock.bind((interface, 0))
+        self._buffer = bytearray(snaplen)
+        self._view = memoryview(self._buffer)
+
+    def __iter__(self):
+        """Yields (timestamp, frame) pairs; the frame view is reused, so parse it before the next one."""
+        while True:
+            try:
+                size = self.sock.recv_into(self._buffer)
+            except socket.timeout:
+                yield None, None  # Lets the caller check its stop condition
+                continue
+            except OSError:
+                return
+            yield time.time(), self._view[:size]
+
+    def close(self):
+        self.sock.close()
+
+class PcapStreamReader:
+    def __init__(self, stream):
+        """
+        Streams records from a classic pcap byte stream (file, pipe or socket file object).
+        Records are read one at a time, so captures of any size use constant memory.
+        """
+        self.stream = stream
+        header = stream.read(24)
+        if len(header) < 24:
+            raise ValueError("Stream too short for a pcap header")
+
+        magic = header[:4]
+        if magic in (b'\xd4\xc3\xb2\xa1', b'\x4d\x3c\xb2\xa1'):
+            endian = '<'
+        elif magic in (b'\xa1\xb2\xc3\xd4', b'\xa1\xb2\x3c\x4d'):
+            endian = '>'
+        else:
+            raise ValueError("Not a pcap stream (bad magic number)")
+
+        self._nanoseconds = magic in (b'\x4d\x3c\xb2\xa1', b'\xa1\xb2\x3c\x4d')
+        self._record = struct.Struct(endian + 'IIII')
+        self.linktype = struct.unpack(endian + 'I', header[20:24])[0] & 0x0FFFFFFF
+
+    def __iter__(self):
+        """Yields (timestamp, frame) pairs until the stream ends."""
+        divisor = 1e9 if self._nanoseconds else 1e6
+        read = self.stream.read
+        record = self._record
+        while True:
+            header = read(16)
+            if len(header) < 16:
+                return
+            seconds, fraction, captured, _ = record.unpack(header)
+            frame = read(captured)
+            if len(frame) < captured:
+                return
+            yield seconds + fraction / divisor, frame
+
+    def close(self):
+        self.stream.close()
+
+class PcapngStreamReader:
+    def __init__(self, stream):
+        """
+        Streams packets from a pcapng byte stream block by block.
+        Supports Enhanced/Simple/obsolete Packet Blocks and per-interface timestamp resolution.
+        """
+        self.stream = stream
+        self._endian = '<'
+        self._interfaces = []  # (linktype, ticks per second) per Interface Description Block
+        self._last_timestamp = 0.0
+        self.linktype = LINKTYPE_ETHERNET  # Link type of the first interface
+
+        header = stream.read(12)
+        if len(header) < 12 or header[:4] != b'\x0a\x0d\x0d\x0a':
+            raise ValueError("Not a pcapng stream (missing Section Header Block)")
+        self._read_section_header(header)
+
+    def _read_section_header(self, header):
+        magic = header[8:12]
+        self._endian = '<' if magic == b'\x4d\x3c\x2b\x1a' else '>'
+        block_length = struct.unpack(self._endian + 'I', header[4:8])[0]
+        self.stream.read(block_length - 12)
+        self._interfaces = []
+
+    def _add_interface(self, body):
+        linktype = struct.unpack_from(self._endian + 'H', body, 0)[0]
+        resolution = 10 ** 6
+
+        # Walk the options looking for if_tsresol (code 9)
+        offset = 8
+        while offset + 4 <= len(body):
+            code, length = struct.unpack_from(self._endian + 'HH', body, offset)
+            if code == 0:
+                break
+            if code == 9 and length >= 1:
+                value = body[offset + 4]
+                resolution = 2 ** (value & 0x7F) if value & 0x80 else 10 ** value
+            offset += 4 + (length + 3) // 4 * 4
+
+        self._interfaces.append((linktype, resolution))
+        if len(self._interfaces) == 1:
+            self.linktype = linktype
+
+    def __iter__(self):
+        """Yields (timestamp, frame) pairs until the stream ends."""
+        read = self.stream.read
+        while True:
+            header = read(8)
+            if len(header) < 8:
+                return
+            block_type, block_length = struct.unpack(self._endian + 'II', header)
+
+            if block_type == 0x0A0D0D0A:
+                self._read_section_header(header + read(4))
+                continue
+
+            body = read(block_length - 8)
+            if len(body) < block_length - 8:
+                return
+
+            if block_type == 1:  # Interface Description Block
+                self._add_interface(body)
+            elif block_type in (6, 2):  # Enhanced / obsolete Packet Block
+                if block_type == 6:
+                    interface, ts_high, ts_low, captured, _ = struct.unpack_from(self._endian + 'IIIII', body, 0)
+                else:
+                    interface, _, ts_high, ts_low, captured, _ = struct.unpack_from(self._endian + 'HHIIII', body, 0)
+                _, resolution = self._interfaces[interface] if interface < len(self._interfaces) else (None, 10 ** 6)
+                self._last_timestamp = ((ts_high << 32) | ts_low) / resolution
+                yield self._last_timestamp, body[20:20 + captured]
+            elif block_type == 3:  # Simple Packet Block (no timestamp, reuse the last one)
+                original = struct.unpack_from(self._endian + 'I', body, 0)[0]
+                snaplen = block_length - 16
+                yield self._last_timestamp, body[4:4 + min(original, snaplen)]
+
+    def close(self):
+        self.stream.close()
+
+def open_capture_file(path):
+    """
+    Opens a pcap or pcapng file through a read-only memory map, so it is never loaded whole.
+    :return: PcapStreamReader or PcapngStreamReader, both yielding (timestamp, frame) pairs.
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if mapped[:4] == b'\x0a\x0d\x0d\x0a':
+        return PcapngStreamReader(mapped)
+    return PcapStreamReader(mapped)
@@ -1,7 +1,21 @@
+import os
+import queue
+import socket
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from functools import lru_cache
+
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errorcode
+from mysql.connector.errors import PoolError
 from datetime import datetime
 
+import db_schema
+from blocklist import Blocklist, parse_entry
+from stats_rollup import TrafficStats
+
 # Database Configuration
 # NOTE: Update these credentials if your MySQL setup is different
 DB_CONFIG = {
@@ -11,13 +25,29 @@ DB_CONFIG = {
     # 'database': 'cyber_ids' # We connect without DB first to create it
 }
 
+# Connection pool used by every function below (see configure_pool); IDS_DB_POOL_SIZE sets its size
+POOL_CONFIG = {
+    'pool_size': int(os.environ.get('IDS_DB_POOL_SIZE', '5')),  # Connections kept open
+    'acquire_timeout': 5.0,         # Seconds a call waits for a free connection
+    'health_check_interval': 30.0,  # Connections idle longer than this are pinged before reuse
+    'retries': 2,                   # Extra attempts on transient errors (lost connection, deadlock, ...)
+    'retry_backoff': 0.05,          # Seconds before the first retry, doubled per attempt
+    'reuse_connections': True       # False closes each connection after its call (the pre-pool behaviour)
+}
+
+# Errors worth retrying on a fresh connection
+TRANSIENT_ERRORS = {
+    errorcode.CR_SERVER_GONE_ERROR, errorcode.CR_SERVER_LOST, errorcode.CR_CONN_HOST_ERROR,
+    errorcode.CR_CONNECTION_ERROR, errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT
+}
+
 def get_connection(with_db=True):
     """Creates a connection to the MySQL database."""
     try:
         config = DB_CONFIG.copy()
         if with_db:
             config['database'] = 'cyber_ids'
-        
+
         connection = mysql.connector.connect(**config)
         if connection.is_connected():
             return connection
@@ -25,11 +55,189 @@ def get_connection(with_db=True):
         print(f"❌ Error connecting to MySQL: {e}")
         return None
 
+class ConnectionPool:
+    def __init__(self, connect, pool_size=5, acquire_timeout=5.0, health_check_interval=30.0, reuse=True):
+        """
+        Bounded pool of open connections, created on demand up to pool_size.
+        :param connect: Called without arguments to open a new connection.
+        :param reuse: False closes every connection on release (no pooling, only the size bound).
+        """
+        self.connect = connect
+        self.pool_size = pool_size
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+        self.reuse = reuse
+        self._idle = queue.LifoQueue()  # (connection, released_at); most recently used first
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._lock = threading.Lock()
+
+        self.opened = 0
+        self.discarded = 0
+        self.health_checks = 0
+        self.waits = 0
+
+    def acquire(self):
+        """Returns an idle connection (pinged first if idle for long) or a new one; waits while all are in use."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.waits += 1
+            if not self._slots.acquire(timeout=self.acquire_timeout):
+                raise PoolError(f"No database connection free within {self.acquire_timeout}s")
+
+        try:
+            while True:
+                try:
+                    connection, released_at = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                if time.monotonic() - released_at < self.health_check_interval:
+                    return connection
+                with self._lock:
+                    self.health_checks += 1
+                try:
+                    connection.ping(reconnect=False)
+                    return connection
+                except Error:
+                    self._close(connection)
+
+            connection = self.connect()
+            with self._lock:
+                self.opened += 1
+            return connection
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, discard=False):
+        """Returns a connection to the pool; discard closes it instead (e.g. after a connection error)."""
+        if discard or not self.reuse:
+            self._close(connection)
+        else:
+            self._idle.put((connection, time.monotonic()))
+        self._slots.release()
+
+    def _close(self, connection):
+        with self._lock:
+            self.discarded += 1
+        try:
+            connection.close()
+        except Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+        except Error as e:
+            self.release(connection, discard=is_transient(e))
+            raise
+        except BaseException:
+            self.release(connection, discard=True)
+            raise
+        else:
+            self.release(connection)
+
+    def close_all(self):
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(connection)
+
+    def get_stats(self):
+        return {
+            'pool_size': self.pool_size,
+            'idle': self._idle.qsize(),
+            'opened': self.opened,
+            'discarded': self.discarded,
+            'health_checks': self.health_checks,
+            'waits': self.waits
+        }
+
+def is_transient(error):
+    return getattr(error, 'errno', None) in TRANSIENT_ERRORS
+
+def _connect():
+    config = DB_CONFIG.copy()
+    config['database'] = 'cyber_ids'
+    # Each statement commits on its own, so a reused connection never reads from a stale snapshot
+    config['autocommit'] = True
+    return mysql.connector.connect(**config)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """The shared pool, created on first use from POOL_CONFIG."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(_connect, POOL_CONFIG['pool_size'], POOL_CONFIG['acquire_timeout'],
+                                       POOL_CONFIG['health_check_interval'], POOL_CONFIG['reuse_connections'])
+    return _pool
+
+def configure_pool(**options):
+    """Updates POOL_CONFIG (e.g. pool_size=10) and replaces the pool; connections reopen on next use."""
+    global _pool
+    POOL_CONFIG.update(options)
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _pool = None
+
+# Per-function call timing: calls, errors, retries and total/max milliseconds
+_call_stats = defaultdict(lambda: {'calls': 0, 'errors': 0, 'retries': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+_stats_lock = threading.Lock()
+
+def _with_connection(name, work):
+    """
+    Runs work(connection) on a pooled connection, retrying transient errors on a fresh one.
+    Timing is recorded under name (see get_db_stats).
+    :return: Whatever work returns.
+    :raises Error: The last error, once retries are exhausted or on a non-transient error.
+    """
+    start = time.perf_counter()
+    attempt = 0
+    while True:
+        try:
+            with get_pool().connection() as connection:
+                result = work(connection)
+            _record(name, start, attempt, failed=False)
+            return result
+        except Error as e:
+            if not is_transient(e) or attempt >= POOL_CONFIG['retries']:
+                _record(name, start, attempt, failed=True)
+                raise
+            time.sleep(POOL_CONFIG['retry_backoff'] * 2 ** attempt)
+            attempt += 1
+
+def _record(name, start, retries, failed):
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    with _stats_lock:
+        stats = _call_stats[name]
+        stats['calls'] += 1
+        stats['errors'] += failed
+        stats['retries'] += retries
+        stats['total_ms'] += elapsed_ms
+        stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+
+def get_db_stats():
+    """Pool counters and per-function timing (mean/max ms)."""
+    with _stats_lock:
+        calls = {name: {'calls': s['calls'], 'errors': s['errors'], 'retries': s['retries'],
+                        'mean_ms': round(s['total_ms'] / s['calls'], 3) if s['calls'] else 0.0,
+                        'max_ms': round(s['max_ms'], 3)}
+                 for name, s in _call_stats.items()}
+    return {'pool': get_pool().get_stats(), 'calls': calls, 'blocklist': blocklist.get_stats()}
+
 def init_db():
     """Initializes the database and tables."""
     print("⚙️ Initializing MySQL Database...")
-    
-    # 1. Create Database if not exists
+
+    # 1. Create Database if not exists (the pool connects to cyber_ids, so this uses a plain connection)
     conn = get_connection(with_db=False)
     if conn:
         try:
@@ -43,205 +251,334 @@ def init_db():
             return
 
     # 2. Create Tables
-    conn = get_connection()
-    if conn:
+    def create_tables(conn):
+        cursor = conn.cursor()
+
+        # Traffic Logs Table (indexed, partitioned by day; see db_schema.py)
+        db_schema.ensure_traffic_logs(cursor)
+
+        # Blocked IPs Table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS blocked_ips (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                ip_address VARCHAR(45) UNIQUE,
+                blocked_at DATETIME,
+                reason VARCHAR(255)
+            )
+        """)
+        print("   - Table 'blocked_ips' checked/created.")
+        cursor.close()
+
+    try:
+        _with_connection('init_db', create_tables)
+    except Error as e:
+        print(f"❌ Error creating tables: {e}")
+        return
+
+    # 3. Statistics counters (persisted rollup), then retention
+    load_stats()
+    load_blocklist()
+    maintain_partitions()
+    print("✅ Database initialization complete.")
+
+LOG_INSERT = """INSERT INTO traffic_logs
+                (timestamp, src_ip, dst_ip, protocol, service, prediction, confidence, threat_level, is_blocked)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)"""
+
+@lru_cache(maxsize=65536)
+def pack_ip(address):
+    """IP address text -> the 4 (IPv4) or 16 (IPv6) bytes stored in traffic_logs, as INET6_ATON; None if not an IP."""
+    if not address:
+        return None
+    for family in (socket.AF_INET, socket.AF_INET6):
         try:
-            cursor = conn.cursor()
-            
-            # Traffic Logs Table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS traffic_logs (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    timestamp DATETIME,
-                    src_ip VARCHAR(45),
-                    dst_ip VARCHAR(45),
-                    protocol VARCHAR(20),
-                    service VARCHAR(20),
-                    prediction VARCHAR(50),
-                    confidence FLOAT,
-                    threat_level VARCHAR(20),
-                    is_blocked BOOLEAN
-                )
-            """)
-            print("   - Table 'traffic_logs' checked/created.")
-
-            # Blocked IPs Table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS blocked_ips (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    ip_address VARCHAR(45) UNIQUE,
-                    blocked_at DATETIME,
-                    reason VARCHAR(255)
-                )
-            """)
-            print("   - Table 'blocked_ips' checked/created.")
-            
-            cursor.close()
-            conn.close()
-            print("✅ Database initialization complete.")
-        except Error as e:
-            print(f"❌ Error creating tables: {e}")
+            return socket.inet_pton(family, address)
+        except OSError:
+            pass
+    return None
+
+# (kind, name) -> log_labels code, filled on first use of each label
+_label_codes = {}
+
+def _label_code(cursor, kind, name):
+    if name is None:
+        return None
+    key = (kind, str(name))
+    try:
+        return _label_codes[key]
+    except KeyError:
+        pass
+    cursor.execute("INSERT IGNORE INTO log_labels (kind, name) VALUES (%s, %s)", key)
+    cursor.execute("SELECT code FROM log_labels WHERE kind = %s AND name = %s", key)
+    code = cursor.fetchone()[0]
+    _label_codes[key] = code
+    return code
+
+def _encode_row(cursor, row):
+    # log_row values -> traffic_logs columns (packed IPs, label codes)
+    timestamp, src_ip, dst_ip, protocol, service, prediction, confidence, threat_level, blocked = row
+    return (timestamp, pack_ip(src_ip), pack_ip(dst_ip), _label_code(cursor, 'protocol', protocol),
+            _label_code(cursor, 'service', service), _label_code(cursor, 'prediction', prediction), confidence,
+            _label_code(cursor, 'threat_level', threat_level), blocked)
+
+# Counters behind get_stats(), updated by the write functions below
+traffic_stats = TrafficStats()
+# In-memory blocked_ips (see block_ip / is_blocked), loaded once
+blocklist = Blocklist()
+
+# Optional TrafficLogWriter (log_writer.py): log_traffic then queues entries for batched background inserts
+log_writer = None
+
+def use_log_writer(writer):
+    """Routes log_traffic through a started TrafficLogWriter (None: insert synchronously again)."""
+    global log_writer
+    log_writer = writer
+
+def log_row(log_entry):
+    """The traffic_logs values of a log entry, in LOG_INSERT order."""
+    return (
+        log_entry['timestamp'],
+        log_entry['src_ip'],
+        log_entry['dst_ip'],
+        log_entry['protocol'],
+        log_entry['service'],
+        log_entry['prediction'],
+        log_entry['confidence'],
+        log_entry['threat_level'],
+        log_entry['blocked']
+    )
 
 def log_traffic(log_entry):
-    """Inserts a traffic log entry into the database."""
-    # print("DEBUG: Attempting to log traffic...")
-    conn = get_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            sql = """INSERT INTO traffic_logs 
-                     (timestamp, src_ip, dst_ip, protocol, service, prediction, confidence, threat_level, is_blocked) 
-                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)"""
-            val = (
-                log_entry['timestamp'],
-                log_entry['src_ip'],
-                log_entry['dst_ip'],
-                log_entry['protocol'],
-                log_entry['service'],
-                log_entry['prediction'],
-                log_entry['confidence'],
-                log_entry['threat_level'],
-                log_entry['blocked']
-            )
-            cursor.execute(sql, val)
-            conn.commit()
-            cursor.close()
-            conn.close()
-            # print("DEBUG: Traffic logged successfully.")
-        except Error as e:
-            print(f"⚠️ Failed to log traffic: {e}")
-    else:
-        print("DEBUG: Failed to get DB connection in log_traffic")
+    """Inserts a traffic log entry into the database (queued, if a log writer is in use)."""
+    writer = log_writer
+    if writer is not None:
+        writer.submit(log_entry)
+        return
+    if not traffic_stats.loaded:
+        load_stats()  # Before the first write, so the rollup's one-time full count cannot include it
+
+    def insert(conn):
+        cursor = conn.cursor()
+        cursor.execute(LOG_INSERT, _encode_row(cursor, log_row(log_entry)))
+        traffic_stats.add_logs([log_entry['prediction']])
+        cursor.close()
+
+    try:
+        _with_connection('log_traffic', insert)
+    except Error as e:
+        print(f"⚠️ Failed to log traffic: {e}")
+
+def log_traffic_batch(rows):
+    """
+    Inserts many log rows (see log_row) in one statement.
+    :return: True if they were written.
+    """
+    if not traffic_stats.loaded:
+        load_stats()  # See log_traffic
+
+    def insert(conn):
+        cursor = conn.cursor()
+        encoded = [_encode_row(cursor, row) for row in rows]
+        cursor.executemany(LOG_INSERT, encoded)  # Sent as a single multi-row INSERT
+        traffic_stats.add_logs([row[5] for row in rows])
+        cursor.close()
+
+    try:
+        _with_connection('log_traffic_batch', insert)
+        return True
+    except Error as e:
+        print(f"⚠️ Failed to log {len(rows)} traffic entries: {e}")
+        return False
 
 def block_ip(ip_address, reason="Malicious Activity"):
-    """Adds an IP to the blocklist."""
-    conn = get_connection()
-    if conn:
-        try:
-            cursor = conn.cursor()
-            sql = "INSERT IGNORE INTO blocked_ips (ip_address, blocked_at, reason) VALUES (%s, %s, %s)"
-            val = (ip_address, datetime.now(), reason)
-            cursor.execute(sql, val)
-            conn.commit()
-            cursor.close()
-            conn.close()
-        except Error as e:
-            print(f"⚠️ Failed to block IP: {e}")
+    """
+    Adds an IP, or a CIDR range such as '203.0.113.0/24', to the blocklist.
+    Addresses and ranges already blocked (by themselves or a wider range) cost no database write.
+    """
+    if not blocklist.loaded:
+        load_blocklist()
+    if blocklist.contains(ip_address):
+        return
+    entry = parse_entry(ip_address)
+    if entry is None:
+        print(f"⚠️ Failed to block IP: {ip_address!r} is not an IP address or CIDR range")
+        return
+    if blocklist.covers(entry):
+        return
+    ip_address = str(entry)
+    blocked_at = datetime.now()
+
+    def insert(conn):
+        cursor = conn.cursor()
+        sql = "INSERT IGNORE INTO blocked_ips (ip_address, blocked_at, reason) VALUES (%s, %s, %s)"
+        val = (ip_address, blocked_at, reason)
+        cursor.execute(sql, val)
+        if cursor.rowcount == 1:  # 0: already blocked (e.g. by another thread or process)
+            traffic_stats.add_blocked()
+        cursor.close()
+
+    try:
+        _with_connection('block_ip', insert)
+        # Write-through: only once stored, so a failed write is retried on the next verdict
+        blocklist.add(ip_address, blocked_at, reason)
+    except Error as e:
+        print(f"⚠️ Failed to block IP: {e}")
+
+def is_blocked(ip_address):
+    """True if the address is blocked, by itself or by a blocked CIDR range (answered from memory)."""
+    if not blocklist.loaded:
+        load_blocklist()
+    return blocklist.contains(ip_address)
+
+def load_blocklist():
+    """Loads blocked_ips into the in-memory blocklist (at startup; later blocks are written through)."""
+    def fetch(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT ip_address, blocked_at, reason FROM blocked_ips ORDER BY blocked_at, id")
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+
+    try:
+        blocklist.load(_with_connection('load_blocklist', fetch))
+    except Error as e:
+        print(f"⚠️ Failed to load blocked IPs: {e}")
+
+def _fetch_logs(conn, limit):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("SELECT * FROM traffic_log_view ORDER BY id DESC LIMIT %s", (int(limit),))
+    logs = cursor.fetchall()
+    cursor.close()
+
+    # Convert datetime to string for JSON serialization
+    for row in logs:
+        row['timestamp'] = row['timestamp'].isoformat() if row['timestamp'] else ""
+    return logs
 
 def get_recent_logs(limit=10):
     """Fetches the most recent traffic logs."""
-    conn = get_connection()
-    logs = []
-    if conn:
-        try:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute(f"SELECT * FROM traffic_logs ORDER BY id DESC LIMIT {limit}")
-            results = cursor.fetchall()
-            
-            # Convert datetime to string for JSON serialization
-            for row in results:
-                row['timestamp'] = row['timestamp'].isoformat() if row['timestamp'] else ""
-                logs.append(row)
-                
-            cursor.close()
-            conn.close()
-        except Error as e:
-            print(f"⚠️ Failed to fetch logs: {e}")
-    return logs
+    try:
+        return _with_connection('get_recent_logs', lambda conn: _fetch_logs(conn, limit))
+    except Error as e:
+        print(f"⚠️ Failed to fetch logs: {e}")
+        return []
 
 def get_all_logs(limit=100):
     """Fetches traffic logs for the database viewer."""
-    conn = get_connection()
-    logs = []
-    if conn:
-        try:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute(f"SELECT * FROM traffic_logs ORDER BY id DESC LIMIT {limit}")
-            results = cursor.fetchall()
-            
-            for row in results:
-                row['timestamp'] = row['timestamp'].isoformat() if row['timestamp'] else ""
-                logs.append(row)
-                
-            cursor.close()
-            conn.close()
-        except Error as e:
-            print(f"⚠️ Failed to fetch logs: {e}")
-    return logs
+    try:
+        return _with_connection('get_all_logs', lambda conn: _fetch_logs(conn, limit))
+    except Error as e:
+        print(f"⚠️ Failed to fetch logs: {e}")
+        return []
 
 def get_blocked_ips_details():
     """Fetches all blocked IPs with details."""
-    conn = get_connection()
-    ips = []
-    if conn:
-        try:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT * FROM blocked_ips ORDER BY blocked_at DESC")
-            results = cursor.fetchall()
-            
-            for row in results:
-                row['blocked_at'] = row['blocked_at'].isoformat() if row['blocked_at'] else ""
-                ips.append(row)
-                
-            cursor.close()
-            conn.close()
-        except Error as e:
-            print(f"⚠️ Failed to fetch blocked IPs: {e}")
-    return ips
+    def fetch(conn):
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM blocked_ips ORDER BY blocked_at DESC")
+        ips = cursor.fetchall()
+        cursor.close()
+        for row in ips:
+            row['blocked_at'] = row['blocked_at'].isoformat() if row['blocked_at'] else ""
+        return ips
 
-def get_blocked_ips():
-    """Fetches just the list of blocked IP addresses (for the firewall)."""
-    conn = get_connection()
-    ips = []
-    if conn:
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT ip_address FROM blocked_ips ORDER BY blocked_at DESC")
-            results = cursor.fetchall()
-            ips = [row[0] for row in results]
-            cursor.close()
-            conn.close()
-        except Error as e:
-            print(f"⚠️ Failed to fetch blocked IPs: {e}")
-    return ips
+    try:
+        return _with_connection('get_blocked_ips_details', fetch)
+    except Error as e:
+        print(f"⚠️ Failed to fetch blocked IPs: {e}")
+        return []
+
+def get_blocked_ips(limit=None):
+    """Blocked IP addresses and ranges, most recent first (for the firewall), from the in-memory blocklist."""
+    if not blocklist.loaded:
+        load_blocklist()
+    return blocklist.recent(limit)
 
 def get_stats():
-    """Fetches statistics from the database."""
-    # print("DEBUG: Fetching stats...")
-    conn = get_connection()
-    stats = {
-        'total_traffic': 0,
-        'malicious_count': 0,
-        'blocked_count': 0,
-        'threat_distribution': {}
-    }
-    if conn:
-        try:
-            cursor = conn.cursor()
-            
-            # Total Traffic
-            cursor.execute("SELECT COUNT(*) FROM traffic_logs")
-            stats['total_traffic'] = cursor.fetchone()[0]
-            # print(f"DEBUG: Total traffic fetched: {stats['total_traffic']}")
-            
-            # Malicious Count
-            cursor.execute("SELECT COUNT(*) FROM traffic_logs WHERE prediction != 'Normal'")
-            stats['malicious_count'] = cursor.fetchone()[0]
-            
-            # Blocked Count
-            cursor.execute("SELECT COUNT(*) FROM blocked_ips")
-            stats['blocked_count'] = cursor.fetchone()[0]
-            
-            # Threat Distribution
-            cursor.execute("SELECT prediction, COUNT(*) FROM traffic_logs GROUP BY prediction")
-            results = cursor.fetchall()
-            for row in results:
-                stats['threat_distribution'][row[0]] = row[1]
-                
-            cursor.close()
-            conn.close()
-        except Error as e:
-            print(f"⚠️ Failed to fetch stats: {e}")
-    else:
-        print("DEBUG: Failed to get DB connection in get_stats")
-    return stats
+    """Returns traffic statistics from the running counters (loaded from the database on first use)."""
+    if not traffic_stats.loaded:
+        load_stats()
+    return traffic_stats.snapshot()
+
+def load_stats():
+    """Reads the statistics counters from the persisted rollup (building it from a full count the first time)."""
+    try:
+        _with_connection('load_stats', _load_stats)
+    except Error as e:
+        print(f"⚠️ Failed to load stats: {e}")
+
+def _load_stats(conn):
+    traffic_stats.load(conn)
+
+def persist_stats():
+    """Adds this process's counted rows to the rollup (called periodically and on shutdown)."""
+    if not traffic_stats.loaded:
+        load_stats()  # The rollup must exist before anything is added to it
+        if not traffic_stats.loaded:
+            return  # Kept pending for the next call
+    try:
+        _with_connection('persist_stats', traffic_stats.persist)
+    except Error as e:
+        print(f"⚠️ Failed to persist stats: {e}")
+
+def maintain_partitions():
+    """Adds upcoming daily traffic_logs partitions and drops expired ones (see db_schema.maintain_partitions)."""
+    removed = Counter()
+
+    def count_expired(cursor, partitions):
+        # Rows the drop removes, whichever process wrote them
+        removed.clear()
+        cursor.execute(f"""SELECT l.name, c.count
+                           FROM (SELECT prediction, COUNT(*) AS count FROM traffic_logs PARTITION ({', '.join(partitions)})
+                                 GROUP BY prediction) c
+                           JOIN log_labels l ON l.code = c.prediction""")
+        removed.update(dict(cursor.fetchall()))
+
+    def maintain(conn):
+        cursor = conn.cursor()
+        added, dropped = db_schema.maintain_partitions(cursor, before_drop=count_expired)
+        cursor.close()
+        return added, dropped
+
+    if not traffic_stats.loaded:
+        load_stats()  # So that the rollup the drop is subtracted from exists
+    try:
+        added, dropped = _with_connection('maintain_partitions', maintain)
+        if dropped:
+            print(f"🧹 Dropped expired traffic log partitions: {', '.join(dropped)}")
+            traffic_stats.remove_logs(removed)
+            persist_stats()
+        return added, dropped
+    except Error as e:
+        print(f"⚠️ Failed to maintain traffic log partitions: {e}")
+        return [], []
+
+class PeriodicJob:
+    def __init__(self, function, interval):
+        """
+        Background thread calling function every interval seconds, e.g.
+        PeriodicJob(maintain_partitions, 3600) for retention or PeriodicJob(persist_stats, 10).
+        """
+        self.function = function
+        self.interval = interval
+        self.is_running = False
+        self.thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.is_running = False
+        self._stop.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.function()
@@ -0,0 +1,192 @@
+import os
+from datetime import date, datetime, timedelta
+
+# traffic_logs layout: IPs as VARBINARY(16) (4 bytes for IPv4, 16 for IPv6, as INET6_ATON stores them),
+# labels as SMALLINT codes into log_labels, one partition per day so retention drops whole days.
+# traffic_log_view decodes both back to the original column names and values for readers.
+
+# Days of traffic_logs kept; older daily partitions are dropped by maintain_partitions
+LOG_RETENTION_DAYS = int(os.environ.get('IDS_LOG_RETENTION_DAYS', '30'))
+# Daily partitions created ahead of time (later rows land in the catch-all pmax until the next run)
+PARTITION_DAYS_AHEAD = 7
+# Rows copied per statement when migrating a legacy (VARCHAR) traffic_logs table
+MIGRATION_CHUNK = 50000
+
+LABEL_KINDS = ('protocol', 'service', 'prediction', 'threat_level')
+
+LABELS_TABLE = """
+    CREATE TABLE IF NOT EXISTS log_labels (
+        code SMALLINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+        kind VARCHAR(20) NOT NULL,
+        name VARCHAR(50) NOT NULL,
+        UNIQUE KEY kind_name (kind, name)
+    )
+"""
+
+# Every unique key of a partitioned table must contain the partitioning column, hence (id, timestamp)
+TRAFFIC_LOGS_TABLE = """
+    CREATE TABLE {table} (
+        id BIGINT UNSIGNED AUTO_INCREMENT,
+        timestamp DATETIME NOT NULL,
+        src_ip VARBINARY(16),
+        dst_ip VARBINARY(16),
+        protocol SMALLINT UNSIGNED,
+        service SMALLINT UNSIGNED,
+        prediction SMALLINT UNSIGNED,
+        confidence FLOAT,
+        threat_level SMALLINT UNSIGNED,
+        is_blocked BOOLEAN,
+        PRIMARY KEY (id, timestamp),
+        KEY timestamp_idx (timestamp),
+        KEY src_ip_idx (src_ip, timestamp),
+        KEY prediction_idx (prediction, timestamp)
+    )
+    PARTITION BY RANGE (TO_DAYS(timestamp)) ({partitions})
+"""
+
+# Persisted get_stats() counters (see stats_rollup.py) and the marker of their one-time build from a full count
+STATS_TABLES = (
+    """
+    CREATE TABLE IF NOT EXISTS traffic_stats_rollup (
+        prediction VARCHAR(50) PRIMARY KEY,
+        count BIGINT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS traffic_stats_built (
+        id TINYINT PRIMARY KEY,
+        built_at DATETIME NOT NULL
+    )
+    """
+)
+
+TRAFFIC_LOG_VIEW = """
+    CREATE OR REPLACE VIEW traffic_log_view AS
+    SELECT t.id, t.timestamp, INET6_NTOA(t.src_ip) AS src_ip, INET6_NTOA(t.dst_ip) AS dst_ip,
+           p.name AS protocol, s.name AS service, pr.name AS prediction, t.confidence,
+           tl.name AS threat_level, t.is_blocked
+    FROM traffic_logs t
+    LEFT JOIN log_labels p ON p.code = t.protocol
+    LEFT JOIN log_labels s ON s.code = t.service
+    LEFT JOIN log_labels pr ON pr.code = t.prediction
+    LEFT JOIN log_labels tl ON tl.code = t.threat_level
+"""
+
+COPY_LEGACY_LOGS = """
+    INSERT INTO traffic_logs_new
+        (id, timestamp, src_ip, dst_ip, protocol, service, prediction, confidence, threat_level, is_blocked)
+    SELECT t.id, COALESCE(t.timestamp, '1970-01-01'), INET6_ATON(t.src_ip), INET6_ATON(t.dst_ip),
+           p.code, s.code, pr.code, t.confidence, tl.code, t.is_blocked
+    FROM traffic_logs t
+    LEFT JOIN log_labels p ON p.kind = 'protocol' AND p.name = t.protocol
+    LEFT JOIN log_labels s ON s.kind = 'service' AND s.name = t.service
+    LEFT JOIN log_labels pr ON pr.kind = 'prediction' AND pr.name = t.prediction
+    LEFT JOIN log_labels tl ON tl.kind = 'threat_level' AND tl.name = t.threat_level
+    WHERE t.id >= %s AND t.id < %s
+"""
+
+def partition_name(day):
+    return f"p{day:%Y%m%d}"
+
+def _daily_partitions(first_day, last_day):
+    """PARTITION clauses holding one day each, first_day..last_day inclusive."""
+    clauses = []
+    day = first_day
+    while day <= last_day:
+        clauses.append(f"PARTITION {partition_name(day)} VALUES LESS THAN (TO_DAYS('{day + timedelta(days=1)}'))")
+        day += timedelta(days=1)
+    return clauses
+
+def _create_traffic_logs(cursor, table, first_day):
+    # p0 takes anything older than first_day; pmax anything beyond the pre-created days
+    partitions = ([f"PARTITION p0 VALUES LESS THAN (TO_DAYS('{first_day}'))"] +
+                  _daily_partitions(first_day, date.today() + timedelta(days=PARTITION_DAYS_AHEAD)) +
+                  ["PARTITION pmax VALUES LESS THAN MAXVALUE"])
+    cursor.execute(TRAFFIC_LOGS_TABLE.format(table=table, partitions=",\n        ".join(partitions)))
+
+def _text(value):
+    # information_schema strings may come back as bytes, depending on the connector
+    return value.decode() if isinstance(value, (bytes, bytearray)) else value
+
+def _traffic_logs_ip_type(cursor):
+    cursor.execute("""SELECT DATA_TYPE FROM information_schema.COLUMNS
+                      WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'traffic_logs' AND COLUMN_NAME = 'src_ip'""")
+    row = cursor.fetchone()
+    return _text(row[0]).lower() if row else None
+
+def ensure_traffic_logs(cursor, retention_days=LOG_RETENTION_DAYS):
+    """Creates log_labels, traffic_logs (migrating a legacy one), traffic_log_view and the stats rollup tables."""
+    cursor.execute(LABELS_TABLE)
+
+    ip_type = _traffic_logs_ip_type(cursor)
+    if ip_type is None:
+        _create_traffic_logs(cursor, 'traffic_logs', date.today())
+    elif ip_type != 'varbinary':
+        migrate_legacy_logs(cursor, retention_days)
+    print("   - Table 'traffic_logs' checked/created.")
+
+    cursor.execute(TRAFFIC_LOG_VIEW)
+    for statement in STATS_TABLES:
+        cursor.execute(statement)
+    cursor.execute("DROP TABLE IF EXISTS traffic_stats_watermark")  # Id-based predecessor of traffic_stats_built
+
+def migrate_legacy_logs(cursor, retention_days=LOG_RETENTION_DAYS):
+    """
+    Copies a VARCHAR-layout traffic_logs into the new layout (in id chunks), then swaps the tables.
+    The old table is kept as traffic_logs_legacy.
+    """
+    print("   - Migrating 'traffic_logs' to binary IPs, label codes and daily partitions...")
+    cursor.execute("DROP TABLE IF EXISTS traffic_logs_new")  # Left over from an interrupted migration
+    cursor.execute("SELECT MIN(timestamp), MIN(id), MAX(id) FROM traffic_logs")
+    oldest, first_id, last_id = cursor.fetchone()
+    first_day = date.today()
+    if oldest is not None:
+        first_day = max(oldest.date(), date.today() - timedelta(days=retention_days))
+    _create_traffic_logs(cursor, 'traffic_logs_new', first_day)
+
+    for kind in LABEL_KINDS:
+        cursor.execute(f"""INSERT IGNORE INTO log_labels (kind, name)
+                           SELECT DISTINCT '{kind}', {kind} FROM traffic_logs WHERE {kind} IS NOT NULL""")
+
+    copied = 0
+    if first_id is not None:
+        for start in range(first_id, last_id + 1, MIGRATION_CHUNK):
+            cursor.execute(COPY_LEGACY_LOGS, (start, start + MIGRATION_CHUNK))
+            copied += cursor.rowcount
+
+    cursor.execute("RENAME TABLE traffic_logs TO traffic_logs_legacy, traffic_logs_new TO traffic_logs")
+    print(f"   - Migrated {copied} rows; the old table is kept as 'traffic_logs_legacy' (drop it once verified).")
+
+def maintain_partitions(cursor, retention_days=LOG_RETENTION_DAYS, days_ahead=PARTITION_DAYS_AHEAD, before_drop=None):
+    """
+    Creates the daily partitions up to days_ahead from today and drops those older than retention_days.
+    Dropping a partition discards its rows at once, without the row-by-row cost of a DELETE.
+    :param before_drop: Optional callable(cursor, partition names) run before expired partitions are dropped.
+    :return: (names added, names dropped)
+    """
+    cursor.execute("""SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS
+                      WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'traffic_logs' AND PARTITION_NAME IS NOT NULL""")
+    partitions = {_text(name): _text(description) for name, description in cursor.fetchall()}
+    if 'pmax' not in partitions:
+        return [], []  # Not the partitioned layout
+
+    today = date.today()
+    cutoff = today - timedelta(days=retention_days)
+    days = sorted(datetime.strptime(name[1:], '%Y%m%d').date() for name in partitions if name not in ('p0', 'pmax'))
+
+    # Split the new days off the (normally empty) catch-all partition
+    first_new = max(days[-1] + timedelta(days=1), cutoff) if days else today
+    added = _daily_partitions(first_new, today + timedelta(days=days_ahead))
+    if added:
+        cursor.execute("ALTER TABLE traffic_logs REORGANIZE PARTITION pmax INTO (" +
+                       ", ".join(added + ["PARTITION pmax VALUES LESS THAN MAXVALUE"]) + ")")
+
+    cursor.execute("SELECT TO_DAYS(%s)", (cutoff,))
+    cutoff_days = cursor.fetchone()[0]
+    expired = ['p0'] if 'p0' in partitions and int(partitions['p0']) <= cutoff_days else []
+    expired += [partition_name(day) for day in days if day < cutoff]
+    if expired:
+        if before_drop is not None:
+            before_drop(cursor, expired)
+        cursor.execute(f"ALTER TABLE traffic_logs DROP PARTITION {', '.join(expired)}")
+    return [clause.split()[1] for clause in added], expired
@@ -24,7 +24,7 @@ try:
             
             # Get Recent Logs
             print("\n📝 Last 5 Log Entries:")
-            cursor.execute("SELECT timestamp, src_ip, dst_ip, prediction FROM traffic_logs ORDER BY id DESC LIMIT 5")
+            cursor.execute("SELECT timestamp, src_ip, dst_ip, prediction FROM traffic_log_view ORDER BY id DESC LIMIT 5")
             logs = cursor.fetchall()
             for log in logs:
                 print(f"   - [{log[0]}] {log[1]} -> {log[2]} : {log[3]}")
@@ -0,0 +1,489 @@
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import joblib
+import numpy as np
+
+import records
+from feature_encoder import FeatureEncoder, load_vocabulary
+from artifacts import ArrayScaler
+from forest import FlatForest
+from inference_pool import PoolBusyError
+from model_registry import ModelRegistry, read_manifest, version_dir
+from nn_runtime import NumpyModel
+from verdict_cache import VerdictCache
+
+MODELS_DIR = 'models'
+# Versioned model store (see model_registry.py); without an active version, MODELS_DIR itself is used
+MODEL_STORE = os.path.join(MODELS_DIR, 'registry')
+
+def load_dl_model(model_dir, name):
+    """
+    Loads <model_dir>/<name>/ (memory-mapped, see artifacts.py) or <name>.npz with the numpy runtime
+    (no TensorFlow needed). Falls back to the Keras .h5 when no export exists (see nn_runtime.py).
+    """
+    path = os.path.join(model_dir, name)
+    if os.path.isdir(path):
+        return NumpyModel(path)
+    if os.path.exists(path + '.npz'):
+        return NumpyModel(path + '.npz')
+    import tensorflow as tf
+    return tf.keras.models.load_model(path + '.h5')
+
+def load_forest(model_dir):
+    """fl_ids_model/ memory-mapped if exported (python artifacts.py), else compiled from the pickle."""
+    path = os.path.join(model_dir, 'fl_ids_model')
+    if os.path.isdir(path):
+        return FlatForest.load(path)
+    return FlatForest.from_sklearn(joblib.load(path + '.pkl'))
+
+def load_scaler(model_dir, name):
+    """<name>/ as an ArrayScaler if exported, else the pickled StandardScaler."""
+    path = os.path.join(model_dir, name)
+    if os.path.isdir(path):
+        return ArrayScaler.load(path)
+    return joblib.load(path + '.pkl')
+
+def _warm_up_dl(dl_model):
+    dl_model.predict_on_batch(np.zeros((1, 1, records.NUM_FEATURES), dtype=np.float32))
+
+def _warm_up_encoder(encoder):
+    encoder.encode(np.zeros((1, records.NUM_FEATURES)))
+
+def build_registry(model_dir, version):
+    """Registers every model component of one version, loaded from model_dir on first use."""
+    registry = ModelRegistry(version)
+    feature_names = os.path.join(model_dir, 'feature_names.pkl')
+
+    # Same verdicts as the sklearn RF, without its per-call overhead
+    registry.register('forest', lambda: load_forest(model_dir),
+                      warm_up=lambda forest: forest.predict_proba(np.zeros((1, records.NUM_FEATURES))))
+    registry.register('scaler', lambda: load_scaler(model_dir, 'scaler'))
+    # Record rows -> model input (categorical codes from training, model column order)
+    registry.register('rf_encoder', lambda: FeatureEncoder(
+        load_vocabulary(os.path.join(model_dir, 'categorical_vocab.pkl')), joblib.load(feature_names)),
+                      warm_up=_warm_up_encoder)
+    registry.register('cnn', lambda: load_dl_model(model_dir, 'cnn_ids_model'), warm_up=_warm_up_dl)
+    registry.register('lstm', lambda: load_dl_model(model_dir, 'lstm_ids_model'), warm_up=_warm_up_dl)
+    registry.register('scaler_dl', lambda: load_scaler(model_dir, 'scaler_dl'))
+    registry.register('dl_encoder', lambda: FeatureEncoder(
+        load_vocabulary(os.path.join(model_dir, 'categorical_vocab_dl.pkl')), joblib.load(feature_names)),
+                      warm_up=_warm_up_encoder)
+    return registry
+
+def resolve_version(version=None):
+    """
+    :param version: A published version, 'unversioned' (models/ itself) or None for the store's active one.
+    :return: (model_dir, version); ('models', 'unversioned') when the store has no active version.
+    """
+    manifest = read_manifest(MODEL_STORE)
+    version = version or manifest['active']
+    if version is None or version == 'unversioned':
+        return MODELS_DIR, 'unversioned'
+    if version not in manifest['versions']:
+        raise ValueError(f"Unknown model version: {version}")
+    return version_dir(MODEL_STORE, version), version
+
+# Shared by every predict_batch call; emptied whenever the models are (re)loaded
+verdict_cache = VerdictCache(max_entries=100000, ttl=60.0)
+
+# Model components load on first use, so importing this module stays cheap (workers, tools, replay).
+# Set IDS_EAGER_MODELS=1 to load and warm up everything in load_models() instead.
+EAGER_LOAD = os.environ.get('IDS_EAGER_MODELS', '0') == '1'
+
+# The serving model version. Replaced as a whole (one reference assignment) on reload; a batch takes
+# the reference once, so it is scored by a single version even while a reload swaps it.
+models = build_registry(*resolve_version())
+
+def load_models(eager=EAGER_LOAD, version=None):
+    """
+    (Re)loads the RF, scalers and CNN/LSTM and invalidates cached verdicts.
+    :param eager: Load every component and run its warm-up inference now, instead of on first use.
+    :param version: Model version to serve (default: the store's active version).
+    """
+    global models
+    registry = build_registry(*resolve_version(version))
+    if eager:
+        if registry.load_all():
+            print("✅ All Models (RF, CNN, LSTM) loaded successfully!")
+        registry.warm_up()
+    models = registry
+    verdict_cache.clear()
+
+reload_state = {'status': 'idle', 'version': None, 'error': None, 'seconds': None}
+_reload_lock = threading.Lock()
+
+def reload_models(version=None, wait=False):
+    """
+    Hot reload: loads a version (default: the store's active one) in a background thread, warms it up
+    and only then swaps it in. Detection keeps running on the old version meanwhile; a version that
+    fails to load is never swapped in.
+    :param wait: Block until the reload finished.
+    :return: The reload thread.
+    """
+    thread = threading.Thread(target=_reload, args=(version,), daemon=True)
+    thread.start()
+    if wait:
+        thread.join()
+    return thread
+
+def _reload(version):
+    global models
+    with _reload_lock:  # One reload at a time
+        start = time.perf_counter()
+        reload_state.update(status='loading', version=version, error=None, seconds=None)
+        try:
+            registry = build_registry(*resolve_version(version))
+            if not registry.load_all():
+                raise RuntimeError(f"components failed to load: {registry.get_stats()['errors']}")
+            registry.warm_up()
+        except Exception as e:
+            reload_state.update(status='failed', error=str(e), seconds=round(time.perf_counter() - start, 3))
+            print(f"⚠️  Model reload failed, still serving version {models.version}: {e}")
+            return
+
+        previous = models.version
+        models = registry
+        # Cached outputs carry their version, so stale entries are never served; this just frees them
+        verdict_cache.clear()
+        reload_state.update(status='done', version=registry.version, seconds=round(time.perf_counter() - start, 3))
+        print(f"✅ Model version {registry.version} active (was {previous})")
+
+class ModelWatcher:
+    def __init__(self, interval=5.0):
+        """Background thread that hot-reloads when the store's active version changes (see model_registry.py)."""
+        self.interval = interval
+        self.is_running = False
+        self.thread = None
+        self._failed = None  # Active version whose reload failed; retried only once the manifest changes
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.is_running = False
+        if self.thread:
+            self.thread.join(timeout=self.interval + 1)
+
+    def _run(self):
+        while self.is_running:
+            time.sleep(self.interval)
+            try:
+                active = read_manifest(MODEL_STORE)['active']
+            except Exception as e:
+                print(f"⚠️ Model manifest unreadable: {e}")
+                continue
+            if active is None or active == models.version or active == self._failed:
+                continue
+            reload_models(active, wait=True)
+            self._failed = active if models.version != active else None
+
+# Optional InferencePool (inference_pool.py): model scoring then runs in its worker processes
+inference_pool = None
+
+def use_inference_pool(pool):
+    """Routes the model scoring of predict_batch through a started InferencePool (None: score in-process)."""
+    global inference_pool
+    inference_pool = pool
+
+def get_model_stats():
+    """Returns the serving version, its loaded components (load / warm-up ms) and the last reload."""
+    stats = models.get_stats()
+    # Which categorical codes each loaded encoder uses (see feature_encoder.load_vocabulary)
+    stats['vocabulary'] = {name: 'kdd-fallback' if models.get(name).fallback else 'trained'
+                           for name in ('rf_encoder', 'dl_encoder')
+                           if models.is_loaded(name) and models.get(name) is not None}
+    stats['reload'] = dict(reload_state)
+    manifest = read_manifest(MODEL_STORE)
+    stats['store'] = {'active': manifest['active'], 'versions': sorted(manifest['versions'])}
+    return stats
+
+def as_record(traffic):
+    """Accepts a record (numpy.void of RECORD_DTYPE) or a legacy feature dictionary."""
+    return records.from_dict(traffic) if isinstance(traffic, dict) else traffic
+
+def make_log_entry(traffic, prediction):
+    """Builds the traffic_logs entry for a scored record."""
+    traffic = as_record(traffic)
+    return {
+        'timestamp': datetime.fromtimestamp(traffic['timestamp']).isoformat(),
+        'src_ip': traffic['src_ip'],
+        'dst_ip': traffic['dst_ip'],
+        'protocol': traffic['protocol_type'],
+        'service': traffic['service'],
+        'prediction': prediction['prediction'],
+        'confidence': prediction['confidence'],
+        'threat_level': prediction.get('threat_level', 'Low'),
+        'blocked': False,
+        'rqa_rr': float(traffic['rqa_rr']),
+        'rqa_det': float(traffic['rqa_det']),
+        'model_version': prediction.get('details', {}).get('model_version')
+    }
+
+THREAT_TYPES = ['Normal', 'DoS', 'Probe', 'R2L', 'U2R', 'Unknown']
+RQA_ANOMALY = "Anomaly (RQA)"
+
+# Cascade: the CNN/LSTM ensemble only sees rows the RF is unsure about or flags as non-Normal
+CASCADE_THRESHOLD = 0.9
+tier_counts = Counter()  # Rows per tier: 'cache' (answered from cache), 'rf' (scored), 'ensemble' (escalated)
+_tier_lock = threading.Lock()
+
+def get_tier_stats():
+    """Returns how many rows each inference tier scored."""
+    with _tier_lock:
+        cache, rf, ensemble = tier_counts['cache'], tier_counts['rf'], tier_counts['ensemble']
+    return {'cache': cache, 'rf': rf, 'ensemble': ensemble,
+            'ensemble_rate': round(ensemble / rf, 4) if rf else 0.0}
+
+def _score_models(models, features, cascade, threshold):
+    """
+    Runs the RF and, for the rows it escalates, the CNN/LSTM ensemble of one model version.
+    :param models: The ModelRegistry of that version.
+    :return: (rf_index, rf_confidence, dl_index, dl_confidence, escalate) arrays, label indices into THREAT_TYPES.
+    """
+    n = len(features)
+
+    # 1. Random Forest: class and probabilities from one traversal of the flattened trees
+    features_scaled = models.get('scaler').transform(models.get('rf_encoder').encode(features))
+    rf_prediction, rf_probs = models.get('forest').predict_with_proba(features_scaled)
+    rf_confidence = rf_probs.max(axis=1)
+    rf_index = np.minimum(rf_prediction, len(THREAT_TYPES) - 1)
+
+    # 2. Deep Learning (CNN & LSTM) on the escalated rows, input shaped (rows, 1, features)
+    scaler_dl, dl_encoder = models.get('scaler_dl'), models.get('dl_encoder')
+    cnn_model, lstm_model = models.get('cnn'), models.get('lstm')
+    if scaler_dl is None or dl_encoder is None or cnn_model is None or lstm_model is None:
+        return rf_index, rf_confidence, rf_index, np.zeros(n), np.zeros(n, dtype=bool)  # Fallback
+
+    if cascade:
+        escalate = (rf_confidence < threshold) | (rf_index != 0)
+    else:
+        escalate = np.ones(n, dtype=bool)
+    escalated = int(escalate.sum())
+
+    # Rows the RF settles alone count as the DL agreeing with it
+    dl_confidence = rf_confidence.copy()
+    dl_index = rf_index.copy()
+    if escalated:
+        dl_features_scaled = scaler_dl.transform(dl_encoder.encode(features[escalate]))
+        dl_input = dl_features_scaled.reshape((escalated, 1, dl_features_scaled.shape[1]))
+
+        cnn_probs = np.asarray(cnn_model.predict_on_batch(dl_input))
+        lstm_probs = np.asarray(lstm_model.predict_on_batch(dl_input))
+
+        # Ensemble DL probabilities (Average)
+        dl_probs = (cnn_probs + lstm_probs) / 2
+        dl_confidence[escalate] = dl_probs.max(axis=1)
+        dl_index[escalate] = np.minimum(dl_probs.argmax(axis=1), len(THREAT_TYPES) - 1)
+    return rf_index, rf_confidence, dl_index, dl_confidence, escalate
+
+def predict_batch(features, rqa_det=None, cascade=True, threshold=CASCADE_THRESHOLD, use_cache=True):
+    """
+    Scores N rows at once: each scaler and model runs once per batch and the fusion rules are vectorized.
+    :param features: (N, 41) array in records.FEATURE_NAMES order, categorical columns holding records.CATEGORIES ids.
+    :param rqa_det: (N,) RQA determinism per row (percent), or None for no RQA evidence.
+    :param cascade: Run the CNN/LSTM only for rows whose RF label is non-Normal or whose RF confidence
+                    is below `threshold`; other rows keep the RF verdict. False runs every model on every row.
+    :param use_cache: Reuse model outputs of rows that quantize to a recently scored row (see verdict_cache.py).
+    :return: List of N prediction dictionaries (same shape as predict_traffic's).
+    :raises PoolBusyError, TimeoutError: The inference pool is saturated (backpressure: retry or shed, don't log).
+    """
+    features = np.asarray(features, dtype=np.float64).reshape(-1, records.NUM_FEATURES)
+    n = len(features)
+    active = models  # One version for the whole batch, even if a reload swaps `models` meanwhile
+    pool = inference_pool  # Workers load their own models; this process only needs the version label
+    if pool is None and (active.get('forest') is None or active.get('scaler') is None
+                         or active.get('rf_encoder') is None):
+        return [{'prediction': 'unknown', 'confidence': 0} for _ in range(n)]
+    if n == 0:
+        return []
+
+    try:
+        rqa_det = np.zeros(n) if rqa_det is None else np.asarray(rqa_det, dtype=np.float64)
+        # 1-2. Model outputs: cached for recently seen feature patterns, otherwise RF then CNN/LSTM
+        if use_cache:
+            keys = verdict_cache.keys_for(features)
+            cached = verdict_cache.get_many(keys)
+            # Entries are (rf_index, rf_confidence, dl_index, dl_confidence, version); other versions' are misses
+            hit = np.array([entry is not None and entry[4] == active.version for entry in cached])
+        else:
+            hit = np.zeros(n, dtype=bool)
+
+        rf_index = np.zeros(n, dtype=np.int64)
+        rf_confidence = np.zeros(n)
+        dl_index = np.zeros(n, dtype=np.int64)
+        dl_confidence = np.zeros(n)
+        escalate = np.zeros(n, dtype=bool)
+
+        if hit.any():
+            rows = np.flatnonzero(hit)
+            values = np.array([cached[i][:4] for i in rows])
+            rf_index[rows] = values[:, 0]
+            rf_confidence[rows] = values[:, 1]
+            dl_index[rows] = values[:, 2]
+            dl_confidence[rows] = values[:, 3]
+
+        miss = ~hit
+        scored = int(miss.sum())
+        if scored:
+            if pool is None:
+                outputs = _score_models(active, features[miss], cascade, threshold)
+            else:
+                outputs = pool.score(features[miss], active.version, cascade, threshold)
+            rf_index[miss], rf_confidence[miss], dl_index[miss], dl_confidence[miss], escalate[miss] = outputs
+            if use_cache:
+                keys = [keys[i] for i in np.flatnonzero(miss)]
+                verdict_cache.put_many(keys, ((*row, active.version) for row in
+                                              zip(*(output.tolist() for output in outputs[:4]))))
+
+        with _tier_lock:
+            tier_counts['cache'] += n - scored
+            tier_counts['rf'] += scored
+            tier_counts['ensemble'] += int(escalate.sum())
+
+        # 3. Decision-Level Fusion, as label indices into THREAT_TYPES
+        # RQA DET > 90% is a high confidence anomaly (likely Bot/DDoS); otherwise trust the ML models
+        rqa_anomaly = rqa_det > 90
+        ml_threat = ~rqa_anomaly & ((rf_index != 0) | (dl_index != 0))
+
+        # When the models disagree, trust the one with higher confidence
+        agree = rf_index == dl_index
+        rf_wins = rf_confidence > dl_confidence
+        mean_confidence = (rf_confidence + dl_confidence) / 2
+        final_index = np.where(agree | rf_wins, rf_index, dl_index)
+        fusion_score = np.where(agree, mean_confidence, np.where(rf_wins, rf_confidence, dl_confidence))
+
+        final_index = np.where(ml_threat, final_index, 0)
+        fusion_score = np.where(rqa_anomaly, 0.95, np.where(ml_threat, fusion_score, mean_confidence))
+        threat_level = np.where(rqa_anomaly, 'Critical',
+                                np.where(ml_threat, np.where(fusion_score > 0.8, 'High', 'Medium'), 'Low'))
+
+        results = []
+        for i in range(n):
+            is_malicious = bool(rqa_anomaly[i] or ml_threat[i])
+            results.append({
+                'prediction': RQA_ANOMALY if rqa_anomaly[i] else THREAT_TYPES[final_index[i]],
+                'is_malicious': is_malicious,
+                'confidence': float(fusion_score[i]),
+                'threat_level': str(threat_level[i]),
+                'details': {
+                    'rf_label': THREAT_TYPES[rf_index[i]],
+                    'dl_label': THREAT_TYPES[dl_index[i]],
+                    'rqa_det': float(rqa_det[i]),
+                    'tier': 'cache' if hit[i] else ('ensemble' if escalate[i] else 'rf'),
+                    'model_version': active.version
+                }
+            })
+        return results
+    except (PoolBusyError, TimeoutError):
+        raise
+    except Exception as e:
+        print(f"Prediction error: {e}")
+        return [{'prediction': 'error', 'confidence': 0, 'is_malicious': False} for _ in range(n)]
+
+def predict_records(batch):
+    """Scores a RECORD_DTYPE array (e.g. sniffer.get_batch()) straight from its feature buffer."""
+    return predict_batch(batch['features'], batch['rqa_det'])
+
+def predict_traffic(traffic_data):
+    """Scores a single record or feature dictionary (a batch of one)."""
+    traffic_data = as_record(traffic_data)
+    return predict_batch(traffic_data['features'], [traffic_data['rqa_det']])[0]
+
+class DetectionLoop:
+    def __init__(self, sniffer, on_results, batch_size=256, max_wait_ms=20, threads=1, max_retries=8):
+        """
+        Background threads that drain the sniffer's queue in micro-batches and score them with predict_records.
+        A batch is closed when it holds batch_size records or max_wait_ms after its first record arrived.
+        :param on_results: Called as on_results(batch, predictions) for every scored batch (from any of the threads).
+        :param threads: Batches scored concurrently; more than 1 only helps with an inference pool.
+        :param max_retries: Attempts per batch while the inference pool is saturated (with backoff) before
+                            the batch is dropped; meanwhile the capture queue fills and sheds per its policy.
+        """
+        self.sniffer = sniffer
+        self.on_results = on_results
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.num_threads = threads
+        self.max_retries = max_retries
+        self.is_running = False
+        self.threads = []
+        self._stats_lock = threading.Lock()
+
+        self.batches = 0
+        self.rows = 0
+        self.busy_seconds = 0.0
+        self.backpressure_waits = 0
+        self.dropped_rows = 0
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.threads = [threading.Thread(target=self._run, daemon=True) for _ in range(self.num_threads)]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        """Stops the threads, then scores whatever is still queued (e.g. the flows sniffer.stop() exported)."""
+        self.is_running = False
+        for thread in self.threads:
+            thread.join(timeout=2)
+        self.drain()
+
+    def drain(self):
+        """Scores every queued record in the calling thread; also usable as sniffer.stop(drain=...)."""
+        while True:
+            batch = self.sniffer.get_batch(self.batch_size, timeout=0)
+            if len(batch) == 0:
+                return
+            self._score(batch)
+
+    def _run(self):
+        while self.is_running:
+            batch = self.sniffer.get_batch(self.batch_size, timeout=0.5, linger=self.max_wait)
+            if len(batch) > 0:
+                self._score(batch)
+
+    def _score(self, batch):
+        start = time.perf_counter()
+        delay = 0.05
+        for attempt in range(self.max_retries + 1):
+            try:
+                predictions = predict_records(batch)
+                break
+            except (PoolBusyError, TimeoutError) as e:
+                with self._stats_lock:
+                    self.backpressure_waits += 1
+                if attempt == self.max_retries:
+                    with self._stats_lock:
+                        self.dropped_rows += len(batch)
+                    print(f"⚠️ Inference pool saturated, dropping {len(batch)} records: {e}")
+                    return
+                time.sleep(delay)
+                delay = min(delay * 2, 1.0)
+        try:
+            self.on_results(batch, predictions)
+        except Exception as e:
+            print(f"⚠️ Detection handler error: {e}")
+        with self._stats_lock:
+            self.busy_seconds += time.perf_counter() - start
+            self.batches += 1
+            self.rows += len(batch)
+
+    def get_stats(self):
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'mean_batch_size': self.rows / self.batches if self.batches else 0,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'backpressure_waits': self.backpressure_waits,
+            'dropped_rows': self.dropped_rows
+        }
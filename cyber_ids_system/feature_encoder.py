@@ -0,0 +1,146 @@
+import os
+
+import joblib
+import numpy as np
+
+from records import FEATURE_NAMES, FEATURE_INDEX, CATEGORIES
+
+# fetch_kddcup99 arguments of the training scripts. The seed fixes which attack rows the SA subset
+# samples, and with them the categorical values (and codes) the encoders are fitted on.
+KDD_TRAINING_DATA = {'subset': 'SA', 'percent10': True, 'random_state': 42}
+
+# KDD'99 (10%) categorical values in LabelEncoder (sorted) order. Only used for models trained
+# before vocabularies were persisted; the codes of the sampled SA training subset may differ
+# (`python feature_encoder.py` regenerates the exact vocabularies instead).
+KDD_VOCABULARY = {
+    'protocol_type': ['icmp', 'tcp', 'udp'],
+    'service': [
+        'IRC', 'X11', 'Z39_50', 'auth', 'bgp', 'courier', 'csnet_ns', 'ctf', 'daytime', 'discard', 'domain',
+        'domain_u', 'echo', 'eco_i', 'ecr_i', 'efs', 'exec', 'finger', 'ftp', 'ftp_data', 'gopher', 'hostnames',
+        'http', 'http_443', 'imap4', 'iso_tsap', 'klogin', 'kshell', 'ldap', 'link', 'login', 'mtp', 'name',
+        'netbios_dgm', 'netbios_ns', 'netbios_ssn', 'netstat', 'nnsp', 'nntp', 'ntp_u', 'other', 'pm_dump',
+        'pop_2', 'pop_3', 'printer', 'private', 'red_i', 'remote_job', 'rje', 'shell', 'smtp', 'sql_net', 'ssh',
+        'sunrpc', 'supdup', 'systat', 'telnet', 'tftp_u', 'tim_i', 'time', 'urh_i', 'urp_i', 'uucp', 'uucp_path',
+        'vmnet', 'whois'
+    ],
+    'flag': ['OTH', 'REJ', 'RSTO', 'RSTOS0', 'RSTR', 'S0', 'S1', 'S2', 'S3', 'SF', 'SH']
+}
+
+# Values the capture path names differently from KDD
+ALIASES = {'service': {'http_ssl': 'http_443'}}
+
+def vocabulary_from_label_encoders(encoders):
+    """Turns {column: fitted LabelEncoder} into {column: [values in code order]} with str values."""
+    return {column: [value.decode() if isinstance(value, bytes) else str(value) for value in encoder.classes_]
+            for column, encoder in encoders.items()}
+
+def save_vocabulary(encoders, path):
+    """Persists the categorical vocabularies of a training run next to its model."""
+    joblib.dump(vocabulary_from_label_encoders(encoders), path)
+
+_warned_missing = set()
+
+def load_vocabulary(path):
+    """Loads a persisted vocabulary, falling back to KDD_VOCABULARY (warning once per path) if it does not exist."""
+    if os.path.exists(path):
+        return joblib.load(path)
+    if path not in _warned_missing:
+        _warned_missing.add(path)
+        print(f"⚠️  {path} not found, using the full KDD'99 vocabulary: categorical codes may not match the "
+              f"model (run `python feature_encoder.py` or retrain)")
+    return KDD_VOCABULARY
+
+def training_encoders():
+    """
+    Fits LabelEncoders on the training data exactly as the training scripts do (downloads KDD'99 via sklearn).
+    :return: ({column: fitted LabelEncoder}, encoded feature frame)
+    """
+    from sklearn.datasets import fetch_kddcup99
+    from sklearn.preprocessing import LabelEncoder
+
+    X = fetch_kddcup99(as_frame=True, **KDD_TRAINING_DATA).data
+    X.columns = [col.replace(":", "_") for col in X.columns]
+    encoders = {}
+    for col in X.select_dtypes(include=["object"]).columns:
+        encoders[col] = LabelEncoder()
+        X.loc[:, col] = encoders[col].fit_transform(X[col])
+    return encoders, X
+
+class FeatureEncoder:
+    def __init__(self, vocabulary, feature_names=None):
+        """
+        Maps record rows (records.FEATURE_NAMES order, categorical columns holding CATEGORIES ids)
+        to one model's input: training codes for categorical values, columns in the model's order.
+        :param vocabulary: {column: [values in code order]}, e.g. from load_vocabulary().
+        :param feature_names: The model's column order (defaults to records.FEATURE_NAMES).
+        """
+        self.codes = {column: {value: code for code, value in enumerate(values)}
+                      for column, values in vocabulary.items()}
+        self.fallback = vocabulary is KDD_VOCABULARY  # No persisted vocabulary: codes may not match the model
+        self.columns = None
+        if feature_names is not None and list(feature_names) != FEATURE_NAMES:
+            self.columns = np.array([FEATURE_INDEX[name] for name in feature_names])
+
+        # Per categorical column: lookup table indexed by CATEGORIES id, grown as new values are interned
+        self._tables = {FEATURE_INDEX[column]: np.zeros(0) for column in CATEGORIES}
+
+    def _unknown_code(self, column):
+        # Unseen values share the code of 'other'/'OTH' when the vocabulary has one
+        codes = self.codes.get(column, {})
+        for fallback in ('other', 'OTH'):
+            if fallback in codes:
+                return codes[fallback]
+        return -1
+
+    def _table(self, index):
+        # Codes of every interned value, plus a trailing slot for unknown/invalid ids
+        column = FEATURE_NAMES[index]
+        table = self._tables[index]
+        values = CATEGORIES[column].values
+        if len(table) <= len(values):
+            codes = self.codes.get(column, {})
+            aliases = ALIASES.get(column, {})
+            unknown = self._unknown_code(column)
+            table = np.array([codes.get(aliases.get(value, value), unknown) for value in values] + [unknown],
+                             dtype=np.float64)
+            self._tables[index] = table
+        return table
+
+    def encode(self, features):
+        """
+        Encodes a batch with one table lookup per categorical column.
+        :param features: (N, 41) record rows.
+        :return: (N, 41) float64 model input.
+        """
+        encoded = np.array(features, dtype=np.float64)
+        for index in self._tables:
+            table = self._table(index)
+            ids = encoded[:, index].astype(np.intp)
+            ids[(ids < 0) | (ids >= len(table))] = len(table) - 1
+            encoded[:, index] = table.take(ids)
+        return encoded if self.columns is None else encoded[:, self.columns]
+
+if __name__ == "__main__":
+    import argparse
+    from sklearn.model_selection import train_test_split
+
+    parser = argparse.ArgumentParser(description="Regenerate the categorical vocabularies of the shipped models "
+                                                 "from their training data")
+    parser.add_argument('--models', default='models', help="Model directory (default: models)")
+    args = parser.parse_args()
+
+    encoders, X = training_encoders()
+    X_train = train_test_split(X, test_size=0.2, random_state=42)[0]  # The split the scalers were fitted on
+
+    for vocab_name, scaler_name in (('categorical_vocab.pkl', 'scaler.pkl'), ('categorical_vocab_dl.pkl', 'scaler_dl.pkl')):
+        # The scaler's column means are the mean training codes: they only match if the vocabulary does
+        scaler = joblib.load(os.path.join(args.models, scaler_name))
+        columns = list(getattr(scaler, 'feature_names_in_', FEATURE_NAMES))
+        mismatched = [col for col in encoders
+                      if not np.isclose(scaler.mean_[columns.index(col)], X_train[col].astype(np.float64).mean())]
+        if mismatched:
+            print(f"⚠️  {scaler_name} was not fitted on these codes ({', '.join(mismatched)}): "
+                  f"retrain that model instead; {vocab_name} not written")
+            continue
+        save_vocabulary(encoders, os.path.join(args.models, vocab_name))
+        print(f"✅ Wrote {os.path.join(args.models, vocab_name)}")
@@ -0,0 +1,225 @@
+from collections import OrderedDict
+
+# TCP header flag bits
+FIN = 0x01
+SYN = 0x02
+RST = 0x04
+ACK = 0x10
+URG = 0x20
+
+class Flow:
+    """State of one bidirectional connection, oriented by the packet that opened it."""
+
+    __slots__ = ('key', 'protocol', 'service', 'src_ip', 'dst_ip', 'src_port', 'dst_port',
+                 'start', 'last_seen', 'src_bytes', 'dst_bytes', 'src_packets', 'dst_packets',
+                 'urgent', 'orig_syn', 'resp_synack', 'orig_fin', 'resp_fin', 'orig_rst', 'resp_rst', 'closed_at')
+
+    def __init__(self, key, timestamp, src_ip, dst_ip, src_port, dst_port, protocol, service):
+        self.key = key
+        self.protocol = protocol
+        self.service = service
+        self.src_ip = src_ip
+        self.dst_ip = dst_ip
+        self.src_port = src_port
+        self.dst_port = dst_port
+        self.start = timestamp
+        self.last_seen = timestamp
+        self.src_bytes = 0
+        self.dst_bytes = 0
+        self.src_packets = 0
+        self.dst_packets = 0
+        self.urgent = 0
+        self.orig_syn = False
+        self.resp_synack = False
+        self.orig_fin = False
+        self.resp_fin = False
+        self.orig_rst = False
+        self.resp_rst = False
+        self.closed_at = None
+
+    def account(self, timestamp, from_originator, payload):
+        """Counts one packet's payload to the side that sent it."""
+        if from_originator:
+            self.src_bytes += payload
+            self.src_packets += 1
+        else:
+            self.dst_bytes += payload
+            self.dst_packets += 1
+        self.last_seen = max(self.last_seen, timestamp)
+
+    def update_tcp_state(self, flags, from_originator):
+        """Advances the TCP handshake/teardown state from one segment's flags."""
+        if flags & URG:
+            self.urgent += 1
+
+        if from_originator:
+            if flags & SYN and not flags & ACK:
+                self.orig_syn = True
+            if flags & FIN:
+                self.orig_fin = True
+            if flags & RST:
+                self.orig_rst = True
+        else:
+            if flags & SYN and flags & ACK:
+                self.resp_synack = True
+            if flags & FIN:
+                self.resp_fin = True
+            if flags & RST:
+                self.resp_rst = True
+
+    @property
+    def is_closed(self):
+        """True once the connection was reset or both sides sent FIN."""
+        return self.orig_rst or self.resp_rst or (self.orig_fin and self.resp_fin)
+
+    @property
+    def flag(self):
+        """KDD (Bro conn_state) flag summarising the connection's TCP state."""
+        if self.protocol != 'tcp':
+            return 'SF'
+
+        if not self.orig_syn:
+            return 'OTH'  # Mid-stream traffic, no handshake seen
+
+        if not self.resp_synack:
+            if self.resp_rst:
+                return 'REJ'
+            if self.orig_rst:
+                return 'RSTOS0'
+            if self.orig_fin:
+                return 'SH'
+            return 'S0'
+
+        if self.orig_rst:
+            return 'RSTO'
+        if self.resp_rst:
+            return 'RSTR'
+        if self.orig_fin and self.resp_fin:
+            return 'SF'
+        if self.orig_fin:
+            return 'S2'
+        if self.resp_fin:
+            return 'S3'
+        return 'S1'
+
+    def to_record(self):
+        """Returns the KDD basic features and metadata of the flow."""
+        return {
+            'duration': int(self.last_seen - self.start),
+            'protocol_type': self.protocol,
+            'service': self.service,
+            'flag': self.flag,
+            'src_bytes': self.src_bytes,
+            'dst_bytes': self.dst_bytes,
+            'land': 1 if self.src_ip == self.dst_ip and self.src_port == self.dst_port else 0,
+            'urgent': self.urgent,
+            'src_ip': self.src_ip,
+            'dst_ip': self.dst_ip,
+            'src_port': self.src_port,
+            'dst_port': self.dst_port,
+            'start': self.start,
+            'end': self.last_seen,
+            'packets': self.src_packets + self.dst_packets
+        }
+
+class FlowTable:
+    def __init__(self, idle_timeout=30.0, active_timeout=120.0, max_flows=200000, close_wait=5.0):
+        """
+        Assembles packets into bidirectional flows keyed on the 5-tuple.
+        Flows are exported close_wait seconds after FIN/RST closed them (TIME_WAIT-like: the last ACK
+        and retransmissions are absorbed instead of opening a new flow), after idle_timeout seconds
+        without packets, after active_timeout seconds since they started, or when the table is full.
+        """
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.max_flows = max_flows
+        self.close_wait = close_wait
+        self._flows = OrderedDict()    # key -> Flow, least recently active first
+        self._closing = OrderedDict()  # key -> Flow closed by FIN/RST, earliest closed first
+
+        self.packets_seen = 0
+        self.flows_exported = 0
+
+    def __len__(self):
+        return len(self._flows) + len(self._closing)
+
+    @staticmethod
+    def flow_key(protocol, src_ip, dst_ip, src_port, dst_port):
+        """Direction-independent 5-tuple key."""
+        a = (src_ip, src_port)
+        b = (dst_ip, dst_port)
+        return (protocol, a, b) if a <= b else (protocol, b, a)
+
+    def add_packet(self, timestamp, src_ip, dst_ip, src_port, dst_port, protocol, service, payload, tcp_flags=0):
+        """
+        Accounts one packet to its flow.
+        :param payload: Data bytes carried by the packet (counted into src_bytes/dst_bytes).
+        :return: List of flow records exported as a result (possibly empty).
+        """
+        self.packets_seen += 1
+        exported = self.expire(timestamp)
+
+        key = self.flow_key(protocol, src_ip, dst_ip, src_port, dst_port)
+        flow = self._closing.get(key)
+        if flow is not None:
+            if tcp_flags & SYN and not tcp_flags & ACK:
+                exported.append(self._export(key))  # The 5-tuple is reused by a new connection
+            else:
+                # Late ACK or retransmission of the closed connection
+                flow.account(timestamp, src_ip == flow.src_ip and src_port == flow.src_port, payload)
+                return exported
+
+        flow = self._flows.get(key)
+
+        if flow is not None and timestamp - flow.start >= self.active_timeout:
+            exported.append(self._export(key))
+            flow = None
+
+        if flow is None:
+            if len(self) >= self.max_flows:
+                exported.append(self._export(next(iter(self._closing or self._flows))))
+            flow = Flow(key, timestamp, src_ip, dst_ip, src_port, dst_port, protocol, service)
+            self._flows[key] = flow
+        else:
+            self._flows.move_to_end(key)
+
+        from_originator = src_ip == flow.src_ip and src_port == flow.src_port
+        flow.account(timestamp, from_originator, payload)
+
+        if protocol == 'tcp':
+            flow.update_tcp_state(tcp_flags, from_originator)
+            if flow.is_closed:
+                if self.close_wait > 0:
+                    flow.closed_at = timestamp
+                    self._closing[key] = self._flows.pop(key)
+                else:
+                    exported.append(self._export(key))
+
+        return exported
+
+    def expire(self, now):
+        """Exports flows closed for longer than close_wait, then those idle for longer than idle_timeout."""
+        exported = []
+        cutoff = now - self.close_wait
+        while self._closing:
+            key, flow = next(iter(self._closing.items()))
+            if flow.closed_at >= cutoff:
+                break
+            exported.append(self._export(key))
+
+        cutoff = now - self.idle_timeout
+        while self._flows:
+            key, flow = next(iter(self._flows.items()))
+            if flow.last_seen >= cutoff:
+                break
+            exported.append(self._export(key))
+        return exported
+
+    def flush(self):
+        """Exports every remaining flow (e.g. on shutdown)."""
+        return [self._export(key) for key in list(self._closing) + list(self._flows)]
+
+    def _export(self, key):
+        self.flows_exported += 1
+        flow = self._closing.pop(key, None) or self._flows.pop(key)
+        return flow.to_record()
@@ -0,0 +1,116 @@
+import numpy as np
+
+from artifacts import save_arrays, load_arrays
+
+class FlatForest:
+    # From this many rows, leaf probabilities are accumulated tree by tree instead of through one
+    # (trees, rows, classes) gather, which stops fitting in cache
+    ACCUMULATE_ROWS = 256
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes, max_depth, children=None, is_leaf=None):
+        """
+        A fitted random forest stored as contiguous per-node arrays (all trees concatenated).
+        Leaves point to themselves and are flagged in is_leaf.
+        Every tree is traversed at once, one level per numpy step, so the cost is a few dozen numpy
+        calls per batch plus ~10 us per row: far below sklearn's per-call overhead for small batches,
+        about sklearn's own traversal speed for batches of thousands of rows.
+        :param value: (nodes, classes) class probabilities of each leaf (rows of internal nodes are unused).
+        :param roots: Index of each tree's root node.
+        :param children, is_leaf: Derived from left/right when not given (load() passes the saved ones).
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = max_depth
+        # children[2 * node] is the right child, children[2 * node + 1] the left one
+        self.children = np.column_stack((right, left)).ravel() if children is None else children
+        self.is_leaf = left == np.arange(len(left)) if is_leaf is None else is_leaf
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Compiles a fitted sklearn RandomForestClassifier (single output)."""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+
+            # Same normalisation as DecisionTreeClassifier.predict_proba
+            proba = tree.value[:, 0, :].astype(np.float64)
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(proba / normalizer)
+
+            roots.append(offset)
+            offset += tree.node_count
+
+        return cls(np.concatenate(features).astype(np.intp), np.concatenate(thresholds),
+                   np.concatenate(lefts).astype(np.intp), np.concatenate(rights).astype(np.intp),
+                   np.concatenate(values), np.array(roots, dtype=np.intp), np.asarray(model.classes_),
+                   max(estimator.tree_.max_depth for estimator in model.estimators_))
+
+    def apply(self, X):
+        """Returns the (trees, N) leaf node reached by every row in every tree."""
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n, num_features = X.shape
+        flat_x = X.ravel()
+        row_offset = np.arange(n) * num_features
+        node = np.repeat(self.roots, n)
+        row_offset = np.tile(row_offset, len(self.roots))
+
+        # All unfinished (tree, row) pairs descend one level per step; pairs reaching a leaf drop out
+        active = np.flatnonzero(~self.is_leaf.take(node))
+        while active.size:
+            current = node.take(active)
+            go_left = flat_x.take(row_offset.take(active) + self.feature.take(current)) <= self.threshold.take(current)
+            current = self.children.take(2 * current + go_left)
+            node[active] = current
+            active = active[~self.is_leaf.take(current)]
+        return node.reshape(len(self.roots), n)
+
+    def predict_proba(self, X):
+        """Class probabilities, bit-identical to RandomForestClassifier.predict_proba."""
+        leaves = self.apply(X)
+        # Trees are added one by one, in sklearn's order and precision (as is the axis 0 reduction)
+        if leaves.shape[1] >= self.ACCUMULATE_ROWS:
+            proba = self.value.take(leaves[0], axis=0)
+            for tree_leaves in leaves[1:]:
+                proba += self.value.take(tree_leaves, axis=0)
+        else:
+            proba = self.value.take(leaves, axis=0).sum(axis=0)
+        proba /= len(leaves)
+        return proba
+
+    def predict_with_proba(self, X):
+        """Returns (class labels, probabilities) from a single traversal."""
+        proba = self.predict_proba(X)
+        return self.classes_.take(proba.argmax(axis=1)), proba
+
+    def predict(self, X):
+        return self.predict_with_proba(X)[0]
+
+    def save(self, directory):
+        """Writes every array (derived ones included) as .npy files, so load() only memory-maps."""
+        save_arrays(directory, {
+            'feature': self.feature, 'threshold': self.threshold, 'left': self.left, 'right': self.right,
+            'value': self.value, 'roots': self.roots, 'classes': self.classes_, 'children': self.children,
+            'is_leaf': self.is_leaf
+        }, meta={'max_depth': int(self.max_depth)})
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """Maps a forest written by save(); processes loading the same directory share its pages."""
+        arrays, meta = load_arrays(directory, mmap_mode)
+        return cls(arrays['feature'], arrays['threshold'], arrays['left'], arrays['right'], arrays['value'],
+                   arrays['roots'], arrays['classes'], meta['max_depth'], arrays['children'], arrays['is_leaf'])
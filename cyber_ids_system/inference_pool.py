@@ -0,0 +1,368 @@
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError  # Not the builtin before Python 3.11
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from records import NUM_FEATURES, CATEGORIES, CATEGORICAL_FEATURES, category_values, sync_categories
+
+# Per-row outputs a worker writes back: rf_index, rf_confidence, dl_index, dl_confidence, escalate
+NUM_OUTPUTS = 5
+
+class PoolBusyError(RuntimeError):
+    """No submission slot became free within the submit timeout (the pool is saturated)."""
+
+def _slot_arrays(shm, max_rows):
+    """(features, outputs) views of one slot: (max_rows, 41) rows in, (NUM_OUTPUTS, max_rows) model outputs out."""
+    features = np.ndarray((max_rows, NUM_FEATURES), dtype=np.float64, buffer=shm.buf)
+    outputs = np.ndarray((NUM_OUTPUTS, max_rows), dtype=np.float64, buffer=shm.buf, offset=features.nbytes)
+    return features, outputs
+
+def _category_sizes():
+    return tuple(len(CATEGORIES[name]) for name in CATEGORICAL_FEATURES)
+
+def _worker_main(worker_id, slot_names, max_rows, tasks, results, updates):
+    """
+    Worker process: owns a model copy (memory-mapped, see artifacts.py), scores the rows of the
+    slot named in each task on its own `tasks` queue in place and reports back on the results queue.
+    Categorical columns hold the submitting process's category ids. Each task carries how many
+    values per category its rows may use; the values themselves arrive on this worker's own
+    `updates` queue, broadcast only when the parent interns new ones.
+    """
+    import detector
+
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    arrays = [_slot_arrays(shm, max_rows) for shm in slots]
+    detector.load_models(eager=True)
+    pid = os.getpid()
+    results.put(('ready', worker_id, pid))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+
+        slot, rows, version, cascade, threshold, category_sizes = task
+        start = time.thread_time()  # CPU time: waiting for a core when oversubscribed is not busy
+        error = None
+        try:
+            # The broadcast is queued before any task that needs it
+            while any(have < need for have, need in zip(_category_sizes(), category_sizes)):
+                sync_categories(updates.get(timeout=5))
+            # Serve the version the caller is on (it changes after a hot reload in the parent)
+            if detector.models.version != version:
+                detector.load_models(eager=True, version=version)
+            features, outputs = arrays[slot]
+            scored = detector._score_models(detector.models, features[:rows], cascade, threshold)
+            for i, output in enumerate(scored):
+                outputs[i, :rows] = output
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        results.put(('done', worker_id, (pid, slot, error, time.thread_time() - start)))
+
+    del arrays
+    for shm in slots:
+        shm.close()
+
+class InferencePool:
+    def __init__(self, workers=None, slots=None, max_rows=1024, submit_timeout=1.0, timeout=5.0,
+                 check_interval=1.0, start_timeout=120.0):
+        """
+        Scores feature batches in worker processes, so model inference neither holds the GIL
+        of the web/capture process nor is limited to one core.
+        Batches travel through preallocated shared-memory slots; only slot numbers are pickled.
+        Each batch goes to the ready worker with the fewest batches assigned. A worker that dies fails
+        its batches, frees their slots and is replaced (see check_workers).
+        :param workers: Worker processes (defaults to one per CPU, less one for the submitting process).
+                        Workers beyond the CPU count only contend with each other.
+        :param slots: Shared-memory buffers, i.e. the bound on queued + in-flight batches (default 2 per worker).
+        :param max_rows: Rows per slot; larger batches are split across slots.
+        :param submit_timeout: Seconds score() waits for a free slot before raising PoolBusyError.
+        :param timeout: Seconds score() waits for the verdicts before raising TimeoutError.
+        :param check_interval: Seconds between worker liveness checks.
+        :param start_timeout: Seconds start() waits for every worker to load its models.
+        """
+        self.num_workers = workers or max(1, (os.cpu_count() or 1) - 1)
+        self.num_slots = slots or 2 * self.num_workers
+        self.max_rows = max_rows
+        self.submit_timeout = submit_timeout
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.start_timeout = start_timeout
+
+        self._ctx = None
+        self._slot_names = []
+        self._shms = []
+        self._arrays = []
+        self._free = queue.Queue()
+        self._pending = {}  # slot -> (future, rows)
+        self._workers = []
+        self._tasks = []    # Per-worker task queues
+        self._updates = []  # Per-worker category broadcasts
+        self._assigned = []  # Per-worker slots queued or in flight
+        self._ready = set()  # Workers that have loaded their models
+        self._category_sizes = None  # Category sizes last broadcast
+        self._results = None
+        self._collector = None
+        self._watcher = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self.is_running = False
+
+        self.started_at = None
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.worker_stats = {}
+
+    def start(self):
+        """Allocates the slots, starts the workers and waits until each has loaded its models."""
+        if self.is_running:
+            return
+        self._ctx = mp.get_context('spawn')  # No inherited threads or locks from the web process
+        slot_bytes = self.max_rows * (NUM_FEATURES + NUM_OUTPUTS) * 8
+        for slot in range(self.num_slots):
+            shm = shared_memory.SharedMemory(create=True, size=slot_bytes)
+            self._shms.append(shm)
+            self._arrays.append(_slot_arrays(shm, self.max_rows))
+            self._free.put(slot)
+
+        self._results = self._ctx.Queue()
+        self._slot_names = [shm.name for shm in self._shms]
+        self._category_sizes = (0,) * len(CATEGORICAL_FEATURES)
+        for worker_id in range(self.num_workers):
+            self._workers.append(None)
+            self._tasks.append(None)
+            self._updates.append(None)
+            self._assigned.append(set())
+            self._spawn(worker_id)
+
+        deadline = time.monotonic() + self.start_timeout
+        while len(self._ready) < self.num_workers:
+            try:
+                kind, worker_id, pid = self._results.get(timeout=1.0)
+                self._ready.add(worker_id)
+            except queue.Empty:
+                dead = [worker_id for worker_id, worker in enumerate(self._workers) if not worker.is_alive()]
+                if dead or time.monotonic() > deadline:
+                    self._abort_start()
+                    if dead:
+                        raise RuntimeError(f"Inference workers {dead} exited during startup") from None
+                    raise TimeoutError(f"Inference workers not ready within {self.start_timeout}s") from None
+
+        self.started_at = time.monotonic()
+        self.is_running = True
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+        self._stopping.clear()
+        self._watcher = threading.Thread(target=self._watch, daemon=True)
+        self._watcher.start()
+        print(f"🧮 Inference pool started with {self.num_workers} workers, {self.num_slots} slots...")
+        if self.num_workers > (os.cpu_count() or 1):
+            print(f"⚠️  {self.num_workers} inference workers on {os.cpu_count()} CPUs: the extra workers add contention")
+
+    def _spawn(self, worker_id):
+        """Starts (or replaces) one worker with fresh task and category queues. Called with _lock held once running."""
+        tasks = self._ctx.Queue()
+        updates = self._ctx.Queue()
+        if self.is_running:
+            updates.put(category_values())  # Everything interned so far, ahead of any task
+        worker = self._ctx.Process(target=_worker_main, args=(worker_id, self._slot_names, self.max_rows, tasks,
+                                                              self._results, updates), daemon=True)
+        worker.start()
+        self._workers[worker_id] = worker
+        self._tasks[worker_id] = tasks
+        self._updates[worker_id] = updates
+        self.worker_stats[worker_id] = {'pid': worker.pid, 'tasks': 0, 'rows': 0, 'busy_seconds': 0.0}
+
+    def _abort_start(self):
+        for worker in self._workers:
+            worker.terminate()
+        self._release()
+
+    def _release(self):
+        """Frees the shared memory and forgets the workers."""
+        self._arrays.clear()
+        for shm in self._shms:
+            shm.close()
+            shm.unlink()
+        self._shms.clear()
+        self._free = queue.Queue()
+        self._workers.clear()
+        self._tasks.clear()
+        self._updates.clear()
+        self._assigned.clear()
+        self._ready.clear()
+
+    def stop(self):
+        """Stops the workers (after their current task) and frees the shared memory."""
+        if not self.is_running:
+            return
+        with self._lock:
+            self.is_running = False  # No more replacements
+        self._stopping.set()
+        self._watcher.join(timeout=5)
+        for tasks in self._tasks:
+            tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+        self._results.put(('stop', None, None))
+        self._collector.join(timeout=2)
+        self._release()
+
+    def _watch(self):
+        while not self._stopping.wait(self.check_interval):
+            try:
+                self.check_workers()
+            except Exception as e:
+                print(f"⚠️ Inference pool watcher error: {e}")
+
+    def check_workers(self):
+        """
+        Replaces workers that exited: fails the batches queued or in flight on them and frees their slots.
+        Runs every check_interval seconds while the pool is running.
+        :return: Ids of the replaced workers.
+        """
+        replaced = []
+        with self._lock:
+            if not self.is_running:
+                return replaced
+            for worker_id, worker in enumerate(self._workers):
+                if worker.is_alive():
+                    continue
+                lost = self._assigned[worker_id]
+                self._assigned[worker_id] = set()
+                self._ready.discard(worker_id)
+                for slot in lost:
+                    future, rows = self._pending.pop(slot)
+                    self._free.put(slot)
+                    self.failed += 1
+                    future.set_exception(RuntimeError(f"Inference worker {worker_id} exited "
+                                                      f"(exit code {worker.exitcode})"))
+                self.restarts += 1
+                print(f"⚠️ Inference worker {worker_id} exited (exit code {worker.exitcode}), "
+                      f"failed {len(lost)} batches; restarting it...")
+                self._spawn(worker_id)
+                replaced.append(worker_id)
+        return replaced
+
+    def _collect(self):
+        """Resolves futures as workers finish; copies the outputs out so the slot is free immediately."""
+        while True:
+            kind, worker_id, payload = self._results.get()
+            if kind == 'stop':
+                break
+            if kind == 'ready':
+                with self._lock:
+                    if self.worker_stats[worker_id]['pid'] == payload:
+                        self._ready.add(worker_id)
+                continue
+
+            pid, slot, error, busy = payload
+            with self._lock:
+                # A replaced worker's last results arrive after check_workers already failed its slots
+                if self.worker_stats[worker_id]['pid'] != pid or slot not in self._assigned[worker_id]:
+                    continue
+                self._assigned[worker_id].discard(slot)
+                future, rows = self._pending.pop(slot)
+                outputs = None if error else self._arrays[slot][1][:, :rows].copy()
+                self._free.put(slot)
+                stats = self.worker_stats[worker_id]
+                stats['tasks'] += 1
+                stats['rows'] += rows
+                stats['busy_seconds'] += busy
+                if error:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+
+            # A caller that timed out has abandoned its future; the result is dropped
+            if error:
+                future.set_exception(RuntimeError(f"Inference worker {worker_id} failed: {error}"))
+            else:
+                future.set_result(outputs)
+
+    def _submit(self, features, version, cascade, threshold):
+        try:
+            slot = self._free.get(timeout=self.submit_timeout)
+        except queue.Empty:
+            with self._lock:
+                self.rejected += 1
+            raise PoolBusyError(f"No free inference slot within {self.submit_timeout}s") from None
+
+        rows = len(features)
+        self._arrays[slot][0][:rows] = features
+        future = Future()
+        with self._lock:
+            self._pending[slot] = (future, rows)
+            # The least loaded ready worker (any worker while all are being replaced)
+            candidates = self._ready or range(len(self._workers))
+            worker_id = min(candidates, key=lambda w: len(self._assigned[w]))
+            self._assigned[worker_id].add(slot)
+            self.submitted += 1
+            sizes = _category_sizes()
+            if sizes != self._category_sizes:
+                # New values were interned: every worker gets them once, ahead of the tasks using them
+                values = category_values()
+                for updates in self._updates:
+                    updates.put(values)
+                self._category_sizes = tuple(len(values[name]) for name in CATEGORICAL_FEATURES)
+            self._tasks[worker_id].put((slot, rows, version, cascade, threshold, sizes))
+        return future
+
+    def score(self, features, version, cascade=True, threshold=0.9):
+        """
+        Runs detector._score_models for a batch in the workers (split into max_rows chunks).
+        :param features: (N, 41) record rows.
+        :param version: Model version to score with (the caller's detector.models.version).
+        :return: (rf_index, rf_confidence, dl_index, dl_confidence, escalate) arrays, as _score_models.
+        :raises PoolBusyError: No free slot within submit_timeout.
+        :raises TimeoutError: No verdicts within timeout.
+        """
+        if not self.is_running:
+            raise RuntimeError("Inference pool is not running")
+        features = np.asarray(features, dtype=np.float64).reshape(-1, NUM_FEATURES)
+        deadline = time.monotonic() + self.timeout
+        futures = [self._submit(features[offset:offset + self.max_rows], version, cascade, threshold)
+                   for offset in range(0, len(features), self.max_rows)]
+
+        chunks = []
+        for future in futures:
+            try:
+                chunks.append(future.result(timeout=max(0.0, deadline - time.monotonic())))
+            except FutureTimeoutError:
+                with self._lock:
+                    self.timeouts += 1
+                raise TimeoutError(f"No verdicts within {self.timeout}s") from None
+
+        outputs = np.concatenate(chunks, axis=1) if chunks else np.zeros((NUM_OUTPUTS, 0))
+        return (outputs[0].astype(np.int64), outputs[1], outputs[2].astype(np.int64), outputs[3],
+                outputs[4].astype(bool))
+
+    def get_stats(self):
+        uptime = time.monotonic() - self.started_at if self.started_at else 0.0
+        with self._lock:
+            workers = {
+                worker_id: {**stats, 'busy_seconds': round(stats['busy_seconds'], 3),
+                            'utilization': round(stats['busy_seconds'] / uptime, 4) if uptime else 0.0}
+                for worker_id, stats in self.worker_stats.items()
+            }
+            return {
+                'workers': self.num_workers,
+                'slots': self.num_slots,
+                'in_flight': self.num_slots - self._free.qsize(),
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'timeouts': self.timeouts,
+                'rejected': self.rejected,
+                'restarts': self.restarts,
+                'per_worker': workers
+            }
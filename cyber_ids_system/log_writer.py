@@ -0,0 +1,99 @@
+import threading
+import time
+
+import database
+from packet_queue import BoundedPacketQueue, DROP_NEWEST
+
+class TrafficLogWriter:
+    def __init__(self, maxsize=50000, batch_size=500, max_delay=0.5, policy=DROP_NEWEST):
+        """
+        Background writer for traffic_logs: log entries are buffered in memory and inserted in
+        multi-row batches, so detection never waits for the database.
+        A batch is written once batch_size entries are buffered or max_delay seconds after its first entry.
+        :param maxsize: Buffer capacity; when full, entries are shed by the overflow policy (see packet_queue.py).
+        """
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.queue = BoundedPacketQueue(maxsize=maxsize, policy=policy)
+        self.is_running = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.rows_written = 0
+        self.failed_rows = 0
+        self.max_batch = 0
+        self.flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+
+    def submit(self, log_entry):
+        """
+        Queues a log entry without blocking.
+        :return: True if queued, False if the buffer was full and it was dropped.
+        """
+        return self.queue.put(database.log_row(log_entry))
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """Stops accepting batches from the wait loop, then writes out everything still buffered."""
+        if not self.is_running:
+            return
+        self.is_running = False
+        self._thread.join(timeout=timeout)
+        self.flush()
+
+    def _run(self):
+        while self.is_running:
+            # Wait for a first entry, then give the batch up to max_delay to fill
+            rows = self.queue.get_batch(self.batch_size, timeout=0.1, linger=self.max_delay)
+            if rows:
+                self._write(rows)
+
+    def flush(self):
+        """Writes every buffered entry now (called on shutdown)."""
+        while True:
+            rows = self.queue.get_batch(self.batch_size, timeout=0)
+            if not rows:
+                break
+            self._write(rows)
+
+    def _write(self, rows):
+        start = time.perf_counter()
+        written = database.log_traffic_batch(rows)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.batches += 1
+            if written:
+                self.rows_written += len(rows)
+            else:
+                self.failed_rows += len(rows)
+            self.max_batch = max(self.max_batch, len(rows))
+            self.flush_seconds += elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+
+    def get_stats(self):
+        """
+        Buffer depth and write counters. `dropped` counts entries shed because the buffer was full,
+        `failed_rows` entries lost because their batch insert failed (after the pool's retries).
+        """
+        queue_stats = self.queue.get_stats()
+        with self._lock:
+            return {
+                'depth': queue_stats['depth'],
+                'capacity': queue_stats['capacity'],
+                'high_water': queue_stats['high_water'],
+                'dropped': queue_stats['dropped'],
+                'batches': self.batches,
+                'rows_written': self.rows_written,
+                'failed_rows': self.failed_rows,
+                'mean_batch': round((self.rows_written + self.failed_rows) / self.batches, 1) if self.batches else 0.0,
+                'max_batch': self.max_batch,
+                'mean_flush_ms': round(self.flush_seconds / self.batches * 1000, 3) if self.batches else 0.0,
+                'max_flush_ms': round(self.max_flush_seconds * 1000, 3)
+            }
@@ -0,0 +1,203 @@
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+class ModelRegistry:
+    def __init__(self, version=None):
+        """
+        Named model components, each loaded on first use (or all at once with load_all).
+        A component that fails to load is reported once and resolves to None until clear().
+        :param version: Label of the model version the components are loaded from (reported per verdict).
+        """
+        self.version = version
+        self._loaders = {}
+        self._warm_ups = {}
+        self._components = {}
+        self._errors = {}
+        self._load_seconds = {}
+        self._warm_up_seconds = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, loader, warm_up=None):
+        """
+        :param loader: Called without arguments; returns the component.
+        :param warm_up: Optional callable(component) running one throwaway inference (see warm_up()).
+        """
+        self._loaders[name] = loader
+        if warm_up is not None:
+            self._warm_ups[name] = warm_up
+
+    def get(self, name):
+        """Returns the component, loading it on first use (None if it failed to load)."""
+        try:
+            return self._components[name]
+        except KeyError:
+            pass
+
+        with self._lock:
+            if name not in self._components:
+                start = time.perf_counter()
+                try:
+                    self._components[name] = self._loaders[name]()
+                except Exception as e:
+                    print(f"⚠️  Error loading {name}: {e}")
+                    self._components[name] = None
+                    self._errors[name] = str(e)
+                self._load_seconds[name] = time.perf_counter() - start
+            return self._components[name]
+
+    def is_loaded(self, name):
+        return name in self._components
+
+    def load_all(self):
+        """Loads every registered component now. :return: True if all of them loaded."""
+        return all([self.get(name) is not None for name in self._loaders])
+
+    def warm_up(self):
+        """
+        Runs each loaded component's warm-up inference once, so one-off costs (graph tracing,
+        first-touch allocations) are paid before serving instead of by the first request.
+        """
+        for name, warm_up in self._warm_ups.items():
+            component = self._components.get(name)
+            if component is None:
+                continue
+            start = time.perf_counter()
+            try:
+                warm_up(component)
+            except Exception as e:
+                print(f"⚠️  Warm-up of {name} failed: {e}")
+            self._warm_up_seconds[name] = time.perf_counter() - start
+
+    def clear(self):
+        """Forgets every loaded component; the next get() reloads it."""
+        with self._lock:
+            self._components.clear()
+            self._errors.clear()
+            self._load_seconds.clear()
+            self._warm_up_seconds.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'version': self.version,
+                'registered': list(self._loaders),
+                'loaded': [name for name, component in self._components.items() if component is not None],
+                'errors': dict(self._errors),
+                'load_ms': {name: round(seconds * 1000, 1) for name, seconds in self._load_seconds.items()},
+                'warm_up_ms': {name: round(seconds * 1000, 1) for name, seconds in self._warm_up_seconds.items()}
+            }
+
+# Versioned model store: <root>/versions/<version>/ holds a complete set of artifacts and
+# <root>/manifest.json records the versions and which one is active. Versions are immutable
+# once published (workers memory-map their files), so a new model always gets a new version.
+MANIFEST = 'manifest.json'
+
+# What a version holds, per artifact in order of preference (directory = memory-mappable export)
+VERSION_ARTIFACTS = {
+    'fl_ids_model': ('fl_ids_model', 'fl_ids_model.pkl'),
+    'scaler': ('scaler', 'scaler.pkl'),
+    'scaler_dl': ('scaler_dl', 'scaler_dl.pkl'),
+    'feature_names': ('feature_names.pkl',),
+    'categorical_vocab': ('categorical_vocab.pkl',),
+    'categorical_vocab_dl': ('categorical_vocab_dl.pkl',),
+    'cnn_ids_model': ('cnn_ids_model', 'cnn_ids_model.npz', 'cnn_ids_model.h5'),
+    'lstm_ids_model': ('lstm_ids_model', 'lstm_ids_model.npz', 'lstm_ids_model.h5')
+}
+# Vocabularies fall back to the standard KDD one (feature_encoder.py); everything else must be present
+OPTIONAL_ARTIFACTS = ('categorical_vocab', 'categorical_vocab_dl')
+
+def read_manifest(root):
+    """:return: {'active': version or None, 'versions': {version: {'created_at', 'files'}}}"""
+    path = os.path.join(root, MANIFEST)
+    if not os.path.exists(path):
+        return {'active': None, 'versions': {}}
+    with open(path) as f:
+        return json.load(f)
+
+def _write_manifest(root, manifest):
+    # Replace, never rewrite in place: readers see the old or the new manifest, not a partial one
+    tmp_path = os.path.join(root, MANIFEST + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(root, MANIFEST))
+
+def version_dir(root, version):
+    return os.path.join(root, 'versions', version)
+
+def publish_version(root, source_dir='models', version=None, activate=True):
+    """
+    Copies the artifacts in source_dir (see VERSION_ARTIFACTS) into a new version of the store.
+    :param version: Name of the version (default: a timestamp).
+    :param activate: Also make it the active version (running apps pick it up on their next reload).
+    :return: The version name.
+    """
+    version = version or datetime.now().strftime('%Y%m%d-%H%M%S')
+    manifest = read_manifest(root)
+    target = version_dir(root, version)
+    if version in manifest['versions'] or os.path.exists(target):
+        raise ValueError(f"Model version {version} already exists")
+
+    files = []
+    for artifact, candidates in VERSION_ARTIFACTS.items():
+        found = [name for name in candidates if os.path.exists(os.path.join(source_dir, name))]
+        if found:
+            files.append(found[0])
+        elif artifact not in OPTIONAL_ARTIFACTS:
+            raise ValueError(f"{source_dir} has no {artifact} (expected one of {', '.join(candidates)})")
+
+    # Stage the copy, then rename: a version directory is either complete or absent
+    staging = target + '.staging'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name in files:
+        path = os.path.join(source_dir, name)
+        if os.path.isdir(path):
+            shutil.copytree(path, os.path.join(staging, name))
+        else:
+            shutil.copy2(path, os.path.join(staging, name))
+    os.replace(staging, target)
+
+    manifest['versions'][version] = {'created_at': datetime.now().isoformat(), 'files': files}
+    if activate:
+        manifest['active'] = version
+    _write_manifest(root, manifest)
+    return version
+
+def activate_version(root, version):
+    """Makes an already published version the active one (e.g. to roll back)."""
+    manifest = read_manifest(root)
+    if version not in manifest['versions']:
+        raise ValueError(f"Unknown model version: {version}")
+    manifest['active'] = version
+    _write_manifest(root, manifest)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the versioned model store")
+    parser.add_argument('--root', default='models/registry', help="Model store directory")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    publish = subparsers.add_parser('publish', help="Publish the artifacts of a directory as a new version")
+    publish.add_argument('--source', default='models', help="Directory holding the trained artifacts")
+    publish.add_argument('--version', default=None, help="Version name (default: timestamp)")
+    publish.add_argument('--no-activate', action='store_true', help="Publish without making it active")
+    activate = subparsers.add_parser('activate', help="Make a published version active")
+    activate.add_argument('version')
+    subparsers.add_parser('list', help="List published versions")
+    args = parser.parse_args()
+
+    if args.command == 'publish':
+        version = publish_version(args.root, args.source, args.version, activate=not args.no_activate)
+        print(f"✅ Published model version {version}" + ("" if args.no_activate else " (active)"))
+    elif args.command == 'activate':
+        activate_version(args.root, args.version)
+        print(f"✅ Active model version: {args.version}")
+    else:
+        manifest = read_manifest(args.root)
+        for version, info in sorted(manifest['versions'].items()):
+            marker = '*' if version == manifest['active'] else ' '
+            print(f"{marker} {version}  {info['created_at']}  {', '.join(info['files'])}")
@@ -0,0 +1,194 @@
+import json
+import os
+
+import numpy as np
+
+from artifacts import save_arrays, load_arrays
+
+# Layer types the runtime can execute (Keras class names)
+SUPPORTED_LAYERS = ('InputLayer', 'Conv1D', 'MaxPooling1D', 'Flatten', 'Dense', 'Dropout', 'LSTM')
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+def _hard_sigmoid(x):
+    return np.clip(0.2 * x + 0.5, 0.0, 1.0)
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'tanh': np.tanh,
+    'sigmoid': _sigmoid,
+    'hard_sigmoid': _hard_sigmoid,
+    'softmax': _softmax
+}
+
+# Layer options the runtime ignores: exports with any other value are rejected
+REQUIRED_OPTIONS = {
+    'Conv1D': {'padding': 'valid', 'data_format': 'channels_last', 'dilation_rate': (1,), 'groups': 1,
+               'use_bias': True},
+    'MaxPooling1D': {'padding': 'valid', 'data_format': 'channels_last'},
+    'Dense': {'use_bias': True},
+    'LSTM': {'use_bias': True, 'go_backwards': False, 'stateful': False, 'return_state': False,
+             'time_major': False}
+}
+
+def check_layer(kind, config):
+    """
+    Raises ValueError if the runtime cannot execute the layer as configured,
+    so an unsupported model fails at export (or load) rather than at inference.
+    """
+    if kind not in SUPPORTED_LAYERS:
+        raise ValueError(f"Unsupported layer for numpy inference: {kind}")
+    for option, required in REQUIRED_OPTIONS.get(kind, {}).items():
+        value = config.get(option, required)
+        if isinstance(required, tuple):
+            value = tuple(value) if isinstance(value, (list, tuple)) else (value,)
+        if value != required:
+            raise ValueError(f"Unsupported {kind} option for numpy inference: {option}={value!r}")
+    for option in ('activation', 'recurrent_activation'):
+        if option in config and config[option] not in ACTIVATIONS:
+            raise ValueError(f"Unsupported {kind} {option} for numpy inference: {config[option]}")
+
+def export_keras_model(h5_path, npz_path):
+    """
+    Extracts the architecture and weights of a Keras Sequential model into a compact .npz
+    readable by NumpyModel, plus the memory-mappable directory next to it (npz path without extension).
+    Needs TensorFlow; running the exported model does not.
+    """
+    import tensorflow as tf
+
+    keras_model = tf.keras.models.load_model(h5_path)
+    layers = []
+    arrays = {}
+    for i, layer in enumerate(keras_model.layers):
+        kind = type(layer).__name__
+        config = layer.get_config()
+        check_layer(kind, config)
+        layers.append({'class_name': kind, 'config': {k: config[k] for k in (
+            'activation', 'recurrent_activation', 'return_sequences', 'padding', 'strides', 'pool_size'
+        ) if k in config}})
+        for j, weight in enumerate(layer.get_weights()):
+            arrays[f"layer{i}_w{j}"] = weight
+
+    np.savez_compressed(npz_path, architecture=np.array(json.dumps(layers)), **arrays)
+    NumpyModel(npz_path).save(npz_path.rsplit('.', 1)[0])
+    return npz_path
+
+class NumpyModel:
+    def __init__(self, path):
+        """
+        Pure-numpy forward pass for a model exported with export_keras_model.
+        Inference only (Dropout is the identity); computes in float32 like Keras.
+        :param path: The .npz export, or a directory written by save() (memory-mapped, shared across processes).
+        """
+        if os.path.isdir(path):
+            data, meta = load_arrays(path)
+            self.layers = meta['layers']
+        else:
+            with np.load(path) as npz:
+                data = {name: npz[name] for name in npz.files}
+            self.layers = json.loads(str(data['architecture']))
+        for layer in self.layers:
+            check_layer(layer['class_name'], layer['config'])
+
+        self.weights = []
+        for i in range(len(self.layers)):
+            weights = []
+            while f"layer{i}_w{len(weights)}" in data:
+                weights.append(data[f"layer{i}_w{len(weights)}"].astype(np.float32, copy=False))
+            self.weights.append(weights)
+
+    def save(self, directory):
+        """Writes the float32 weights as .npy files (and the architecture to meta.json)."""
+        save_arrays(directory, {f"layer{i}_w{j}": weight for i, weights in enumerate(self.weights)
+                                for j, weight in enumerate(weights)}, meta={'layers': self.layers})
+
+    def predict(self, x):
+        """
+        Runs the network on a batch.
+        :param x: (N, timesteps, features) input, as for the Keras model.
+        :return: (N, outputs) float32 array.
+        """
+        x = np.asarray(x, dtype=np.float32)
+        for layer, weights in zip(self.layers, self.weights):
+            x = getattr(self, '_' + layer['class_name'].lower())(x, layer['config'], weights)
+        return x
+
+    # Keras-compatible API used by detector.predict_batch
+    predict_on_batch = predict
+
+    @staticmethod
+    def _inputlayer(x, config, weights):
+        return x
+
+    @staticmethod
+    def _dropout(x, config, weights):
+        return x
+
+    @staticmethod
+    def _flatten(x, config, weights):
+        return x.reshape(len(x), -1)
+
+    @staticmethod
+    def _dense(x, config, weights):
+        kernel, bias = weights
+        return ACTIVATIONS[config['activation']](x @ kernel + bias)
+
+    @staticmethod
+    def _conv1d(x, config, weights):
+        kernel, bias = weights  # kernel: (width, in_channels, filters)
+        width = kernel.shape[0]
+        stride = config.get('strides', (1,))[0]
+
+        # (N, steps, in_channels, width) windows contracted against the kernel
+        windows = np.lib.stride_tricks.sliding_window_view(x, width, axis=1)[:, ::stride]
+        out = np.einsum('nsiw,wio->nso', windows, kernel) + bias
+        return ACTIVATIONS[config['activation']](out)
+
+    @staticmethod
+    def _maxpooling1d(x, config, weights):
+        pool = config.get('pool_size', (2,))[0]
+        stride = config.get('strides', (pool,))[0]
+        windows = np.lib.stride_tricks.sliding_window_view(x, pool, axis=1)[:, ::stride]
+        return windows.max(axis=-1)
+
+    @staticmethod
+    def _lstm(x, config, weights):
+        kernel, recurrent, bias = weights  # Gate order i, f, c, o
+        units = recurrent.shape[0]
+        gate = ACTIVATIONS[config.get('recurrent_activation', 'sigmoid')]
+        activation = ACTIVATIONS[config.get('activation', 'tanh')]
+
+        # Input projections for every timestep at once; only the recurrence is sequential
+        projected = x @ kernel + bias
+        h = np.zeros((len(x), units), dtype=np.float32)
+        c = np.zeros((len(x), units), dtype=np.float32)
+        outputs = []
+        for t in range(x.shape[1]):
+            z = projected[:, t] + h @ recurrent
+            i = gate(z[:, :units])
+            f = gate(z[:, units:2 * units])
+            g = activation(z[:, 2 * units:3 * units])
+            o = gate(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * activation(c)
+            outputs.append(h)
+
+        return np.stack(outputs, axis=1) if config.get('return_sequences') else h
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export Keras .h5 models to .npz for TensorFlow-free inference")
+    parser.add_argument('models', nargs='*', default=['models/cnn_ids_model.h5', 'models/lstm_ids_model.h5'],
+                        help="Keras .h5 files (default: the CNN and LSTM models)")
+    args = parser.parse_args()
+
+    for h5_path in args.models:
+        npz_path = export_keras_model(h5_path, h5_path.rsplit('.', 1)[0] + '.npz')
+        print(f"✅ Exported {h5_path} -> {npz_path}")
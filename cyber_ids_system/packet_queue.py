@@ -0,0 +1,176 @@
+import threading
+import time
+
+import numpy as np
+
+from records import RECORD_DTYPE
+
+DROP_NEWEST = 'drop-newest'
+DROP_OLDEST = 'drop-oldest'
+SAMPLE = 'sample'
+
+class BoundedPacketQueue:
+    def __init__(self, maxsize=10000, policy=DROP_NEWEST, sample_every=10):
+        """
+        Fixed-capacity ring buffer between the capture thread and the consumers.
+        When full, load is shed explicitly according to the overflow policy:
+          - 'drop-newest': reject the incoming item.
+          - 'drop-oldest': overwrite the oldest queued item.
+          - 'sample': admit every `sample_every`-th incoming item (overwriting the oldest), drop the rest.
+        """
+        if policy not in (DROP_NEWEST, DROP_OLDEST, SAMPLE):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+
+        self.maxsize = maxsize
+        self.policy = policy
+        self.sample_every = max(1, sample_every)
+
+        self._items = [None] * maxsize
+        self._head = 0   # Index of the oldest item
+        self._size = 0
+        self._overflow_seen = 0
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+
+        # Exact counters (updated under the lock)
+        self.enqueued = 0
+        self.dequeued = 0
+        self.dropped = 0
+        self.high_water = 0
+
+    def __len__(self):
+        return self._size
+
+    def qsize(self):
+        return self._size
+
+    def put(self, item):
+        """
+        Adds an item without ever blocking the producer.
+        :return: True if the item was queued, False if it was dropped.
+        """
+        with self._lock:
+            if self._size == self.maxsize:
+                if self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                if self.policy == SAMPLE:
+                    self._overflow_seen += 1
+                    if self._overflow_seen % self.sample_every:
+                        self.dropped += 1
+                        return False
+
+                # Make room by discarding the oldest item
+                self._release(self._head)
+                self._head = (self._head + 1) % self.maxsize
+                self._size -= 1
+                self.dropped += 1
+
+            self._store((self._head + self._size) % self.maxsize, item)
+            self._size += 1
+            self.enqueued += 1
+            if self._size > self.high_water:
+                self.high_water = self._size
+            self._not_empty.notify()
+            return True
+
+    def _store(self, index, item):
+        self._items[index] = item
+
+    def _release(self, index):
+        self._items[index] = None
+
+    def _pop(self):
+        item = self._items[self._head]
+        self._release(self._head)
+        self._head = (self._head + 1) % self.maxsize
+        self._size -= 1
+        self.dequeued += 1
+        return item
+
+    def _take(self, count):
+        return [self._pop() for _ in range(count)]
+
+    def get_nowait(self):
+        """Returns the oldest item, or None if the queue is empty."""
+        with self._lock:
+            if self._size == 0:
+                return None
+            return self._pop()
+
+    def get_batch(self, n, timeout=None, linger=0.0):
+        """
+        Removes up to n items in arrival order.
+        Waits up to `timeout` seconds (forever if None) for the first item, then up to `linger` more
+        seconds for the batch to fill to n, and returns what is available.
+        :return: List of items (empty if the timeout expired).
+        """
+        with self._not_empty:
+            if timeout is None:
+                while self._size == 0:
+                    self._not_empty.wait()
+            else:
+                deadline = time.monotonic() + timeout
+                while self._size == 0:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return self._take(0)
+                    self._not_empty.wait(remaining)
+
+            if linger > 0 and self._size < n:
+                deadline = time.monotonic() + linger
+                while self._size < n:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._not_empty.wait(remaining)
+
+            return self._take(min(n, self._size))
+
+    def get_stats(self):
+        """
+        Returns queue depth and counters. `enqueued` counts accepted items; `dropped` counts
+        every item lost, whether rejected on arrival or evicted from the queue to make room.
+        """
+        with self._lock:
+            return {
+                'depth': self._size,
+                'capacity': self.maxsize,
+                'policy': self.policy,
+                'enqueued': self.enqueued,
+                'dequeued': self.dequeued,
+                'dropped': self.dropped,
+                'high_water': self.high_water
+            }
+
+class RecordQueue(BoundedPacketQueue):
+    def __init__(self, maxsize=10000, policy=DROP_NEWEST, sample_every=10):
+        """
+        BoundedPacketQueue whose slots are a preallocated structured array of RECORD_DTYPE.
+        put() takes a tuple in RECORD_DTYPE field order and copies it into the next slot, so
+        queued records cost a fixed RECORD_DTYPE.itemsize bytes each instead of a dictionary per record.
+        get_batch() returns the records as one array the models consume directly.
+        """
+        super().__init__(maxsize, policy, sample_every)
+        self._items = np.zeros(maxsize, dtype=RECORD_DTYPE)
+
+    def _store(self, index, item):
+        self._items[index] = item
+
+    def _release(self, index):
+        pass  # Slots are overwritten in place
+
+    def _pop(self):
+        record = self._items[self._head:self._head + 1].copy()[0]
+        self._head = (self._head + 1) % self.maxsize
+        self._size -= 1
+        self.dequeued += 1
+        return record
+
+    def _take(self, count):
+        indices = (self._head + np.arange(count)) % self.maxsize
+        batch = self._items[indices]  # Fancy indexing copies
+        self._head = (self._head + count) % self.maxsize
+        self._size -= count
+        self.dequeued += count
+        return batch
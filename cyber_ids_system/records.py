@@ -0,0 +1,111 @@
+import threading
+from datetime import datetime
+
+import numpy as np
+
+# Column order of the 41 KDD features, as stored in models/feature_names.pkl
+FEATURE_NAMES = [
+    'duration', 'protocol_type', 'service', 'flag', 'src_bytes', 'dst_bytes', 'land',
+    'wrong_fragment', 'urgent', 'hot', 'num_failed_logins', 'logged_in', 'num_compromised',
+    'root_shell', 'su_attempted', 'num_root', 'num_file_creations', 'num_shells',
+    'num_access_files', 'num_outbound_cmds', 'is_host_login', 'is_guest_login',
+    'count', 'srv_count', 'serror_rate', 'srv_serror_rate', 'rerror_rate', 'srv_rerror_rate',
+    'same_srv_rate', 'diff_srv_rate', 'srv_diff_host_rate', 'dst_host_count', 'dst_host_srv_count',
+    'dst_host_same_srv_rate', 'dst_host_diff_srv_rate', 'dst_host_same_src_port_rate',
+    'dst_host_srv_diff_host_rate', 'dst_host_serror_rate', 'dst_host_srv_serror_rate',
+    'dst_host_rerror_rate', 'dst_host_srv_rerror_rate'
+]
+NUM_FEATURES = len(FEATURE_NAMES)
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURE_NAMES)}
+CATEGORICAL_FEATURES = ('protocol_type', 'service', 'flag')
+
+class Categories:
+    """
+    Interns the values of one categorical feature as small integer ids (in order of first sight).
+    Records carry these ids; feature_encoder.FeatureEncoder maps them to each model's training codes.
+    """
+
+    def __init__(self):
+        self.values = []
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.values)
+
+    def id_for(self, value):
+        value_id = self._ids.get(value)
+        if value_id is None:
+            with self._lock:
+                value_id = self._ids.get(value)
+                if value_id is None:
+                    value_id = len(self.values)
+                    self.values.append(value)
+                    self._ids[value] = value_id
+        return value_id
+
+CATEGORIES = {name: Categories() for name in CATEGORICAL_FEATURES}
+
+# One scored unit: the model row (numeric, in FEATURE_NAMES order, categorical columns holding
+# CATEGORIES ids) plus display metadata. Object fields only reference strings the capture path already owns.
+RECORD_DTYPE = np.dtype([
+    ('features', np.float64, (NUM_FEATURES,)),
+    ('timestamp', np.float64),
+    ('src_ip', object),
+    ('dst_ip', object),
+    ('protocol_type', object),
+    ('service', object),
+    ('flag', object),
+    ('packets', np.uint32),
+    ('rqa_rr', np.float64),
+    ('rqa_det', np.float64)
+])
+
+def category_id(name, value):
+    """Id of a categorical feature value (protocol_type, service, flag) as stored in the record row."""
+    return CATEGORIES[name].id_for(value)
+
+def category_values():
+    """The interned values of every categorical feature, in id order."""
+    return {name: list(categories.values) for name, categories in CATEGORIES.items()}
+
+def sync_categories(values):
+    """
+    Interns the category_values() of another process, so both map a value to the same id
+    (holds as long as this process interns values only through here, e.g. an inference worker).
+    """
+    for name, names in values.items():
+        categories = CATEGORIES[name]
+        for value in names[len(categories):]:
+            categories.id_for(value)
+
+def empty_records(n):
+    """Preallocates a batch buffer of n records."""
+    return np.zeros(n, dtype=RECORD_DTYPE)
+
+def from_dict(traffic):
+    """
+    Converts a feature dictionary (e.g. simulated traffic) into a single record.
+    Missing numeric features are 0, as in the original per-dict model input.
+    """
+    record = np.zeros((), dtype=RECORD_DTYPE)
+    row = record['features']
+    for i, name in enumerate(FEATURE_NAMES):
+        if name in CATEGORIES:
+            row[i] = category_id(name, str(traffic.get(name, 'unknown')))
+        else:
+            row[i] = traffic.get(name, 0)
+
+    timestamp = traffic.get('timestamp')
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp).timestamp()
+    record['timestamp'] = timestamp if timestamp is not None else datetime.now().timestamp()
+    record['src_ip'] = traffic.get('src_ip')
+    record['dst_ip'] = traffic.get('dst_ip')
+    record['protocol_type'] = traffic.get('protocol_type', 'unknown')
+    record['service'] = traffic.get('service', 'unknown')
+    record['flag'] = traffic.get('flag', 'unknown')
+    record['packets'] = traffic.get('packets', 0)
+    record['rqa_rr'] = traffic.get('rqa_rr', 0)
+    record['rqa_det'] = traffic.get('rqa_det', 0)
+    return record[()]
@@ -0,0 +1,177 @@
+import argparse
+import time
+from collections import Counter
+
+import numpy as np
+
+import database
+from capture import open_capture_file, parse_frame, classify_service
+from sniffer import PacketSniffer
+from detector import predict_records, make_log_entry
+
+class StageTimer:
+    """Collects latency samples for one pipeline stage (bounded number of samples)."""
+
+    def __init__(self, max_samples=200000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.max_samples = max_samples
+        self.samples = []
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if len(self.samples) < self.max_samples:
+            self.samples.append(seconds)
+
+    def summary(self):
+        """Returns mean/p50/p99/max latency in microseconds."""
+        if not self.count:
+            return {'count': 0, 'mean_us': 0.0, 'p50_us': 0.0, 'p99_us': 0.0, 'max_us': 0.0}
+        p50, p99 = np.percentile(self.samples, [50, 99]) * 1e6
+        return {
+            'count': self.count,
+            'mean_us': self.total / self.count * 1e6,
+            'p50_us': p50,
+            'p99_us': p99,
+            'max_us': self.max * 1e6
+        }
+
+def replay(path, speed=0.0, log_to_db=True, limit=None, batch_size=256):
+    """
+    Streams a pcap/pcapng file through the sniffer feature path, prediction and logging.
+    :param speed: 0 replays as fast as possible; otherwise original timing divided by this factor.
+    :param log_to_db: Write verdicts (and blocks) to MySQL like the live dashboard does.
+    :param limit: Stop after this many packets.
+    :param batch_size: Score exported flows once this many are pending (the predict stage reports per-row cost).
+    :return: Dictionary with throughput, per-stage latency and verdict counts.
+    """
+    capture = open_capture_file(path)
+    sniffer = PacketSniffer(backend='pcap', source=path)
+    sniffer.is_running = True
+
+    timers = {'parse': StageTimer(), 'flow+features': StageTimer(), 'predict': StageTimer(), 'log': StageTimer()}
+    verdicts = Counter()
+    packets = 0
+    total_bytes = 0
+    first_timestamp = None
+    drain_seconds = 0.0
+    perf = time.perf_counter
+
+    def score_pending(force=False):
+        if not force and sniffer.packet_queue.qsize() < batch_size:
+            return
+        while True:
+            batch = sniffer.get_batch(batch_size, timeout=0)
+            if len(batch) == 0:
+                return
+
+            start = perf()
+            predictions = predict_records(batch)
+            per_row = (perf() - start) / len(batch)
+            for _ in range(len(batch)):
+                timers['predict'].add(per_row)
+
+            for traffic, prediction in zip(batch, predictions):
+                verdicts[prediction['prediction']] += 1
+                if log_to_db:
+                    start = perf()
+                    log_entry = make_log_entry(traffic, prediction)
+                    if prediction.get('is_malicious', False):
+                        database.block_ip(traffic['src_ip'], reason=f"Detected {prediction['prediction']}")
+                        log_entry['blocked'] = True
+                    database.log_traffic(log_entry)
+                    timers['log'].add(perf() - start)
+
+    wall_start = perf()
+    for timestamp, frame in capture:
+        # Pace against the capture clock when replaying at original speed x factor
+        if speed > 0:
+            if first_timestamp is None:
+                first_timestamp = timestamp
+            delay = wall_start + (timestamp - first_timestamp) / speed - perf()
+            if delay > 0:
+                time.sleep(delay)
+
+        start = perf()
+        fields = parse_frame(frame, capture.linktype)
+        timers['parse'].add(perf() - start)
+        packets += 1
+        total_bytes += len(frame)
+        if fields is None:
+            continue
+
+        src_ip, dst_ip, sport, dport, protocol, length, payload, tcp_flags = fields
+        start = perf()
+        sniffer._handle_packet(timestamp, src_ip, dst_ip, sport, dport, protocol,
+                               classify_service(protocol, sport, dport), length, payload, tcp_flags)
+        timers['flow+features'].add(perf() - start)
+
+        score_pending()
+        if limit and packets >= limit:
+            break
+
+    def drain():
+        nonlocal drain_seconds
+        start = perf()
+        score_pending(force=True)
+        drain_seconds += perf() - start
+
+    # Export flows still open at the end of the capture, scoring them whenever the queue fills
+    start = perf()
+    sniffer.stop(drain=drain)
+    timers['flow+features'].add(perf() - start - drain_seconds)
+    score_pending(force=True)
+    capture.close()
+    if log_to_db:
+        database.persist_stats()  # Add this run's rows to the dashboard counters
+
+    elapsed = perf() - wall_start
+    return {
+        'packets': packets,
+        'bytes': total_bytes,
+        'flows': sniffer.flow_table.flows_exported,
+        'dropped': sniffer.packet_queue.get_stats()['dropped'],
+        'elapsed': elapsed,
+        'packets_per_sec': packets / elapsed if elapsed > 0 else 0,
+        'flows_per_sec': sniffer.flow_table.flows_exported / elapsed if elapsed > 0 else 0,
+        'mbit_per_sec': total_bytes * 8 / elapsed / 1e6 if elapsed > 0 else 0,
+        'stages': {name: timer.summary() for name, timer in timers.items()},
+        'verdicts': dict(verdicts)
+    }
+
+def print_report(results):
+    print("=" * 60)
+    print("📼 PCAP REPLAY SUMMARY")
+    print("=" * 60)
+    print(f"Packets: {results['packets']:,}   Flows scored: {results['flows'] - results['dropped']:,}   "
+          f"Time: {results['elapsed']:.2f}s")
+    if results['dropped']:
+        print(f"⚠️  {results['dropped']:,} flows dropped by the full capture queue (not scored)")
+    print(f"Throughput: {results['packets_per_sec']:,.0f} pkt/s | {results['flows_per_sec']:,.0f} flows/s | "
+          f"{results['mbit_per_sec']:,.1f} Mbit/s")
+    print("-" * 60)
+    print(f"{'stage':<15} | {'count':>9} | {'mean us':>9} | {'p50 us':>9} | {'p99 us':>9} | {'max us':>9}")
+    for name, s in results['stages'].items():
+        print(f"{name:<15} | {s['count']:>9,} | {s['mean_us']:>9.1f} | {s['p50_us']:>9.1f} | "
+              f"{s['p99_us']:>9.1f} | {s['max_us']:>9.1f}")
+    print("-" * 60)
+    print("Verdicts:")
+    for label, count in sorted(results['verdicts'].items(), key=lambda item: -item[1]):
+        print(f"   - {label}: {count:,}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a pcap/pcapng capture through the IDS pipeline")
+    parser.add_argument('pcap', help="Path to a .pcap or .pcapng file")
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help="0 = as fast as possible (default); N = original timing x N")
+    parser.add_argument('--no-db', action='store_true', help="Do not write verdicts to the database")
+    parser.add_argument('--limit', type=int, default=None, help="Stop after this many packets")
+    parser.add_argument('--batch-size', type=int, default=256, help="Flows scored per model call")
+    args = parser.parse_args()
+
+    print_report(replay(args.pcap, speed=args.speed, log_to_db=not args.no_db, limit=args.limit,
+                        batch_size=args.batch_size))
@@ -1,80 +1,424 @@
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
 import numpy as np
 
 class RQAAnalyzer:
-    def __init__(self, window_size=50, epsilon=50):
+    def __init__(self, window_size=50, epsilon=50, incremental=True):
         """
         Initializes the RQA Analyzer.
         :param window_size: Number of recent data points to keep (sliding window).
         :param epsilon: Threshold distance to consider two points as 'recurring'.
+        :param incremental: Maintain RR/DET counters as points arrive instead of
+                            rebuilding the full recurrence matrix on every call.
         """
         self.window_size = window_size
         self.epsilon = epsilon
-        self.data_window = []
+        self.incremental = incremental
+
+        # Fixed-size ring buffer holding the sliding window
+        self._buffer = np.zeros(window_size, dtype=np.float64)
+        self._count = 0    # Points currently in the window
+        self._time = 0     # Total points seen (index of the next point)
+
+        if incremental:
+            # Upper-triangle recurrence bits stored per diagonal (lag k).
+            # _diag[k, t % window_size] holds R(t - k, t) for the point that arrived at time t.
+            self._diag = np.zeros((window_size, window_size), dtype=bool)
+            self._lags = np.arange(window_size)
+            self._upper_recurrences = 0  # Recurrent points above the main diagonal
+            self._diagonal_points = 0    # Of those, points on diagonal lines of length >= 2
+
+    @property
+    def data_window(self):
+        """Returns the current window in arrival order (oldest first)."""
+        start = self._time - self._count
+        idx = np.arange(start, self._time) % self.window_size
+        return self._buffer[idx]
 
     def add_data_point(self, value):
         """Adds a data point (e.g., packet size) to the sliding window."""
-        self.data_window.append(value)
-        if len(self.data_window) > self.window_size:
-            self.data_window.pop(0)
+        if self._count == self.window_size:
+            if self.incremental:
+                self._remove_oldest()
+            self._count -= 1
+
+        if self.incremental:
+            self._append_point(value)
+
+        self._buffer[self._time % self.window_size] = value
+        self._time += 1
+        self._count += 1
+
+    def _remove_oldest(self):
+        """Drops the oldest point's row from every diagonal and updates the line counts."""
+        n = self._count
+        s = self._time - n
+        w = self.window_size
+        k = self._lags[1:n]
+
+        # Pair (s, s + k) is the first element of diagonal k; the next two follow it in time
+        b0 = self._diag[k, (s + k) % w]
+        b1 = self._diag[k, (s + k + 1) % w] & (k <= n - 2)
+        b2 = self._diag[k, (s + k + 2) % w] & (k <= n - 3)
+
+        self._upper_recurrences -= int(np.count_nonzero(b0))
+
+        # A line of length L >= 2 at the head shrinks: loses 2 points if L == 2, else 1
+        head = b0 & b1
+        self._diagonal_points -= 2 * int(np.count_nonzero(head)) - int(np.count_nonzero(head & b2))
+
+    def _append_point(self, value):
+        """Adds the new point's column to every diagonal and updates the line counts."""
+        n = self._count
+        t = self._time
+        w = self.window_size
+        k = self._lags[1:n + 1]
+
+        # Distances from the new point to every point still in the window
+        previous = self._buffer[(t - k) % w]
+        bn = np.abs(value - previous) < self.epsilon
+
+        # The two elements preceding the new one on diagonal k
+        p1 = self._diag[k, (t - 1) % w] & (k <= n - 1)
+        p2 = self._diag[k, (t - 2) % w] & (k <= n - 2)
+
+        self._diag[k, t % w] = bn
+        self._upper_recurrences += int(np.count_nonzero(bn))
+
+        # A line grows by 1 if it was already >= 2 long, otherwise a new line of 2 appears
+        tail = bn & p1
+        self._diagonal_points += 2 * int(np.count_nonzero(tail)) - int(np.count_nonzero(tail & p2))
 
     def calculate_rqa(self):
         """
         Calculates Recurrence Rate (RR) and Determinism (DET).
         :return: Dictionary with 'rr' and 'det' percentages.
         """
-        if len(self.data_window) < 2:
+        if self._count < 2:
             return {'rr': 0.0, 'det': 0.0}
 
-        data = np.array(self.data_window)
-        n = len(data)
-        
-        # Create Distance Matrix: |x_i - x_j|
-        # Uses broadcasting to create an n x n matrix of absolute differences
-        d_matrix = np.abs(data[:, None] - data)
-        
-        # Create Recurrence Matrix: 1 if distance < epsilon, else 0
-        r_matrix = (d_matrix < self.epsilon).astype(int)
-        
-        # --- Calculate Recurrence Rate (RR) ---
-        # RR = (Total Recurrent Points) / (Total Possible Points)
-        # We subtract n from the sum because the main diagonal (i=j) is always 1 (self-similarity)
-        # and usually excluded in RQA, or included. Here we exclude it for sensitivity.
-        num_recurrence = np.sum(r_matrix) - n 
+        if not self.incremental:
+            return self._calculate_rqa_full()
+
+        n = self._count
+
+        # Same quantities as the full matrix version: the main diagonal is excluded
+        # and the lower triangle mirrors the upper one
+        num_recurrence = 2 * self._upper_recurrences
         total_points = n * n - n
-        
+
         rr = num_recurrence / total_points if total_points > 0 else 0
-        
-        # --- Calculate Determinism (DET) ---
-        # DET = (Points in Diagonal Lines) / (Total Recurrent Points)
-        # Diagonal lines indicate predictable sequences (determinism).
-        # We look for diagonal lines of length >= 2.
-        
-        diagonal_points = 0
-        # Iterate through upper diagonals (offset k=1 to n-1)
-        # We multiply by 2 at the end because the matrix is symmetric
-        for k in range(1, n):
-            diag = np.diagonal(r_matrix, offset=k)
-            
-            # Find sequences of 1s with length >= 2
-            current_line_length = 0
-            for val in diag:
-                if val == 1:
-                    current_line_length += 1
-                else:
-                    if current_line_length >= 2:
-                        diagonal_points += current_line_length
-                    current_line_length = 0
-            
-            # Check end of diagonal
-            if current_line_length >= 2:
-                diagonal_points += current_line_length
-                
-        # Multiply by 2 for the lower triangle (symmetric)
-        diagonal_points *= 2
-        
-        det = diagonal_points / num_recurrence if num_recurrence > 0 else 0
-        
+        det = 2 * self._diagonal_points / num_recurrence if num_recurrence > 0 else 0
+
         return {
             'rr': round(rr * 100, 1),
             'det': round(det * 100, 1)
         }
+
+    def _calculate_rqa_full(self):
+        """Reference implementation that rebuilds the n x n recurrence matrix."""
+        metrics = batch_rqa(self.data_window[None, :], self.epsilon)
+
+        return {
+            'rr': round(float(metrics['rr'][0]), 1),
+            'det': round(float(metrics['det'][0]), 1)
+        }
+
+def sliding_windows(series, window_size, step=1):
+    """
+    Cuts a 1-D series (e.g. packet sizes of a capture) into overlapping windows.
+    :return: 2-D array of shape (num_windows, window_size), a view where possible.
+    """
+    series = np.asarray(series, dtype=np.float64)
+    if len(series) < window_size:
+        return np.empty((0, window_size))
+    return np.lib.stride_tricks.sliding_window_view(series, window_size)[::step]
+
+def _run_length_histogram(lines):
+    """
+    Vectorized run-length encoding of boolean line segments.
+    :param lines: Boolean array (windows, segments, length); each segment is one diagonal/column.
+    :return: Array (windows, length + 1) where [w, l] counts the lines of exactly length l.
+    """
+    num_windows, num_segments, length = lines.shape
+
+    # Pad every segment with a 0 on both sides so each run has a start (+1) and an end (-1)
+    padded = np.zeros((num_windows, num_segments, length + 2), dtype=np.int8)
+    padded[:, :, 1:-1] = lines
+    edges = np.diff(padded, axis=2)
+
+    # Starts and ends come out in the same (row-major) order, pairing each run
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    run_lengths = ends - starts
+    window_idx = starts // (num_segments * (length + 1))
+
+    hist = np.bincount(window_idx * (length + 1) + run_lengths, minlength=num_windows * (length + 1))
+    return hist.reshape(num_windows, length + 1)
+
+@lru_cache(maxsize=16)
+def _diagonal_index(n):
+    """Index arrays that shear upper diagonal k into row k-1: S[k-1, i] = R[i, i + k]."""
+    rows = np.arange(n)[None, :]
+    offsets = np.arange(1, n)[:, None]
+    cols = rows + offsets
+    on_diagonal = cols < n
+    cols = np.minimum(cols, n - 1)
+    rows = np.broadcast_to(rows, cols.shape)
+    return rows, cols, on_diagonal
+
+def batch_rqa(windows, epsilon, min_line=2, chunk_size=None):
+    """
+    Calculates RQA measures for many windows in one vectorized pass.
+    The main diagonal (self-similarity) is excluded from every measure.
+    :param windows: 2-D array (num_windows, window_size), e.g. one row per source or time slice.
+    :param epsilon: Threshold distance to consider two points as 'recurring'.
+    :param min_line: Minimum diagonal/vertical line length counted by DET, LAM and ENTR.
+    :param chunk_size: Windows processed per step (bounds the memory of the n x n matrices).
+    :return: Dictionary of arrays: 'rr', 'det', 'lam' (percentages), 'lmax' and 'entr'.
+    """
+    windows = np.atleast_2d(np.asarray(windows, dtype=np.float64))
+    num_windows, n = windows.shape
+
+    results = {
+        'rr': np.zeros(num_windows),
+        'det': np.zeros(num_windows),
+        'lam': np.zeros(num_windows),
+        'lmax': np.zeros(num_windows, dtype=np.int64),
+        'entr': np.zeros(num_windows)
+    }
+    if n < 2 or num_windows == 0:
+        return results
+
+    if chunk_size is None:
+        chunk_size = max(1, 4_000_000 // (n * n))
+
+    rows, cols, on_diagonal = _diagonal_index(n)
+
+    line_lengths = np.arange(n + 1)
+    long_lines = line_lengths >= min_line
+    off_diagonal = ~np.eye(n, dtype=bool)
+
+    for start in range(0, num_windows, chunk_size):
+        chunk = windows[start:start + chunk_size]
+        sl = slice(start, start + len(chunk))
+
+        # Recurrence matrices: 1 if |x_i - x_j| < epsilon
+        r_matrix = np.abs(chunk[:, :, None] - chunk[:, None, :]) < epsilon
+        r_matrix &= off_diagonal
+
+        # Diagonal line histogram (upper triangle; the lower one mirrors it)
+        diagonals = r_matrix[:, rows, cols] & on_diagonal
+        diag_hist = _run_length_histogram(diagonals)
+
+        # Vertical line histogram over the full matrix (columns, transposed into rows)
+        vert_hist = _run_length_histogram(r_matrix.transpose(0, 2, 1))
+
+        upper = (diag_hist * line_lengths).sum(axis=1)
+        num_recurrence = 2 * upper
+        has_recurrence = num_recurrence > 0
+        safe_recurrence = np.where(has_recurrence, num_recurrence, 1)
+
+        diagonal_points = 2 * (diag_hist[:, long_lines] * line_lengths[long_lines]).sum(axis=1)
+        vertical_points = (vert_hist[:, long_lines] * line_lengths[long_lines]).sum(axis=1)
+
+        results['rr'][sl] = num_recurrence / (n * n - n) * 100
+        results['det'][sl] = np.where(has_recurrence, diagonal_points / safe_recurrence, 0) * 100
+        results['lam'][sl] = np.where(has_recurrence, vertical_points / safe_recurrence, 0) * 100
+
+        # Longest diagonal line of at least min_line points
+        counted = diag_hist * long_lines
+        present = counted > 0
+        results['lmax'][sl] = np.where(present.any(axis=1), n - np.argmax(present[:, ::-1], axis=1), 0)
+
+        # Shannon entropy of the diagonal line length distribution
+        num_lines = counted.sum(axis=1, keepdims=True)
+        probs = counted / np.where(num_lines > 0, num_lines, 1)
+        logs = np.log(np.where(probs > 0, probs, 1))
+        results['entr'][sl] = -(probs * logs).sum(axis=1)
+
+    return results
+
+def window_rr_det(window, epsilon):
+    """
+    RR and DET of a single window, as batch_rqa computes them but without the LAM/ENTR/LMAX
+    histograms: a point is on a diagonal line of length >= 2 if it pairs with a diagonal neighbour.
+    :return: (rr, det) percentages.
+    """
+    n = len(window)
+    upper = np.triu(np.abs(window[:, None] - window[None, :]) < epsilon, 1)
+    num_upper = np.count_nonzero(upper)
+    if num_upper == 0:
+        return 0.0, 0.0
+
+    # Consecutive points on a diagonal; a point between two such pairs would be counted twice
+    pairs = upper[:-1, :-1] & upper[1:, 1:]
+    diagonal_points = 2 * np.count_nonzero(pairs) - np.count_nonzero(pairs[:-1, :-1] & pairs[1:, 1:])
+    return 2 * num_upper / (n * n - n) * 100, diagonal_points / num_upper * 100
+
+class RQAStore:
+    # Slots allocated up front; the arrays double from here as keys arrive, up to max_keys
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, max_keys=100000, ttl=300, window_size=50, epsilon=100):
+        """
+        Keeps a separate RQA window per key (e.g. src_ip or (src, dst, proto)).
+        Windows live in slot arrays that grow with the number of live keys, bounded by max_keys.
+        RR/DET are computed when asked for (once per exported flow) and cached until the key's window changes.
+        :param max_keys: Maximum number of live keys; the least recently used key is evicted beyond it.
+        :param ttl: Seconds a key may stay idle before it is evicted.
+        :param window_size: Number of recent data points kept per key.
+        :param epsilon: Threshold distance to consider two points as 'recurring'.
+        """
+        self.max_keys = max_keys
+        self.ttl = ttl
+        self.window_size = window_size
+        self.epsilon = epsilon
+
+        # One row per slot: ring buffer of values, fill count, write position, last update time
+        # and the cached RR/DET (valid while _fresh is set)
+        self._windows = np.zeros((0, window_size), dtype=np.float32)
+        self._counts = np.zeros(0, dtype=np.int32)
+        self._heads = np.zeros(0, dtype=np.int32)
+        self._last_seen = np.zeros(0, dtype=np.float64)
+        self._metrics = np.zeros((0, 2), dtype=np.float64)
+        self._fresh = np.zeros(0, dtype=bool)
+
+        self._slots = OrderedDict()  # key -> slot, least recently used first
+        self._free = []
+        self._grow(min(max_keys, self.INITIAL_CAPACITY))
+
+        self.lru_evictions = 0
+        self.ttl_evictions = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    @property
+    def capacity(self):
+        return len(self._counts)
+
+    def _grow(self, capacity):
+        """Extends the slot arrays to `capacity` slots, keeping the existing ones."""
+        old = self.capacity
+
+        def extend(array):
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:old] = array
+            return grown
+
+        self._windows = extend(self._windows)
+        self._counts = extend(self._counts)
+        self._heads = extend(self._heads)
+        self._last_seen = extend(self._last_seen)
+        self._metrics = extend(self._metrics)
+        self._fresh = extend(self._fresh)
+        self._free.extend(range(capacity - 1, old - 1, -1))
+
+    def __contains__(self, key):
+        return key in self._slots
+
+    def _expire(self, now):
+        """Evicts keys idle for longer than the TTL (oldest first, stops at the first live one)."""
+        cutoff = now - self.ttl
+        while self._slots:
+            key, slot = next(iter(self._slots.items()))
+            if self._last_seen[slot] >= cutoff:
+                break
+            self._release(key)
+            self.ttl_evictions += 1
+
+    def _release(self, key):
+        slot = self._slots.pop(key)
+        self._counts[slot] = 0
+        self._heads[slot] = 0
+        self._fresh[slot] = False
+        self._free.append(slot)
+
+    def _slot_for(self, key):
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._slots.move_to_end(key)
+            return slot
+
+        if not self._free:
+            if self.capacity < self.max_keys:
+                self._grow(min(self.max_keys, 2 * self.capacity))
+            else:
+                self._release(next(iter(self._slots)))
+                self.lru_evictions += 1
+
+        slot = self._free.pop()
+        self._slots[key] = slot
+        return slot
+
+    def add_data_point(self, key, value, now=None):
+        """Adds a data point to the key's window, evicting idle or excess keys as needed."""
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+
+        slot = self._slot_for(key)
+        self._windows[slot, self._heads[slot]] = value
+        self._heads[slot] = (self._heads[slot] + 1) % self.window_size
+        self._counts[slot] = min(self._counts[slot] + 1, self.window_size)
+        self._last_seen[slot] = now
+        self._fresh[slot] = False
+
+    def get_window(self, key):
+        """Returns the key's window in arrival order (oldest first)."""
+        slot = self._slots.get(key)
+        if slot is None:
+            return np.empty(0)
+        count = self._counts[slot]
+        idx = (self._heads[slot] - count + np.arange(count)) % self.window_size
+        return self._windows[slot, idx].astype(np.float64)
+
+    def calculate_rqa(self, key):
+        """
+        Calculates Recurrence Rate (RR) and Determinism (DET) for one key.
+        :return: Dictionary with 'rr' and 'det' percentages.
+        """
+        slot = self._slots.get(key)
+        if slot is None or self._counts[slot] < 2:
+            return {'rr': 0.0, 'det': 0.0}
+
+        if not self._fresh[slot]:
+            self._metrics[slot] = window_rr_det(self.get_window(key), self.epsilon)
+            self._fresh[slot] = True
+        rr, det = self._metrics[slot]
+        return {
+            'rr': round(float(rr), 1),
+            'det': round(float(det), 1)
+        }
+
+    def update(self, key, value, now=None):
+        """Adds a data point and returns the key's RR/DET in one call."""
+        self.add_data_point(key, value, now)
+        return self.calculate_rqa(key)
+
+    def calculate_all(self):
+        """
+        Scores every key with a full window in one batch_rqa call.
+        :return: (keys, metrics) where metrics holds arrays aligned with keys.
+        """
+        keys = [key for key, slot in self._slots.items() if self._counts[slot] == self.window_size]
+        slots = np.array([self._slots[key] for key in keys], dtype=np.int64)
+
+        # Rotate every ring buffer so rows are in arrival order
+        idx = (self._heads[slots, None] + np.arange(self.window_size)) % self.window_size
+        windows = self._windows[slots[:, None], idx].astype(np.float64)
+        return keys, batch_rqa(windows, self.epsilon)
+
+    def get_stats(self):
+        """Returns live key and eviction counters."""
+        return {
+            'live_keys': len(self._slots),
+            'capacity': self.capacity,
+            'max_keys': self.max_keys,
+            'lru_evictions': self.lru_evictions,
+            'ttl_evictions': self.ttl_evictions,
+            'memory_bytes': sum(array.nbytes for array in (self._windows, self._counts, self._heads, self._last_seen,
+                                                           self._metrics, self._fresh))
+        }
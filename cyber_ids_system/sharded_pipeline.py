@@ -0,0 +1,238 @@
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+
+from capture import parse_frame, classify_service
+from flows import FlowTable
+
+def shard_for(dst_ip, num_shards):
+    """Maps a destination host to its shard (stable across processes)."""
+    return zlib.crc32(dst_ip.encode()) % num_shards
+
+def _worker_main(shard_id, packet_queue, result_queue, score):
+    """
+    Worker process: owns its flow table, RQA state and model copy.
+    Receives batches of parsed packets, emits batches of scored log entries.
+    """
+    from sniffer import PacketSniffer
+
+    if score:
+        from detector import predict_records, make_log_entry, load_models
+        load_models(eager=True)  # Load and warm up before reporting ready, not on the first batch
+
+    # The sniffer is used for its feature state only; it never captures itself
+    sniffer = PacketSniffer(backend='pcap')
+    sniffer.is_running = True
+    result_queue.put(('ready', shard_id, os.getpid()))
+    packets = 0
+    busy = 0.0
+
+    def drain():
+        entries = []
+        batch = sniffer.get_batch(sniffer.packet_queue.maxsize, timeout=0)
+        predictions = predict_records(batch) if score and len(batch) else [None] * len(batch)
+        for traffic, prediction in zip(batch, predictions):
+            if score:
+                log_entry = make_log_entry(traffic, prediction)
+                log_entry['blocked'] = prediction.get('is_malicious', False)
+            else:
+                log_entry = {'src_ip': traffic['src_ip'], 'prediction': 'unscored', 'blocked': False}
+            entries.append(log_entry)
+        if entries:
+            result_queue.put(('results', shard_id, entries))
+
+    while True:
+        batch = packet_queue.get()
+        if batch is None:
+            break
+
+        start = time.perf_counter()
+        for timestamp, (src_ip, dst_ip, sport, dport, protocol, length, payload, tcp_flags) in batch:
+            sniffer._handle_packet(timestamp, src_ip, dst_ip, sport, dport, protocol,
+                                   classify_service(protocol, sport, dport), length, payload, tcp_flags)
+        drain()
+        busy += time.perf_counter() - start
+        packets += len(batch)
+
+    # Export flows still open (scoring whenever the queue fills), then report
+    sniffer.stop(drain=drain)
+    drain()
+    result_queue.put(('done', shard_id, {'packets': packets, 'flows': sniffer.flow_table.flows_exported,
+                                         'dropped': sniffer.packet_queue.get_stats()['dropped'],
+                                         'busy_seconds': busy}))
+
+class ShardedPipeline:
+    def __init__(self, num_workers=None, log_to_db=True, score=True, batch_size=256, queue_batches=64,
+                 max_routes=500000, start_timeout=120.0):
+        """
+        Capture/parse in the calling process, featurize and score in N worker processes.
+        Flows are routed by a hash of their destination host (the destination of their first packet;
+        replies follow the flow), so each flow lives in exactly one worker and the host-keyed
+        features (count, *_rate, dst_host_*) see every connection to that host.
+        The service-keyed features (srv_*, dst_host_srv_*), the 100-connection window and the
+        per-source RQA still only see the worker's own share of the traffic.
+        :param num_workers: Worker processes (defaults to the number of CPUs).
+        :param log_to_db: Have the single writer thread log verdicts and blocks to MySQL.
+        :param score: Run the models in the workers (False measures featurization only).
+        :param batch_size: Parsed packets sent to a worker per message.
+        :param queue_batches: Bound on in-flight batches per worker (backpressure on capture).
+        :param max_routes: Flow -> shard routes remembered (oldest forgotten first).
+        :param start_timeout: Seconds start() waits for every worker to load its models.
+        """
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.log_to_db = log_to_db
+        self.score = score
+        self.batch_size = batch_size
+        self.queue_batches = queue_batches
+        self.max_routes = max_routes
+        self.start_timeout = start_timeout
+
+        self._queues = []
+        self._workers = []
+        self._buffers = [[] for _ in range(self.num_workers)]
+        self._routes = OrderedDict()  # FlowTable.flow_key -> shard, in first-seen order
+        self._results = None
+        self._writer = None
+
+        self.packets = 0
+        self.verdicts = Counter()
+        self.worker_stats = {}
+
+    def start(self):
+        """Starts the worker processes and the single result writer."""
+        self._results = mp.Queue()
+        for shard_id in range(self.num_workers):
+            packet_queue = mp.Queue(maxsize=self.queue_batches)
+            worker = mp.Process(target=_worker_main, args=(shard_id, packet_queue, self._results, self.score),
+                                daemon=True)
+            worker.start()
+            self._queues.append(packet_queue)
+            self._workers.append(worker)
+
+        # Wait until every worker has loaded its models before accepting packets
+        deadline = time.monotonic() + self.start_timeout
+        ready = 0
+        while ready < self.num_workers:
+            try:
+                self._results.get(timeout=1.0)
+                ready += 1
+            except queue.Empty:
+                dead = [shard_id for shard_id, worker in enumerate(self._workers) if not worker.is_alive()]
+                if dead or time.monotonic() > deadline:
+                    for worker in self._workers:
+                        worker.terminate()
+                    if dead:
+                        raise RuntimeError(f"Sharded pipeline workers {dead} exited during startup") from None
+                    raise TimeoutError(f"Sharded pipeline workers not ready within {self.start_timeout}s") from None
+
+        self._writer = threading.Thread(target=self._write_results, daemon=True)
+        self._writer.start()
+        print(f"🧩 Sharded pipeline started with {self.num_workers} workers...")
+
+    def _write_results(self):
+        """Single writer: merges results from every worker and performs all database writes."""
+        import database
+
+        remaining = self.num_workers
+        while remaining:
+            kind, shard_id, payload = self._results.get()
+            if kind == 'done':
+                self.worker_stats[shard_id] = payload
+                remaining -= 1
+                continue
+
+            for log_entry in payload:
+                self.verdicts[log_entry['prediction']] += 1
+                if self.log_to_db and log_entry['blocked']:
+                    database.block_ip(log_entry['src_ip'], reason=f"Detected {log_entry['prediction']}")
+            if self.log_to_db and payload:
+                # One multi-row insert per worker batch
+                database.log_traffic_batch([database.log_row(log_entry) for log_entry in payload])
+
+    def submit(self, timestamp, frame, linktype):
+        """Parses one frame and routes it to its shard (batched)."""
+        fields = parse_frame(frame, linktype)
+        self.packets += 1
+        if fields is None:
+            return
+
+        src_ip, dst_ip, sport, dport, protocol = fields[:5]
+        key = FlowTable.flow_key(protocol, src_ip, dst_ip, sport, dport)
+        shard = self._routes.get(key)
+        if shard is None:
+            # The first packet names the flow's destination host; both directions then use its shard
+            shard = shard_for(dst_ip, self.num_workers)
+            self._routes[key] = shard
+            if len(self._routes) > self.max_routes:
+                self._routes.popitem(last=False)
+
+        buffer = self._buffers[shard]
+        buffer.append((timestamp, fields))
+        if len(buffer) >= self.batch_size:
+            self._queues[shard].put(buffer)
+            self._buffers[shard] = []
+
+    def run_capture(self, capture):
+        """Feeds every frame of a capture source (RawSocketCapture / pcap readers)."""
+        for timestamp, frame in capture:
+            if frame is not None:
+                self.submit(timestamp, frame, capture.linktype)
+
+    def stop(self):
+        """Flushes pending batches, stops the workers and waits for the writer to finish."""
+        for shard, buffer in enumerate(self._buffers):
+            if buffer:
+                self._queues[shard].put(buffer)
+            self._buffers[shard] = []
+
+        for packet_queue in self._queues:
+            packet_queue.put(None)
+        self._writer.join()
+        for worker in self._workers:
+            worker.join(timeout=5)
+        if self.log_to_db:
+            import database
+            database.persist_stats()  # Add this run's rows to the dashboard counters
+
+        return {
+            'packets': self.packets,
+            'flows': sum(s['flows'] for s in self.worker_stats.values()),
+            'dropped': sum(s['dropped'] for s in self.worker_stats.values()),
+            'verdicts': dict(self.verdicts),
+            'workers': self.worker_stats
+        }
+
+if __name__ == "__main__":
+    import argparse
+    from capture import open_capture_file, RawSocketCapture
+
+    parser = argparse.ArgumentParser(description="Run capture and scoring sharded across worker processes")
+    parser.add_argument('--pcap', help="Replay this capture file instead of live AF_PACKET capture")
+    parser.add_argument('--interface', help="Interface for live capture (default: all)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--no-db', action='store_true', help="Do not write verdicts to the database")
+    args = parser.parse_args()
+
+    pipeline = ShardedPipeline(num_workers=args.workers, log_to_db=not args.no_db)
+    pipeline.start()
+    capture = open_capture_file(args.pcap) if args.pcap else RawSocketCapture(args.interface)
+    start = time.perf_counter()
+    try:
+        pipeline.run_capture(capture)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        capture.close()
+        results = pipeline.stop()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ {results['packets']:,} packets, {results['flows']:,} flows in {elapsed:.2f}s "
+          f"({results['packets'] / elapsed:,.0f} pkt/s)")
+    if results['dropped']:
+        print(f"⚠️  {results['dropped']:,} flows dropped by full worker queues (not scored)")
+    for label, count in sorted(results['verdicts'].items(), key=lambda item: -item[1]):
+        print(f"   - {label}: {count:,}")
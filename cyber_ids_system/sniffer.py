@@ -1,17 +1,40 @@
 from scapy.all import sniff, IP, TCP, UDP, ICMP
 import threading
-import queue
 import time
-import random
-from datetime import datetime
-from rqa import RQAAnalyzer
+from rqa import RQAAnalyzer, RQAStore
+from traffic_stats import ConnectionStats, TRAFFIC_FEATURES
+from flows import FlowTable
+from packet_queue import RecordQueue
+from records import category_id
+from capture import RawSocketCapture, PcapStreamReader, open_capture_file, parse_frame, classify_service
 
 class PacketSniffer:
-    def __init__(self):
-        self.packet_queue = queue.Queue()
+    def __init__(self, rqa_key='src', max_rqa_keys=100000, rqa_ttl=300, backend='scapy', interface=None, source=None,
+                 queue_size=10000, overflow_policy='drop-newest'):
+        """
+        :param rqa_key: 'src' keeps one RQA window per source IP, 'flow' one per (src, dst, proto).
+        :param max_rqa_keys: Upper bound on concurrently tracked RQA keys (LRU eviction).
+        :param rqa_ttl: Seconds an RQA key may stay idle before it is evicted.
+        :param backend: 'scapy' (full dissection), 'raw' (AF_PACKET socket, Linux) or 'pcap' (pcap byte stream).
+        :param interface: Interface the 'raw' backend binds to (None for all).
+        :param source: pcap/pcapng path or pcap binary stream the 'pcap' backend reads (e.g. sys.stdin.buffer).
+        :param queue_size: Capacity of the capture queue; beyond it records are shed per overflow_policy.
+        :param overflow_policy: 'drop-newest', 'drop-oldest' or 'sample' (see BoundedPacketQueue).
+        """
+        self.packet_queue = RecordQueue(maxsize=queue_size, policy=overflow_policy)
         self.is_running = False
         self.sniffer_thread = None
         self.rqa = RQAAnalyzer(window_size=50, epsilon=100) # Window 50, Epsilon 100 bytes
+        self.rqa_key = rqa_key
+        self.rqa_store = RQAStore(max_keys=max_rqa_keys, ttl=rqa_ttl, window_size=50, epsilon=100)
+        self.conn_stats = ConnectionStats(time_window=2.0, host_window=100)
+        self.flow_table = FlowTable(idle_timeout=30.0, active_timeout=120.0)
+        self.flow_lock = threading.Lock()
+        self.last_timestamp = 0.0  # Latest packet time (the capture clock)
+        self.sweeper_thread = None
+        self.backend = backend
+        self.interface = interface
+        self.source = source
         
     def start(self):
         """Starts the packet sniffer in a background thread."""
@@ -21,16 +44,35 @@ class PacketSniffer:
         self.is_running = True
         self.sniffer_thread = threading.Thread(target=self._sniff_packets, daemon=True)
         self.sniffer_thread.start()
+        # Recorded pcap streams carry their own clock; idle flows expire from packet timestamps
+        if self.backend != 'pcap':
+            self.sweeper_thread = threading.Thread(target=self._sweep_flows, daemon=True)
+            self.sweeper_thread.start()
         print("🕵️ Packet Sniffer started...")
 
-    def stop(self):
-        """Stops the packet sniffer."""
+    def stop(self, drain=None):
+        """
+        Stops the packet sniffer and exports the flows still open.
+        :param drain: Called whenever the queue fills up during that export, to score what it holds;
+                      without it, flows beyond the queue capacity are shed by the overflow policy.
+        """
         self.is_running = False
         if self.sniffer_thread:
             self.sniffer_thread.join(timeout=1)
+
+        # Export whatever is still open so no connection goes unscored
+        with self.flow_lock:
+            for flow in self.flow_table.flush():
+                if drain is not None and self.packet_queue.qsize() >= self.packet_queue.maxsize:
+                    drain()
+                self._emit_flow(flow, self.last_timestamp)
             
     def _sniff_packets(self):
         """Internal method to capture packets."""
+        if self.backend in ('raw', 'pcap'):
+            self._capture_frames()
+            return
+
         # Filter for IP traffic only to avoid clutter
         try:
             sniff(filter="ip", prn=self._process_packet, store=0, stop_filter=lambda x: not self.is_running)
@@ -38,6 +80,57 @@ class PacketSniffer:
             print(f"⚠️ Sniffer Error (Check Npcap/Permissions): {e}")
             self.is_running = False
 
+    def _capture_frames(self):
+        """Capture loop for the raw-frame backends; headers are parsed with struct, not scapy."""
+        try:
+            if self.backend == 'raw':
+                capture = RawSocketCapture(self.interface)
+            else:
+                if isinstance(self.source, str):
+                    capture = open_capture_file(self.source)
+                else:
+                    capture = PcapStreamReader(self.source)
+        except Exception as e:
+            print(f"⚠️ Sniffer Error (Check Permissions/Source): {e}")
+            self.is_running = False
+            return
+
+        try:
+            for timestamp, frame in capture:
+                if not self.is_running:
+                    break
+                if frame is not None:
+                    self._process_frame(timestamp, frame, capture.linktype)
+        finally:
+            capture.close()
+
+    def _process_frame(self, timestamp, frame, linktype):
+        """Processes one raw frame through the same path as scapy packets."""
+        try:
+            fields = parse_frame(frame, linktype)
+            if fields is None:
+                return
+            src_ip, dst_ip, sport, dport, protocol, length, payload, tcp_flags = fields
+            service = classify_service(protocol, sport, dport)
+            self._handle_packet(timestamp, src_ip, dst_ip, sport, dport,
+                                protocol, service, length, payload, tcp_flags)
+        except Exception as e:
+            # print(f"Error processing frame: {e}")
+            pass
+
+    def _sweep_flows(self):
+        """Periodically exports flows that went idle while no packets arrived."""
+        while self.is_running:
+            time.sleep(1)
+            try:
+                with self.flow_lock:
+                    now = time.time()
+                    for flow in self.flow_table.expire(now):
+                        self._emit_flow(flow, now)
+            except Exception as e:
+                # Keep sweeping: a dead sweeper would leave idle flows unscored until shutdown
+                print(f"⚠️ Flow sweeper error: {e}")
+
     def _process_packet(self, packet):
         """Callback to process each captured packet."""
         if not self.is_running:
@@ -49,108 +142,90 @@ class PacketSniffer:
                 dst_ip = packet[IP].dst
                 length = len(packet)
                 
-                # Update RQA with packet length
-                self.rqa.add_data_point(length)
-                rqa_metrics = self.rqa.calculate_rqa()
-                
                 protocol = 'other'
-                service = 'other'
-                flag = 'SF' # Default flag
+                sport, dport = 0, 0
+                tcp_flags = 0
+                payload = len(packet[IP].payload)
                 
                 if TCP in packet:
                     protocol = 'tcp'
-                    if packet[TCP].dport == 80 or packet[TCP].sport == 80:
-                        service = 'http'
-                    elif packet[TCP].dport == 443 or packet[TCP].sport == 443:
-                        service = 'http_ssl'
-                    elif packet[TCP].dport == 22:
-                        service = 'ssh'
-                    elif packet[TCP].dport == 21:
-                        service = 'ftp'
-                    elif packet[TCP].dport == 25:
-                        service = 'smtp'
-                    else:
-                        service = 'private'
-                        
-                    # Simple flag mapping (approximation)
-                    flags = packet[TCP].flags
-                    if 'S' in flags and 'F' not in flags: flag = 'S0'
-                    elif 'R' in flags: flag = 'REJ'
+                    sport, dport = packet[TCP].sport, packet[TCP].dport
+                    tcp_flags = int(packet[TCP].flags)
+                    payload = len(packet[TCP].payload)
                     
                 elif UDP in packet:
                     protocol = 'udp'
-                    if packet[UDP].dport == 53:
-                        service = 'domain_u'
-                    else:
-                        service = 'private'
+                    sport, dport = packet[UDP].sport, packet[UDP].dport
+                    payload = len(packet[UDP].payload)
                         
                 elif ICMP in packet:
                     protocol = 'icmp'
-                    service = 'ecr_i'
-
-                # Construct traffic object compatible with our model
-                traffic_data = {
-                    'duration': random.randint(0, 50), # Real duration is hard to track per packet
-                    'protocol_type': protocol,
-                    'service': service,
-                    'flag': flag,
-                    'src_bytes': length,
-                    'dst_bytes': random.randint(0, length), # Approx
-                    'land': 1 if src_ip == dst_ip else 0,
-                    'wrong_fragment': 0,
-                    'urgent': 0,
-                    'hot': 0,
-                    'num_failed_logins': 0,
-                    'logged_in': 1 if service in ['http', 'ssh'] else 0,
-                    'num_compromised': 0,
-                    'root_shell': 0,
-                    'su_attempted': 0,
-                    'num_root': 0,
-                    'num_file_creations': 0,
-                    'num_shells': 0,
-                    'num_access_files': 0,
-                    'num_outbound_cmds': 0,
-                    'is_host_login': 0,
-                    'is_guest_login': 0,
-                    'count': random.randint(1, 10),
-                    'srv_count': random.randint(1, 10),
-                    'serror_rate': 0.0,
-                    'srv_serror_rate': 0.0,
-                    'rerror_rate': 0.0,
-                    'srv_rerror_rate': 0.0,
-                    'same_srv_rate': 1.0,
-                    'diff_srv_rate': 0.0,
-                    'srv_diff_host_rate': 0.0,
-                    'dst_host_count': random.randint(1, 255),
-                    'dst_host_srv_count': random.randint(1, 255),
-                    'dst_host_same_srv_rate': 1.0,
-                    'dst_host_diff_srv_rate': 0.0,
-                    'dst_host_same_src_port_rate': 0.0,
-                    'dst_host_srv_diff_host_rate': 0.0,
-                    'dst_host_serror_rate': 0.0,
-                    'dst_host_srv_serror_rate': 0.0,
-                    'dst_host_rerror_rate': 0.0,
-                    'dst_host_srv_rerror_rate': 0.0,
-                    
-                    # Metadata for display
-                    'src_ip': src_ip,
-                    'dst_ip': dst_ip,
-                    'timestamp': datetime.now().isoformat(),
-                    
-                    # RQA Metrics
-                    'rqa_rr': rqa_metrics['rr'],
-                    'rqa_det': rqa_metrics['det']
-                }
-                
-                self.packet_queue.put(traffic_data)
+                    payload = len(packet[ICMP].payload)
+
+                service = classify_service(protocol, sport, dport)
+                self._handle_packet(float(packet.time), src_ip, dst_ip, sport, dport,
+                                    protocol, service, length, payload, tcp_flags)
                 
             except Exception as e:
                 # print(f"Error processing packet: {e}")
                 pass
 
+    def _handle_packet(self, timestamp, src_ip, dst_ip, sport, dport, protocol, service, length, payload, tcp_flags=0):
+        """
+        Feeds one parsed packet into RQA and flow assembly, emitting any finished flows.
+        :param length: Full packet length (RQA series).
+        :param payload: Data bytes carried by the transport layer (KDD src_bytes/dst_bytes).
+        """
+        rqa_key = src_ip if self.rqa_key == 'src' else (src_ip, dst_ip, protocol)
+
+        with self.flow_lock:
+            self.last_timestamp = max(self.last_timestamp, timestamp)
+            # Update the per-source (or per-flow) RQA window with packet length
+            self.rqa_store.add_data_point(rqa_key, length, now=timestamp)
+            for flow in self.flow_table.add_packet(timestamp, src_ip, dst_ip, sport, dport,
+                                                   protocol, service, payload, tcp_flags):
+                self._emit_flow(flow, timestamp)
+
+    def _emit_flow(self, flow, now):
+        """
+        Builds the model record for a finished flow and queues it for scoring.
+        Called with flow_lock held: the capture thread, the sweeper and stop() all export flows,
+        and conn_stats / rqa_store are not thread-safe.
+        :param now: Export time. The 2 s traffic window advances with it, not with the flow's end,
+                    which is up to idle_timeout in the past for flows the sweeper exports.
+        """
+        protocol = flow['protocol_type']
+        service = flow['service']
+        flag = flow['flag']
+
+        # KDD time-based (2s) and host-based (last 100) traffic features
+        conn_features = self.conn_stats.update(now, flow['dst_ip'], (protocol, flow['dst_port']),
+                                               flag, flow['src_port'])
+
+        rqa_key = flow['src_ip'] if self.rqa_key == 'src' else (flow['src_ip'], flow['dst_ip'], protocol)
+        rqa_metrics = self.rqa_store.calculate_rqa(rqa_key)
+
+        # Model row in FEATURE_NAMES order; content features we cannot observe stay 0
+        features = [
+            flow['duration'], category_id('protocol_type', protocol), category_id('service', service),
+            category_id('flag', flag), flow['src_bytes'], flow['dst_bytes'], flow['land'],
+            0, flow['urgent'],                          # wrong_fragment, urgent
+            0, 0, 1 if service in ('http', 'ssh') else 0,  # hot, num_failed_logins, logged_in
+            0, 0, 0, 0, 0, 0, 0, 0, 0, 0                # num_compromised .. is_guest_login
+        ]
+        features.extend(conn_features[name] for name in TRAFFIC_FEATURES)  # By name, not dict order
+
+        # Written straight into the queue's preallocated record slot (RECORD_DTYPE field order)
+        self.packet_queue.put((features, flow['end'], flow['src_ip'], flow['dst_ip'], protocol, service, flag,
+                               flow['packets'], rqa_metrics['rr'], rqa_metrics['det']))
+
     def get_packet(self):
-        """Retrieves a packet from the queue if available."""
-        try:
-            return self.packet_queue.get_nowait()
-        except queue.Empty:
-            return None
+        """Retrieves one record (numpy.void of RECORD_DTYPE) from the queue, or None."""
+        return self.packet_queue.get_nowait()
+
+    def get_batch(self, n, timeout=None, linger=0.0):
+        """
+        Retrieves up to n records as one RECORD_DTYPE array.
+        Waits up to `timeout` seconds for the first record, then up to `linger` seconds for the batch to fill.
+        """
+        return self.packet_queue.get_batch(n, timeout, linger)
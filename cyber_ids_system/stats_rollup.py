@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import Counter
+
+ROLLUP_ADD = """INSERT INTO traffic_stats_rollup (prediction, count) VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE count = count + VALUES(count)"""
+
+class TrafficStats:
+    def __init__(self):
+        """
+        Running traffic_logs / blocked_ips counters behind database.get_stats(), updated as rows
+        are written instead of counted with COUNT(*) scans.
+        traffic_stats_rollup holds the counts of every process: each one adds the rows it wrote since
+        its last persist() (an additive upsert), so rows from replay or the sharded pipeline are counted
+        too, whatever ids they got. Counts not yet persisted when a process dies are lost.
+        The rollup is built once, from a full count, by the first load() (traffic_stats_built marks it done).
+        Every process loads before its first log write (see database.log_traffic), and a load waits for a
+        build in progress, so no other process holds rows of its own that the full count also includes.
+        """
+        self.base = Counter()      # traffic_stats_rollup as last read (every process's persisted rows)
+        self.pending = Counter()   # This process's changes since then, not yet persisted
+        self.blocked = 0           # COUNT(*) of blocked_ips when last read ...
+        self.new_blocked = 0       # ... plus the blocks added here since
+        self.loaded = False
+        self.persisted_at = None
+        self._lock = threading.Lock()
+
+    def add_logs(self, predictions):
+        """Counts inserted log rows. :param predictions: Prediction of each row."""
+        with self._lock:
+            self.pending.update(predictions)
+
+    def remove_logs(self, counts):
+        """Uncounts rows removed from traffic_logs (dropped partitions). :param counts: {prediction: rows}"""
+        with self._lock:
+            self.pending.subtract(counts)
+
+    def add_blocked(self, count=1):
+        with self._lock:
+            self.new_blocked += count
+
+    def snapshot(self):
+        """The database.get_stats() dictionary, from the counters."""
+        with self._lock:
+            predictions = {name: self.base[name] + self.pending[name] for name in self.base.keys() | self.pending.keys()}
+            blocked = self.blocked + self.new_blocked
+        predictions = {name: count for name, count in predictions.items() if count > 0}
+        total = sum(predictions.values())
+        return {
+            'total_traffic': total,
+            'malicious_count': total - predictions.get('Normal', 0),
+            'blocked_count': blocked,
+            'threat_distribution': predictions
+        }
+
+    def load(self, connection):
+        """Builds the rollup from a full count if no process has yet, then reads it."""
+        with self._lock:
+            written = Counter(self.pending)  # Rows written here before loading (only after a failed load)
+        cursor = connection.cursor()
+        connection.start_transaction()
+        try:
+            # Claims the build: a concurrent claimant waits on this row lock, then finds it present
+            cursor.execute("INSERT IGNORE INTO traffic_stats_built (id, built_at) VALUES (1, NOW())")
+            if cursor.rowcount == 1:
+                # Nobody can have persisted yet (persisting needs a load), so whatever is there is stale
+                cursor.execute("DELETE FROM traffic_stats_rollup")
+                cursor.execute("""SELECT l.name, c.count
+                                  FROM (SELECT prediction, COUNT(*) AS count FROM traffic_logs GROUP BY prediction) c
+                                  JOIN log_labels l ON l.code = c.prediction""")
+                counts = cursor.fetchall()  # Legacy rows without a prediction are not counted
+                if counts:
+                    cursor.executemany(ROLLUP_ADD, counts)
+                connection.commit()
+                with self._lock:
+                    self.pending.subtract(written)  # Already in the full count
+                    self.pending = Counter({name: count for name, count in self.pending.items() if count})
+            else:
+                connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+        self.refresh(connection)
+        self.loaded = True
+
+    def refresh(self, connection):
+        """Rereads the rollup (picking up other processes' persisted counts) and the blocked_ips count."""
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT prediction, count FROM traffic_stats_rollup")
+            base = Counter(dict(cursor.fetchall()))
+            cursor.execute("SELECT COUNT(*) FROM blocked_ips")
+            blocked = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+        with self._lock:
+            self.base = base
+            self.blocked = blocked
+            self.new_blocked = 0
+
+    def persist(self, connection):
+        """Adds this process's pending counts to the rollup, then rereads it (call only once loaded)."""
+        with self._lock:
+            deltas = {name: count for name, count in self.pending.items() if count}
+
+        if deltas:
+            cursor = connection.cursor()
+            connection.start_transaction()
+            try:
+                cursor.executemany(ROLLUP_ADD, list(deltas.items()))
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+            with self._lock:
+                # Counts added while the upsert ran stay pending for the next persist
+                self.pending.subtract(deltas)
+                self.pending = Counter({name: count for name, count in self.pending.items() if count})
+        self.refresh(connection)
+        self.persisted_at = time.time()
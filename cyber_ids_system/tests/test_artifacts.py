@@ -0,0 +1,49 @@
+import os
+import shutil
+
+import joblib
+import numpy as np
+import pytest
+
+from artifacts import ArrayScaler, export_artifacts, load_arrays, save_arrays
+from forest import FlatForest
+from nn_runtime import NumpyModel
+
+MODELS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
+
+def test_arrays_round_trip_as_read_only_maps(tmp_path):
+    arrays = {'a': np.arange(12, dtype=np.int32).reshape(3, 4), 'b': np.linspace(0, 1, 5)}
+    save_arrays(str(tmp_path), arrays, meta={'depth': 3})
+    loaded, meta = load_arrays(str(tmp_path))
+
+    assert meta == {'depth': 3}
+    for name, array in arrays.items():
+        assert isinstance(loaded[name], np.memmap) and not loaded[name].flags.writeable
+        np.testing.assert_array_equal(loaded[name], array)
+
+    private, _ = load_arrays(str(tmp_path), mmap_mode=None)
+    assert not isinstance(private['a'], np.memmap)
+
+@pytest.mark.parametrize('name', ['scaler', 'scaler_dl'])
+def test_array_scaler_is_bit_identical_to_sklearn(name):
+    scaler = joblib.load(os.path.join(MODELS, name + '.pkl'))
+    X = np.random.default_rng(0).normal(scale=100, size=(50, len(scaler.mean_)))
+    np.testing.assert_array_equal(ArrayScaler.from_sklearn(scaler).transform(X), scaler.transform(X))
+    np.testing.assert_array_equal(ArrayScaler.load(os.path.join(MODELS, name)).transform(X), scaler.transform(X))
+
+def test_export_matches_the_pickles(tmp_path):
+    for filename in ('fl_ids_model.pkl', 'scaler.pkl', 'scaler_dl.pkl', 'cnn_ids_model.npz', 'lstm_ids_model.npz'):
+        shutil.copy(os.path.join(MODELS, filename), tmp_path)
+
+    exported = export_artifacts(str(tmp_path))
+    assert sorted(exported) == ['cnn_ids_model', 'fl_ids_model', 'lstm_ids_model', 'scaler', 'scaler_dl']
+
+    X = np.random.default_rng(1).normal(size=(20, 41))
+    sklearn_forest = joblib.load(os.path.join(MODELS, 'fl_ids_model.pkl'))
+    np.testing.assert_array_equal(FlatForest.load(str(tmp_path / 'fl_ids_model')).predict_proba(X),
+                                  sklearn_forest.predict_proba(X))
+    np.testing.assert_array_equal(NumpyModel(str(tmp_path / 'cnn_ids_model')).predict(X.reshape(20, 1, 41)),
+                                  NumpyModel(os.path.join(MODELS, 'cnn_ids_model.npz')).predict(X.reshape(20, 1, 41)))
+
+def test_missing_sources_are_skipped(tmp_path):
+    assert export_artifacts(str(tmp_path)) == []
@@ -0,0 +1,83 @@
+import ipaddress
+
+import pytest
+
+import database
+from blocklist import Blocklist, PrefixTree, parse_entry
+from stats_rollup import TrafficStats
+
+def test_parse_entry_normalizes_addresses_and_ranges():
+    assert parse_entry('10.0.0.1') == ipaddress.ip_address('10.0.0.1')
+    assert parse_entry('10.0.0.7/24') == ipaddress.ip_network('10.0.0.0/24')
+    assert parse_entry('10.0.0.1/32') == ipaddress.ip_address('10.0.0.1')
+    assert parse_entry('not an ip') is None
+
+def test_prefix_tree_matches_ranges_inside_and_across_bytes():
+    tree = PrefixTree(32)
+    tree.add(int(ipaddress.ip_address('10.0.0.0')), 24)
+    tree.add(int(ipaddress.ip_address('172.16.0.0')), 12)
+    assert tree.contains(int(ipaddress.ip_address('10.0.0.255')))
+    assert not tree.contains(int(ipaddress.ip_address('10.0.1.0')))
+    assert tree.contains(int(ipaddress.ip_address('172.31.255.1')))
+    assert not tree.contains(int(ipaddress.ip_address('172.32.0.1')))
+    assert not tree.add(int(ipaddress.ip_address('10.0.0.0')), 24)
+
+def test_prefix_tree_covers_only_with_an_equal_or_wider_prefix():
+    tree = PrefixTree(32)
+    tree.add(int(ipaddress.ip_address('10.0.0.0')), 24)
+    assert tree.covers(int(ipaddress.ip_address('10.0.0.0')), 24)
+    assert tree.covers(int(ipaddress.ip_address('10.0.0.128')), 25)
+    assert not tree.covers(int(ipaddress.ip_address('10.0.0.0')), 16)
+
+def test_blocklist_contains_addresses_ranges_and_ipv6():
+    blocklist = Blocklist()
+    blocklist.load([('192.0.2.1', None, 'test'), ('203.0.113.0/24', None, 'test'), ('2001:db8::/32', None, 'test')])
+    assert blocklist.contains('192.0.2.1')
+    assert blocklist.contains('203.0.113.77')
+    assert blocklist.contains('2001:db8::1')
+    assert not blocklist.contains('192.0.2.2')
+    assert not blocklist.contains('garbage')
+    assert blocklist.recent() == ['2001:db8::/32', '203.0.113.0/24', '192.0.2.1']
+    assert blocklist.get_stats() == {'addresses': 1, 'networks': 2, 'loaded': True}
+
+@pytest.fixture
+def block_db(monkeypatch):
+    """database.block_ip against an empty in-memory blocklist; returns the list of INSERTs issued."""
+    inserts = []
+
+    class Cursor:
+        rowcount = 1
+
+        def execute(self, sql, params):
+            inserts.append(params[0])
+
+        def close(self):
+            pass
+
+    class Connection:
+        def cursor(self):
+            return Cursor()
+
+    blocklist = Blocklist()
+    blocklist.load([])
+    monkeypatch.setattr(database, 'blocklist', blocklist)
+    monkeypatch.setattr(database, 'traffic_stats', TrafficStats())
+    monkeypatch.setattr(database, '_with_connection', lambda name, work: work(Connection()))
+    return inserts
+
+def test_reblocking_writes_nothing(block_db):
+    for _ in range(3):
+        database.block_ip('10.0.0.0/24')
+        database.block_ip('10.0.0.5/24')  # Same range, other spelling
+        database.block_ip('10.0.0.9')     # Inside it
+        database.block_ip('10.0.0.128/25')
+        database.block_ip('192.0.2.1')
+    assert block_db == ['10.0.0.0/24', '192.0.2.1']
+    assert database.is_blocked('10.0.0.200')
+
+def test_wider_range_is_still_written(block_db):
+    database.block_ip('10.0.0.0/24')
+    database.block_ip('10.0.0.0/16')
+    database.block_ip('10.0.0.0/16')
+    assert block_db == ['10.0.0.0/24', '10.0.0.0/16']
+    assert database.traffic_stats.snapshot()['blocked_count'] == 2
@@ -0,0 +1,79 @@
+import pytest
+from scapy.all import Ether, IP, IPv6, TCP, UDP, ICMP, Raw, Dot1Q, CookedLinux
+from scapy.utils import wrpcap, wrpcapng
+
+from capture import (parse_frame, classify_service, open_capture_file, PcapStreamReader,
+                     PcapngStreamReader, LINKTYPE_RAW, LINKTYPE_LINUX_SLL)
+
+def test_tcp_over_ethernet():
+    packet = Ether() / IP(src='10.0.0.1', dst='10.0.0.2') / TCP(sport=40000, dport=80, flags='PA') / Raw(b'x' * 100)
+    frame = bytes(packet)
+    assert parse_frame(frame) == ('10.0.0.1', '10.0.0.2', 40000, 80, 'tcp', len(frame), 100, 0x18)
+
+def test_tcp_options_are_not_payload():
+    packet = Ether() / IP() / TCP(flags='S', options=[('MSS', 1460), ('NOP', None), ('WScale', 7)])
+    assert parse_frame(bytes(packet))[6] == 0
+
+def test_udp_icmp_and_vlan():
+    udp = Ether() / Dot1Q(vlan=7) / IP(src='1.1.1.1', dst='2.2.2.2') / UDP(sport=5353, dport=53) / Raw(b'q' * 30)
+    assert parse_frame(bytes(udp))[:7] == ('1.1.1.1', '2.2.2.2', 5353, 53, 'udp', len(udp), 30)
+
+    icmp = Ether() / IP() / ICMP() / Raw(b'p' * 56)
+    assert parse_frame(bytes(icmp))[4:7] == ('icmp', len(icmp), 56)
+
+def test_ethernet_padding_is_not_payload():
+    packet = Ether() / IP() / TCP(flags='A')
+    frame = bytes(packet) + b'\x00' * 6  # Padded to the 60-byte minimum
+    assert parse_frame(frame)[6] == 0
+
+def test_ipv6_and_other_linktypes():
+    packet = IPv6(src='fe80::1', dst='fe80::2') / UDP(sport=1000, dport=2000) / Raw(b'a' * 12)
+    assert parse_frame(bytes(packet), LINKTYPE_RAW)[:7] == ('fe80::1', 'fe80::2', 1000, 2000, 'udp', len(packet), 12)
+
+    cooked = CookedLinux(proto=0x0800) / IP(src='10.1.1.1', dst='10.1.1.2') / TCP(sport=1, dport=22)
+    assert parse_frame(bytes(cooked), LINKTYPE_LINUX_SLL)[:5] == ('10.1.1.1', '10.1.1.2', 1, 22, 'tcp')
+
+def test_non_ip_and_truncated_frames():
+    assert parse_frame(bytes(Ether(type=0x0806) / Raw(b'\x00' * 28))) is None
+    assert parse_frame(b'\x00' * 10) is None
+    assert parse_frame(b'\x00' * 20, linktype=999) is None
+
+def test_fragment_carries_no_ports():
+    packet = Ether() / IP(frag=10, proto=6) / Raw(b'z' * 40)
+    assert parse_frame(bytes(packet))[2:4] == (0, 0)
+
+@pytest.mark.parametrize('writer, reader', [(wrpcap, PcapStreamReader), (wrpcapng, PcapngStreamReader)])
+def test_capture_files_round_trip(tmp_path, writer, reader):
+    packets = []
+    for i in range(5):
+        packet = Ether() / IP(src='10.0.0.1', dst='10.0.0.2') / TCP(sport=40000 + i, dport=443)
+        packet.time = 1000 + i * 0.25
+        packets.append(packet)
+    path = str(tmp_path / 'capture')
+    writer(path, packets)
+
+    capture = open_capture_file(path)
+    try:
+        assert isinstance(capture, reader)
+        records = list(capture)
+    finally:
+        capture.close()
+
+    assert [round(timestamp, 3) for timestamp, _ in records] == [1000, 1000.25, 1000.5, 1000.75, 1001]
+    assert [parse_frame(frame, capture.linktype)[2] for _, frame in records] == [40000, 40001, 40002, 40003, 40004]
+
+def test_truncated_record_ends_the_stream(tmp_path):
+    path = tmp_path / 'capture.pcap'
+    wrpcap(str(path), [Ether() / IP() / TCP()] * 2)
+    path.write_bytes(path.read_bytes()[:-10])
+    capture = open_capture_file(str(path))
+    assert len(list(capture)) == 1
+    capture.close()
+
+def test_classify_service():
+    assert classify_service('tcp', 40000, 80) == 'http'
+    assert classify_service('tcp', 443, 40000) == 'http_ssl'
+    assert classify_service('tcp', 40000, 22) == 'ssh'
+    assert classify_service('udp', 40000, 53) == 'domain_u'
+    assert classify_service('icmp', 0, 0) == 'ecr_i'
+    assert classify_service('other', 0, 0) == 'other'
@@ -0,0 +1,62 @@
+import numpy as np
+
+import detector
+
+class Identity:
+    def transform(self, X):
+        return X
+
+    def encode(self, X):
+        return np.asarray(X, dtype=np.float64)
+
+class StubForest:
+    """Label = column 0 of the row, confidence = column 1."""
+
+    def predict_with_proba(self, X):
+        labels = X[:, 0].astype(np.int64)
+        probs = np.zeros((len(X), len(detector.THREAT_TYPES)))
+        probs[np.arange(len(X)), labels] = X[:, 1]
+        probs[np.arange(len(X)), (labels + 1) % probs.shape[1]] = 1 - X[:, 1]
+        return labels, probs
+
+class StubNetwork:
+    """Always answers DoS (index 1) and records how many rows it saw."""
+
+    def __init__(self):
+        self.rows = 0
+
+    def predict_on_batch(self, X):
+        self.rows += len(X)
+        probs = np.zeros((len(X), len(detector.THREAT_TYPES)))
+        probs[:, 1] = 0.8
+        probs[:, 0] = 0.2
+        return probs
+
+class StubModels:
+    def __init__(self):
+        self.cnn, self.lstm = StubNetwork(), StubNetwork()
+        self.components = {'scaler': Identity(), 'rf_encoder': Identity(), 'scaler_dl': Identity(),
+                           'dl_encoder': Identity(), 'forest': StubForest(), 'cnn': self.cnn, 'lstm': self.lstm}
+
+    def get(self, name):
+        return self.components[name]
+
+def rows(*label_confidence):
+    features = np.zeros((len(label_confidence), 41))
+    features[:, :2] = label_confidence
+    return features
+
+def test_cascade_escalates_unsure_or_non_normal_rows_only():
+    models = StubModels()
+    features = rows((0, 0.99), (0, 0.5), (2, 0.99), (0, 0.95))
+    rf_index, rf_confidence, dl_index, dl_confidence, escalate = detector._score_models(models, features, True, 0.9)
+    assert escalate.tolist() == [False, True, True, False]
+    assert models.cnn.rows == 2 and models.lstm.rows == 2
+    # Settled rows keep the RF verdict as the DL one; escalated rows get the ensemble's
+    assert dl_index.tolist() == [0, 1, 1, 0]
+    np.testing.assert_allclose(dl_confidence, [0.99, 0.8, 0.8, 0.95])
+
+def test_without_cascade_every_row_runs_the_ensemble():
+    models = StubModels()
+    escalate = detector._score_models(models, rows((0, 0.99), (0, 0.99)), False, 0.9)[4]
+    assert escalate.all() and models.cnn.rows == 2
@@ -0,0 +1,124 @@
+import threading
+from collections import defaultdict
+
+import pytest
+from mysql.connector import Error, errorcode
+from mysql.connector.errors import PoolError
+
+import database
+from database import ConnectionPool
+
+class FakeConnection:
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.closed = False
+        self.pings = 0
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if not self.alive:
+            raise Error("gone", errno=errorcode.CR_SERVER_GONE_ERROR)
+
+    def close(self):
+        self.closed = True
+
+def make_pool(**options):
+    opened = []
+
+    def connect():
+        opened.append(FakeConnection())
+        return opened[-1]
+    return ConnectionPool(connect, **options), opened
+
+def test_connections_are_reused():
+    pool, opened = make_pool(pool_size=2)
+    for _ in range(5):
+        with pool.connection() as connection:
+            assert connection is opened[0]
+    assert len(opened) == 1
+    assert pool.get_stats()['idle'] == 1
+
+def test_pool_is_bounded():
+    pool, opened = make_pool(pool_size=2, acquire_timeout=0.05)
+    first, second = pool.acquire(), pool.acquire()
+    with pytest.raises(PoolError):
+        pool.acquire()
+    assert pool.get_stats()['waits'] == 1
+
+    threading.Timer(0.01, pool.release, args=(first,)).start()
+    pool.acquire_timeout = 2.0
+    assert pool.acquire() is first
+    assert len(opened) == 2
+
+def test_idle_connections_are_health_checked():
+    pool, opened = make_pool(health_check_interval=0.0)
+    with pool.connection():
+        pass
+    opened[0].alive = False
+    with pool.connection() as connection:
+        assert connection is opened[1]  # The dead one was pinged, closed and replaced
+    assert opened[0].pings == 1 and opened[0].closed
+    assert pool.get_stats()['health_checks'] == 1
+
+def test_transient_errors_discard_the_connection():
+    pool, opened = make_pool()
+    with pytest.raises(Error):
+        with pool.connection():
+            raise Error("lost", errno=errorcode.CR_SERVER_LOST)
+    with pytest.raises(Error):
+        with pool.connection():
+            raise Error("syntax", errno=errorcode.ER_PARSE_ERROR)
+    assert opened[0].closed and not opened[1].closed
+    assert pool.get_stats()['idle'] == 1
+
+def test_without_reuse_every_call_opens_a_connection():
+    pool, opened = make_pool(reuse=False)
+    for _ in range(3):
+        with pool.connection():
+            pass
+    assert len(opened) == 3 and all(connection.closed for connection in opened)
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    pool, opened = make_pool()
+    monkeypatch.setattr(database, '_pool', pool)
+    monkeypatch.setitem(database.POOL_CONFIG, 'retry_backoff', 0.0)
+    monkeypatch.setattr(database, '_call_stats', defaultdict(lambda: {
+        'calls': 0, 'errors': 0, 'retries': 0, 'total_ms': 0.0, 'max_ms': 0.0}))
+    return opened
+
+def test_transient_errors_are_retried_on_a_fresh_connection(fake_pool):
+    seen = []
+
+    def work(connection):
+        seen.append(connection)
+        if len(seen) < 3:
+            raise Error("deadlock", errno=errorcode.ER_LOCK_DEADLOCK)
+        return 'ok'
+
+    assert database._with_connection('work', work) == 'ok'
+    assert len(set(map(id, seen))) == 3
+    stats = database.get_db_stats()['calls']['work']
+    assert (stats['calls'], stats['errors'], stats['retries']) == (1, 0, 2)
+
+def test_retries_are_bounded_and_other_errors_raise_at_once(fake_pool):
+    attempts = []
+
+    def lost(connection):
+        attempts.append(1)
+        raise Error("lost", errno=errorcode.CR_SERVER_LOST)
+
+    with pytest.raises(Error):
+        database._with_connection('lost', lost)
+    assert len(attempts) == 1 + database.POOL_CONFIG['retries']
+
+    attempts.clear()
+
+    def bad_sql(connection):
+        attempts.append(1)
+        raise Error("syntax", errno=errorcode.ER_PARSE_ERROR)
+
+    with pytest.raises(Error):
+        database._with_connection('bad_sql', bad_sql)
+    assert len(attempts) == 1
+    assert database.get_db_stats()['calls']['bad_sql']['errors'] == 1
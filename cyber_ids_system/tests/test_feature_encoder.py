@@ -0,0 +1,44 @@
+import numpy as np
+
+import detector
+import records
+from feature_encoder import FeatureEncoder, KDD_VOCABULARY, load_vocabulary
+
+VOCABULARY = {'protocol_type': ['icmp', 'tcp', 'udp'], 'service': ['http', 'http_443', 'other', 'smtp'],
+              'flag': ['REJ', 'S0', 'SF']}
+
+def row(protocol, service, flag, src_bytes=0):
+    features = np.zeros(records.NUM_FEATURES)
+    features[records.FEATURE_INDEX['protocol_type']] = records.category_id('protocol_type', protocol)
+    features[records.FEATURE_INDEX['service']] = records.category_id('service', service)
+    features[records.FEATURE_INDEX['flag']] = records.category_id('flag', flag)
+    features[records.FEATURE_INDEX['src_bytes']] = src_bytes
+    return features
+
+def test_categorical_values_get_their_training_codes():
+    encoded = FeatureEncoder(VOCABULARY).encode([row('udp', 'smtp', 'S0', 42), row('tcp', 'http_ssl', 'SF')])
+    index = records.FEATURE_INDEX
+    assert encoded[0, index['protocol_type']] == 2 and encoded[0, index['service']] == 3
+    assert encoded[0, index['flag']] == 1 and encoded[0, index['src_bytes']] == 42
+    assert encoded[1, index['service']] == 1  # Captured 'http_ssl' is KDD's 'http_443'
+
+def test_unseen_values_share_the_other_code():
+    encoded = FeatureEncoder(VOCABULARY).encode([row('tcp', 'test_encoder_unseen', 'OTH')])
+    assert encoded[0, records.FEATURE_INDEX['service']] == 2
+    assert encoded[0, records.FEATURE_INDEX['flag']] == -1  # No 'OTH' in this vocabulary
+
+def test_columns_follow_the_model_order():
+    names = list(reversed(records.FEATURE_NAMES))
+    encoded = FeatureEncoder(VOCABULARY, names).encode([row('udp', 'http', 'REJ', 7)])
+    assert encoded[0, names.index('src_bytes')] == 7 and encoded[0, names.index('protocol_type')] == 2
+
+def test_missing_vocabulary_falls_back_to_kdd(tmp_path):
+    vocabulary = load_vocabulary(str(tmp_path / 'categorical_vocab.pkl'))
+    assert vocabulary is KDD_VOCABULARY
+    assert FeatureEncoder(vocabulary).fallback and not FeatureEncoder(VOCABULARY).fallback
+
+def test_model_stats_report_the_vocabulary_in_use():
+    detector.load_models(eager=True)
+    vocabulary = detector.get_model_stats()['vocabulary']
+    assert set(vocabulary) == {'rf_encoder', 'dl_encoder'}
+    assert set(vocabulary.values()) <= {'trained', 'kdd-fallback'}
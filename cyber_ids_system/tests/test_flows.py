@@ -0,0 +1,88 @@
+from flows import FlowTable, FIN, SYN, RST, ACK
+
+CLIENT = ('10.0.0.1', 40000)
+SERVER = ('10.0.0.2', 80)
+
+def send(table, timestamp, flags, payload=0, from_client=True):
+    (src_ip, sport), (dst_ip, dport) = (CLIENT, SERVER) if from_client else (SERVER, CLIENT)
+    return table.add_packet(timestamp, src_ip, dst_ip, sport, dport, 'tcp', 'http', payload, flags)
+
+def handshake(table, start=0.0):
+    exported = send(table, start, SYN)
+    exported += send(table, start + 0.01, SYN | ACK, from_client=False)
+    exported += send(table, start + 0.02, ACK)
+    return exported
+
+def test_full_teardown_is_one_flow():
+    table = FlowTable(close_wait=5.0)
+    exported = handshake(table)
+    exported += send(table, 0.1, ACK, payload=300)
+    exported += send(table, 0.2, ACK, payload=1200, from_client=False)
+    exported += send(table, 0.3, FIN | ACK)
+    exported += send(table, 0.31, FIN | ACK, from_client=False)
+    exported += send(table, 0.32, ACK)  # Last ACK after both FINs
+    exported += send(table, 1.0, FIN | ACK, from_client=False)  # Retransmitted FIN
+    assert exported == []
+    assert len(table) == 1
+
+    exported = table.expire(10.0)
+    assert len(exported) == 1
+    record = exported[0]
+    assert record['flag'] == 'SF'
+    assert (record['src_ip'], record['src_port']) == CLIENT
+    assert (record['src_bytes'], record['dst_bytes']) == (300, 1200)
+    assert record['packets'] == 9
+    assert len(table) == 0 and table.flows_exported == 1
+
+def test_closed_flow_is_exported_once_close_wait_passes():
+    table = FlowTable(close_wait=2.0)
+    handshake(table)
+    send(table, 0.5, RST, from_client=False)
+    assert table.expire(2.4) == []
+    assert [record['flag'] for record in table.expire(2.6)] == ['RSTR']
+
+def test_new_syn_on_closed_tuple_starts_a_new_flow():
+    table = FlowTable(close_wait=5.0)
+    handshake(table)
+    send(table, 0.3, FIN | ACK)
+    send(table, 0.31, FIN | ACK, from_client=False)
+    exported = handshake(table, start=1.0)
+    assert [record['flag'] for record in exported] == ['SF']
+    assert len(table) == 1
+
+def test_without_close_wait_flows_are_exported_on_close():
+    table = FlowTable(close_wait=0)
+    handshake(table)
+    exported = send(table, 0.3, RST)
+    assert [record['flag'] for record in exported] == ['RSTO']
+
+def test_handshake_states():
+    table = FlowTable()
+    send(table, 0.0, SYN)
+    send(table, 0.01, RST | ACK, from_client=False)
+    assert [record['flag'] for record in table.expire(10.0)] == ['REJ']
+
+    send(table, 20.0, SYN)
+    assert [record['flag'] for record in table.flush()] == ['S0']
+
+    send(table, 30.0, ACK, payload=10)  # Mid-stream, no handshake seen
+    assert [record['flag'] for record in table.flush()] == ['OTH']
+
+def test_idle_and_active_timeouts():
+    table = FlowTable(idle_timeout=30.0, active_timeout=120.0)
+    handshake(table)
+    assert table.expire(29.0) == []
+    assert len(table.expire(31.0)) == 1
+
+    for t in range(0, 130, 10):
+        exported = send(table, 100.0 + t, ACK, payload=1)
+    assert len(exported) == 1 and exported[0]['duration'] == 110
+
+def test_full_table_evicts_closed_flows_first():
+    table = FlowTable(max_flows=2)
+    handshake(table)
+    send(table, 0.3, RST)
+    exported = table.add_packet(0.4, '10.0.0.3', '10.0.0.2', 40001, 80, 'tcp', 'http', 0, SYN)
+    assert exported == []
+    exported = table.add_packet(0.5, '10.0.0.4', '10.0.0.2', 40002, 80, 'tcp', 'http', 0, SYN)
+    assert [record['src_ip'] for record in exported] == ['10.0.0.1']
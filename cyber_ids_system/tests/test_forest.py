@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from forest import FlatForest
+
+@pytest.fixture(scope='module')
+def fitted():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(600, 12))
+    y = (X[:, 0] > 0).astype(int) + (X[:, 1] > 0.5).astype(int) * 2  # 4 classes
+    model = RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0).fit(X, y + 3)
+    return model, FlatForest.from_sklearn(model), rng.normal(size=(700, 12))
+
+@pytest.mark.parametrize('rows', [1, 7, FlatForest.ACCUMULATE_ROWS - 1, FlatForest.ACCUMULATE_ROWS, 700])
+def test_probabilities_bit_identical_to_sklearn(fitted, rows):
+    model, forest, X = fitted
+    np.testing.assert_array_equal(forest.predict_proba(X[:rows]), model.predict_proba(X[:rows]))
+
+def test_labels_and_leaves_match_sklearn(fitted):
+    model, forest, X = fitted
+    labels, proba = forest.predict_with_proba(X)
+    np.testing.assert_array_equal(labels, model.predict(X))
+    assert set(labels) <= {3, 4, 5, 6}  # Original class labels, not indices
+    # Flat node ids are each tree's own ids offset by its root
+    np.testing.assert_array_equal(forest.apply(X) - forest.roots[:, np.newaxis], model.apply(X).T)
+
+def test_saved_forest_is_memory_mapped(fitted, tmp_path):
+    model, forest, X = fitted
+    forest.save(str(tmp_path / 'forest'))
+    loaded = FlatForest.load(str(tmp_path / 'forest'))
+    assert isinstance(loaded.threshold, np.memmap)
+    assert loaded.max_depth == forest.max_depth
+    np.testing.assert_array_equal(loaded.predict_proba(X), forest.predict_proba(X))
@@ -0,0 +1,70 @@
+import os
+import signal
+
+import numpy as np
+import pytest
+
+import detector
+import records
+from inference_pool import InferencePool, PoolBusyError
+
+def feature_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = np.zeros((n, records.NUM_FEATURES))
+    rows[:, records.FEATURE_INDEX['protocol_type']] = records.category_id('protocol_type', 'tcp')
+    rows[:, records.FEATURE_INDEX['service']] = records.category_id('service', 'http')
+    rows[:, records.FEATURE_INDEX['flag']] = records.category_id('flag', 'SF')
+    rows[:, records.FEATURE_INDEX['src_bytes']] = rng.integers(0, 5000, n)
+    rows[:, records.FEATURE_INDEX['count']] = rng.integers(1, 50, n)
+    return rows
+
+@pytest.fixture(scope='module')
+def pool():
+    detector.load_models(eager=True)
+    pool = InferencePool(workers=1, max_rows=64, timeout=60.0, check_interval=3600)
+    pool.start()
+    yield pool
+    pool.stop()
+
+def test_scores_match_the_in_process_models(pool):
+    rows = feature_rows(150)  # Three slots' worth
+    expected = detector._score_models(detector.models, rows, True, 0.9)
+    got = pool.score(rows, detector.models.version)
+    for want, have in zip(expected, got):
+        np.testing.assert_allclose(have, want)
+
+def test_new_category_values_reach_the_workers(pool):
+    rows = feature_rows(8)
+    rows[:, records.FEATURE_INDEX['service']] = records.category_id('service', 'test_pool_new_service')
+    expected = detector._score_models(detector.models, rows, True, 0.9)
+    got = pool.score(rows, detector.models.version)
+    np.testing.assert_allclose(got[1], expected[1])
+
+def test_saturated_pool_raises_busy(pool):
+    pool.submit_timeout = 0.0
+    taken = [pool._free.get() for _ in range(pool.num_slots)]
+    try:
+        with pytest.raises(PoolBusyError):
+            pool.score(feature_rows(1), detector.models.version)
+    finally:
+        for slot in taken:
+            pool._free.put(slot)
+        pool.submit_timeout = 1.0
+
+def test_dead_worker_fails_its_batches_frees_slots_and_is_replaced(pool):
+    worker = pool._workers[0]
+    os.kill(worker.pid, signal.SIGKILL)
+    worker.join(timeout=10)
+
+    future = pool._submit(feature_rows(4), detector.models.version, True, 0.9)
+    assert pool.get_stats()['in_flight'] == 1
+    assert pool.check_workers() == [0]
+    with pytest.raises(RuntimeError, match='exited'):
+        future.result(timeout=1)
+
+    stats = pool.get_stats()
+    assert stats['in_flight'] == 0 and stats['restarts'] == 1
+    assert pool._workers[0].pid != worker.pid
+    rows = feature_rows(20)
+    expected = detector._score_models(detector.models, rows, True, 0.9)
+    np.testing.assert_allclose(pool.score(rows, detector.models.version)[1], expected[1])
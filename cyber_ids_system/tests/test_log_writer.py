@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+import database
+from log_writer import TrafficLogWriter
+
+def entry(n, prediction='Normal'):
+    return {'timestamp': '2026-01-01T00:00:00', 'src_ip': '10.0.0.%d' % n, 'dst_ip': '10.0.0.254',
+            'protocol': 'tcp', 'service': 'http', 'prediction': prediction, 'confidence': 0.9,
+            'threat_level': 'Low', 'blocked': False}
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Records every batch handed to the database; batches holding a 'fail' row are rejected."""
+    written = []
+
+    def log_traffic_batch(rows):
+        written.append(rows)
+        return all(row[5] != 'fail' for row in rows)
+
+    monkeypatch.setattr(database, 'log_traffic_batch', log_traffic_batch)
+    return written
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+def test_entries_are_written_in_multi_row_batches(batches):
+    writer = TrafficLogWriter(batch_size=10, max_delay=0.2)
+    for n in range(25):
+        writer.submit(entry(n))
+    writer.start()
+    wait_for(lambda: writer.get_stats()['rows_written'] == 25)
+    writer.stop()
+
+    assert [len(rows) for rows in batches] == [10, 10, 5]
+    assert [row[1] for rows in batches for row in rows] == ['10.0.0.%d' % n for n in range(25)]
+    stats = writer.get_stats()
+    assert (stats['batches'], stats['rows_written'], stats['max_batch'], stats['depth']) == (3, 25, 10, 0)
+
+def test_partial_batch_is_written_after_max_delay(batches):
+    writer = TrafficLogWriter(batch_size=100, max_delay=0.05)
+    writer.start()
+    writer.submit(entry(1))
+    writer.submit(entry(2))
+    wait_for(lambda: batches)
+    assert [len(rows) for rows in batches] == [2]  # Not waiting for the batch to fill
+    writer.stop()
+
+def test_full_buffer_sheds_instead_of_blocking(batches):
+    writer = TrafficLogWriter(maxsize=3, batch_size=10)
+    assert [writer.submit(entry(n)) for n in range(5)] == [True, True, True, False, False]
+    writer.flush()
+    assert writer.get_stats()['dropped'] == 2
+    assert [row[1] for row in batches[0]] == ['10.0.0.0', '10.0.0.1', '10.0.0.2']
+
+def test_failed_batches_are_counted(batches):
+    writer = TrafficLogWriter(batch_size=2)
+    for prediction in ('Normal', 'fail', 'DoS'):
+        writer.submit(entry(1, prediction))
+    writer.flush()
+    stats = writer.get_stats()
+    assert (stats['rows_written'], stats['failed_rows'], stats['batches']) == (1, 2, 2)
+
+def test_log_traffic_goes_through_the_writer(batches, monkeypatch):
+    writer = TrafficLogWriter()
+    monkeypatch.setattr(database, 'log_writer', None)
+    database.use_log_writer(writer)
+    database.log_traffic(entry(7, 'Probe'))
+    assert writer.get_stats()['depth'] == 1
+    writer.flush()
+    assert batches == [[database.log_row(entry(7, 'Probe'))]]
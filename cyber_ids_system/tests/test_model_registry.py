@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+
+import detector
+from model_registry import ModelRegistry
+
+MODELS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
+
+def test_components_load_once_on_first_use():
+    loads = []
+    registry = ModelRegistry('v1')
+    registry.register('a', lambda: loads.append('a') or 'A')
+    registry.register('b', lambda: loads.append('b') or 'B')
+
+    assert loads == [] and not registry.is_loaded('a')
+    assert registry.get('a') == 'A' and registry.get('a') == 'A'
+    assert loads == ['a']
+    assert registry.get_stats()['loaded'] == ['a']
+
+    registry.clear()
+    assert registry.get('a') == 'A' and loads == ['a', 'a']
+
+def test_failed_component_is_none_until_cleared():
+    attempts = []
+
+    def broken():
+        attempts.append(1)
+        raise IOError("missing file")
+
+    registry = ModelRegistry()
+    registry.register('ok', lambda: 'ok')
+    registry.register('broken', broken)
+
+    assert registry.load_all() is False
+    assert registry.get('broken') is None and len(attempts) == 1
+    assert registry.get_stats()['errors'] == {'broken': 'missing file'}
+    registry.clear()
+    registry.get('broken')
+    assert len(attempts) == 2
+
+def test_warm_up_runs_for_loaded_components_only():
+    calls = []
+    registry = ModelRegistry()
+    registry.register('loaded', lambda: 'x', warm_up=calls.append)
+    registry.register('lazy', lambda: 'y', warm_up=calls.append)
+    registry.register('fails', lambda: 'z', warm_up=lambda component: 1 / 0)
+    registry.get('loaded')
+    registry.get('fails')
+
+    registry.warm_up()
+    assert calls == ['x']
+    assert set(registry.get_stats()['warm_up_ms']) == {'loaded', 'fails'}
+
+def test_shipped_models_load_lazily():
+    registry = detector.build_registry(MODELS, 'test')
+    assert registry.get_stats()['loaded'] == []
+
+    forest = registry.get('forest')
+    assert registry.get_stats()['loaded'] == ['forest']
+    assert forest.predict_proba(np.zeros((1, 41))).shape[0] == 1
+
+    assert registry.load_all()
+    registry.warm_up()
+    stats = registry.get_stats()
+    assert set(stats['loaded']) == set(stats['registered'])
+    assert set(stats['warm_up_ms']) == {'forest', 'rf_encoder', 'cnn', 'lstm', 'dl_encoder'}
@@ -0,0 +1,78 @@
+import os
+import time
+
+import pytest
+
+import detector
+from model_registry import activate_version, publish_version, read_manifest, version_dir
+
+MODELS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
+
+def test_publish_copies_the_preferred_artifacts(tmp_path):
+    root = str(tmp_path / 'store')
+    assert read_manifest(root) == {'active': None, 'versions': {}}
+
+    publish_version(root, MODELS, 'v1')
+    manifest = read_manifest(root)
+    assert manifest['active'] == 'v1'
+    files = manifest['versions']['v1']['files']
+    assert 'fl_ids_model' in files and 'fl_ids_model.pkl' not in files  # Memory-mappable export preferred
+    assert 'cnn_ids_model' in files
+    assert sorted(os.listdir(version_dir(root, 'v1'))) == sorted(files)
+
+def test_versions_are_immutable_and_activation_checked(tmp_path):
+    root = str(tmp_path / 'store')
+    publish_version(root, MODELS, 'v1')
+    publish_version(root, MODELS, 'v2', activate=False)
+    assert read_manifest(root)['active'] == 'v1'
+
+    with pytest.raises(ValueError):
+        publish_version(root, MODELS, 'v1')
+    with pytest.raises(ValueError):
+        activate_version(root, 'v3')
+    activate_version(root, 'v2')
+    assert read_manifest(root)['active'] == 'v2'
+
+def test_incomplete_source_is_rejected(tmp_path):
+    (tmp_path / 'empty').mkdir()
+    with pytest.raises(ValueError):
+        publish_version(str(tmp_path / 'store'), str(tmp_path / 'empty'), 'v1')
+    assert not os.path.exists(version_dir(str(tmp_path / 'store'), 'v1'))
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    root = str(tmp_path / 'store')
+    monkeypatch.setattr(detector, 'MODEL_STORE', root)
+    monkeypatch.setattr(detector, 'models', detector.models)  # Restored after the test
+    return root
+
+def test_hot_reload_swaps_versions(store):
+    publish_version(store, MODELS, 'v1')
+    detector.reload_models('v1', wait=True)
+    assert detector.models.version == 'v1'
+    assert detector.reload_state['status'] == 'done'
+    assert detector.models.is_loaded('forest')  # Loaded and warmed up before the swap
+
+def test_failed_reload_keeps_serving(store):
+    publish_version(store, MODELS, 'v1')
+    publish_version(store, MODELS, 'broken')
+    os.remove(os.path.join(version_dir(store, 'broken'), 'fl_ids_model', 'feature.npy'))
+
+    detector.reload_models('v1', wait=True)
+    detector.reload_models('broken', wait=True)
+    assert detector.models.version == 'v1'
+    assert detector.reload_state['status'] == 'failed'
+
+def test_watcher_follows_the_active_version(store):
+    publish_version(store, MODELS, 'v1')
+    detector.reload_models('v1', wait=True)
+    watcher = detector.ModelWatcher(interval=0.05)
+    watcher.start()
+    try:
+        publish_version(store, MODELS, 'v2')
+        deadline = time.monotonic() + 10
+        while detector.models.version != 'v2' and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        watcher.stop()
+    assert detector.models.version == 'v2'
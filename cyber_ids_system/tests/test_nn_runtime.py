@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+import pytest
+
+from nn_runtime import NumpyModel, check_layer, export_keras_model
+
+MODELS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
+
+@pytest.mark.parametrize('name', ['cnn_ids_model', 'lstm_ids_model'])
+def test_numpy_model_matches_keras(tmp_path, name):
+    tf = pytest.importorskip('tensorflow')
+    h5_path = os.path.join(MODELS, name + '.h5')
+    keras_model = tf.keras.models.load_model(h5_path)
+
+    npz_path = export_keras_model(h5_path, str(tmp_path / (name + '.npz')))
+    x = np.random.default_rng(0).normal(size=(64,) + tuple(keras_model.input_shape[1:])).astype(np.float32)
+    expected = keras_model.predict_on_batch(x)
+
+    for model in (NumpyModel(npz_path), NumpyModel(str(tmp_path / name))):
+        np.testing.assert_allclose(model.predict_on_batch(x), expected, rtol=1e-4, atol=1e-5)
+
+@pytest.mark.parametrize('name', ['cnn_ids_model', 'lstm_ids_model'])
+def test_shipped_exports_agree(name):
+    npz = NumpyModel(os.path.join(MODELS, name + '.npz'))
+    mapped = NumpyModel(os.path.join(MODELS, name))
+    x = np.random.default_rng(1).normal(size=(16, 1, 41))
+    probs = npz.predict(x)
+    np.testing.assert_array_equal(probs, mapped.predict(x))
+    assert probs.shape == (16, 12)
+    np.testing.assert_allclose(probs.sum(axis=1), 1, rtol=1e-5)
+
+def test_check_layer_accepts_defaults():
+    check_layer('Conv1D', {'padding': 'valid', 'dilation_rate': [1], 'activation': 'relu'})
+    check_layer('LSTM', {'activation': 'tanh', 'recurrent_activation': 'hard_sigmoid'})
+    check_layer('Flatten', {})
+
+@pytest.mark.parametrize('kind, config', [
+    ('GRU', {}),
+    ('Conv1D', {'padding': 'same'}),
+    ('Conv1D', {'dilation_rate': [2]}),
+    ('Dense', {'use_bias': False}),
+    ('LSTM', {'go_backwards': True}),
+    ('Dense', {'activation': 'gelu'}),
+])
+def test_check_layer_rejects_what_the_runtime_would_ignore(kind, config):
+    with pytest.raises(ValueError):
+        check_layer(kind, config)
+
+def test_dense_and_lstm_forward_pass():
+    rng = np.random.default_rng(2)
+    model = NumpyModel.__new__(NumpyModel)
+    units = 3
+    kernel = rng.normal(size=(4, 4 * units)).astype(np.float32)
+    recurrent = rng.normal(size=(units, 4 * units)).astype(np.float32)
+    bias = rng.normal(size=4 * units).astype(np.float32)
+    dense = rng.normal(size=(units, 2)).astype(np.float32), np.zeros(2, dtype=np.float32)
+    model.layers = [{'class_name': 'LSTM', 'config': {'activation': 'tanh', 'recurrent_activation': 'sigmoid'}},
+                    {'class_name': 'Dense', 'config': {'activation': 'softmax'}}]
+    model.weights = [[kernel, recurrent, bias], list(dense)]
+    x = rng.normal(size=(5, 2, 4)).astype(np.float32)
+
+    # Reference LSTM, one sample and one gate at a time
+    sigmoid = lambda v: 1 / (1 + np.exp(-v))
+    expected = []
+    for sample in x:
+        h, c = np.zeros(units), np.zeros(units)
+        for step in sample:
+            z = step @ kernel + h @ recurrent + bias
+            i, f, g, o = (z[k * units:(k + 1) * units] for k in range(4))
+            c = sigmoid(f) * c + sigmoid(i) * np.tanh(g)
+            h = sigmoid(o) * np.tanh(c)
+        logits = h @ dense[0]
+        expected.append(np.exp(logits) / np.exp(logits).sum())
+
+    np.testing.assert_allclose(model.predict(x), expected, rtol=1e-5, atol=1e-6)
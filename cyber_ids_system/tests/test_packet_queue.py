@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+from packet_queue import BoundedPacketQueue, DROP_NEWEST, DROP_OLDEST, SAMPLE
+
+def fill(queue, items):
+    return [queue.put(item) for item in items]
+
+def test_drop_newest_rejects_arrivals():
+    queue = BoundedPacketQueue(maxsize=3, policy=DROP_NEWEST)
+    assert fill(queue, range(5)) == [True, True, True, False, False]
+    assert queue.get_batch(10, timeout=0) == [0, 1, 2]
+    stats = queue.get_stats()
+    assert (stats['enqueued'], stats['dequeued'], stats['dropped'], stats['high_water']) == (3, 3, 2, 3)
+
+def test_drop_oldest_keeps_the_latest():
+    queue = BoundedPacketQueue(maxsize=3, policy=DROP_OLDEST)
+    assert all(fill(queue, range(5)))
+    assert queue.get_batch(10, timeout=0) == [2, 3, 4]
+    stats = queue.get_stats()
+    assert (stats['enqueued'], stats['dropped'], stats['depth']) == (5, 2, 0)
+
+def test_sample_admits_every_nth_overflow():
+    queue = BoundedPacketQueue(maxsize=2, policy=SAMPLE, sample_every=3)
+    accepted = fill(queue, range(2, 11))  # 2 fill the queue, then 7 overflow arrivals
+    assert accepted == [True, True, False, False, True, False, False, True, False]
+    assert queue.get_batch(10, timeout=0) == [6, 9]
+    assert queue.get_stats()['dropped'] == 7  # 5 rejected + 2 evicted
+
+def test_ring_wraps_in_arrival_order():
+    queue = BoundedPacketQueue(maxsize=4)
+    received = []
+    for start in range(0, 40, 3):
+        fill(queue, range(start, start + 3))
+        received += queue.get_batch(2, timeout=0)
+    received += queue.get_batch(100, timeout=0)
+    assert received == sorted(received)
+    assert queue.get_stats()['dropped'] + len(received) == 42
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        BoundedPacketQueue(policy='block')
+
+def test_get_batch_timeout_and_linger():
+    queue = BoundedPacketQueue(maxsize=8)
+    start = time.monotonic()
+    assert queue.get_batch(4, timeout=0.05) == []
+    assert time.monotonic() - start >= 0.04
+
+    queue.put('a')
+    threading.Timer(0.02, queue.put, args=('b',)).start()
+    assert queue.get_batch(2, timeout=0, linger=1.0) == ['a', 'b']
+
+def test_get_nowait():
+    queue = BoundedPacketQueue(maxsize=2)
+    assert queue.get_nowait() is None
+    queue.put('x')
+    assert queue.get_nowait() == 'x'
+
+def test_producer_never_blocks_and_counters_balance():
+    queue = BoundedPacketQueue(maxsize=64, policy=DROP_OLDEST)
+    received = []
+    done = threading.Event()
+
+    def consume():
+        while not done.is_set() or len(queue):
+            received.extend(queue.get_batch(16, timeout=0.01))
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    fill(queue, range(20000))
+    done.set()
+    consumer.join()
+
+    stats = queue.get_stats()
+    assert stats['enqueued'] == 20000
+    assert stats['dequeued'] == len(received)
+    assert stats['dropped'] + len(received) == 20000
+    assert received == sorted(received)
@@ -0,0 +1,102 @@
+from collections import Counter
+from datetime import date, timedelta
+
+import database
+import db_schema
+from stats_rollup import TrafficStats
+
+TODAY = date.today()
+
+def to_days(day):
+    """MySQL TO_DAYS()."""
+    return day.toordinal() + 365
+
+class PartitionCursor:
+    """Answers the information_schema, TO_DAYS and dropped-row count queries; records the ALTERs."""
+
+    def __init__(self, first_day=None, last_day=None, expired_counts=()):
+        self.partitions = []
+        if first_day is not None:
+            self.partitions.append(('p0', str(to_days(first_day))))
+            day = first_day
+            while day <= last_day:
+                self.partitions.append((db_schema.partition_name(day), str(to_days(day + timedelta(days=1)))))
+                day += timedelta(days=1)
+            self.partitions.append(('pmax', 'MAXVALUE'))
+        self.expired_counts = list(expired_counts)
+        self.statements = []
+        self._result = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+        if 'information_schema.PARTITIONS' in sql:
+            self._result = self.partitions
+        elif sql.startswith('SELECT TO_DAYS'):
+            self._result = [(to_days(params[0]),)]
+        elif 'COUNT(*)' in sql:
+            self._result = self.expired_counts
+
+    def fetchone(self):
+        return self._result[0]
+
+    def fetchall(self):
+        return self._result
+
+    def close(self):
+        pass
+
+    def alters(self):
+        return [sql for sql in self.statements if sql.startswith('ALTER TABLE')]
+
+def test_unpartitioned_table_is_left_alone():
+    cursor = PartitionCursor()
+    assert db_schema.maintain_partitions(cursor) == ([], [])
+    assert cursor.alters() == []
+
+def test_expired_days_are_dropped_as_partitions():
+    cursor = PartitionCursor(TODAY - timedelta(days=40), TODAY + timedelta(days=7))
+    seen = []
+    added, dropped = db_schema.maintain_partitions(cursor, retention_days=30, days_ahead=7,
+                                                   before_drop=lambda cursor, names: seen.append(list(names)))
+
+    expected = ['p0'] + [db_schema.partition_name(TODAY - timedelta(days=n)) for n in range(40, 30, -1)]
+    assert added == []
+    assert dropped == expected and seen == [expected]
+    assert cursor.alters() == [f"ALTER TABLE traffic_logs DROP PARTITION {', '.join(expected)}"]
+
+def test_upcoming_days_are_split_off_pmax():
+    cursor = PartitionCursor(TODAY - timedelta(days=3), TODAY - timedelta(days=2))
+    added, dropped = db_schema.maintain_partitions(cursor, retention_days=30, days_ahead=2)
+
+    assert added == [db_schema.partition_name(TODAY + timedelta(days=n)) for n in range(-1, 3)]
+    assert dropped == []  # p0 of a recent table still holds days within retention
+    alter, = cursor.alters()
+    assert alter.startswith("ALTER TABLE traffic_logs REORGANIZE PARTITION pmax INTO (")
+    assert alter.endswith("PARTITION pmax VALUES LESS THAN MAXVALUE)")
+
+def test_long_gap_does_not_create_expired_partitions():
+    cursor = PartitionCursor(TODAY - timedelta(days=61), TODAY - timedelta(days=60))
+    added, dropped = db_schema.maintain_partitions(cursor, retention_days=30, days_ahead=0)
+    assert added[0] == db_schema.partition_name(TODAY - timedelta(days=30))
+    assert added[-1] == db_schema.partition_name(TODAY)
+    assert dropped == ['p0', db_schema.partition_name(TODAY - timedelta(days=61)),
+                       db_schema.partition_name(TODAY - timedelta(days=60))]
+
+def test_dropped_rows_leave_the_dashboard_counters(monkeypatch):
+    cursor = PartitionCursor(TODAY - timedelta(days=40), TODAY + timedelta(days=7),
+                             expired_counts=[('Normal', 70), ('DoS', 5)])
+
+    class Connection:
+        def cursor(self):
+            return cursor
+
+    stats = TrafficStats()
+    stats.loaded = True
+    stats.base = Counter({'Normal': 100, 'DoS': 10})
+    monkeypatch.setattr(database, 'traffic_stats', stats)
+    monkeypatch.setattr(database, '_with_connection', lambda name, work: work(Connection()))
+    monkeypatch.setattr(database, 'persist_stats', lambda: None)
+
+    added, dropped = database.maintain_partitions()
+    assert len(dropped) == 11
+    assert stats.snapshot()['threat_distribution'] == {'Normal': 30, 'DoS': 5}
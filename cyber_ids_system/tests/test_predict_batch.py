@@ -0,0 +1,143 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import detector
+from inference_pool import PoolBusyError
+from packet_queue import RecordQueue
+from records import NUM_FEATURES
+
+class Identity:
+    def transform(self, X):
+        return X
+
+    def encode(self, X):
+        return np.asarray(X, dtype=np.float64)
+
+class StubForest:
+    """Label = column 0 of the row, confidence = column 1 (the rest goes to the next label)."""
+
+    def predict_with_proba(self, X):
+        labels = X[:, 0].astype(np.int64)
+        probs = np.zeros((len(X), len(detector.THREAT_TYPES)))
+        probs[np.arange(len(X)), labels] = X[:, 1]
+        probs[np.arange(len(X)), (labels + 1) % probs.shape[1]] = 1 - X[:, 1]
+        return labels, probs
+
+class StubNetwork:
+    """Always answers DoS with 0.8."""
+
+    def predict_on_batch(self, X):
+        probs = np.zeros((len(X), len(detector.THREAT_TYPES)))
+        probs[:, 1], probs[:, 0] = 0.8, 0.2
+        return probs
+
+class StubModels:
+    version = 'test'
+
+    def __init__(self):
+        self.components = {'scaler': Identity(), 'rf_encoder': Identity(), 'scaler_dl': Identity(),
+                           'dl_encoder': Identity(), 'forest': StubForest(), 'cnn': StubNetwork(),
+                           'lstm': StubNetwork()}
+
+    def get(self, name):
+        return self.components[name]
+
+@pytest.fixture(autouse=True)
+def stub_models(monkeypatch):
+    monkeypatch.setattr(detector, 'models', StubModels())
+    monkeypatch.setattr(detector, 'inference_pool', None)
+
+def rows(*label_confidence):
+    features = np.zeros((len(label_confidence), NUM_FEATURES))
+    features[:, :2] = label_confidence
+    return features
+
+def test_fusion_rules_per_row():
+    features = rows((0, 0.99), (2, 0.99), (2, 0.6), (0, 0.99))
+    results = detector.predict_batch(features, rqa_det=[0, 0, 0, 95], use_cache=False)
+
+    assert [r['prediction'] for r in results] == ['Normal', 'Probe', 'DoS', detector.RQA_ANOMALY]
+    assert [r['is_malicious'] for r in results] == [False, True, True, True]
+    assert [r['threat_level'] for r in results] == ['Low', 'High', 'Medium', 'Critical']
+    assert [r['confidence'] for r in results] == pytest.approx([0.99, 0.99, 0.8, 0.95])
+    assert [r['details']['tier'] for r in results] == ['rf', 'ensemble', 'ensemble', 'rf']
+    assert {r['details']['model_version'] for r in results} == {'test'}
+
+def test_batch_matches_rows_scored_one_at_a_time():
+    features = rows((0, 0.99), (1, 0.7), (3, 0.95), (0, 0.5))
+    rqa_det = [10, 20, 30, 91]
+    batch = detector.predict_batch(features, rqa_det, use_cache=False)
+    single = [detector.predict_batch(features[i], [rqa_det[i]], use_cache=False)[0] for i in range(4)]
+    assert batch == single
+
+def test_empty_batch_and_missing_models(monkeypatch):
+    assert detector.predict_batch(np.zeros((0, NUM_FEATURES)), use_cache=False) == []
+    monkeypatch.setattr(detector, 'models', {})
+    assert detector.predict_batch(rows((0, 1), (0, 1))) == [{'prediction': 'unknown', 'confidence': 0}] * 2
+
+class QueueSniffer:
+    def __init__(self, records):
+        self.packet_queue = RecordQueue(maxsize=1000)
+        for n in range(records):
+            self.packet_queue.put(([0.0] * NUM_FEATURES, float(n), '10.0.0.1', '10.0.0.2',
+                                   'tcp', 'http', 'SF', n, 0.0, 0.0))
+
+    def get_batch(self, n, timeout=None, linger=0.0):
+        return self.packet_queue.get_batch(n, timeout, linger)
+
+def scored_batches(monkeypatch, predict):
+    monkeypatch.setattr(detector, 'predict_records', predict)
+    batches = []
+    lock = threading.Lock()
+
+    def on_results(batch, predictions):
+        with lock:
+            batches.append((list(batch['packets']), predictions))
+    return batches, on_results
+
+def test_detection_loop_scores_micro_batches(monkeypatch):
+    batches, on_results = scored_batches(monkeypatch, lambda batch: ['ok'] * len(batch))
+    loop = detector.DetectionLoop(QueueSniffer(250), on_results, batch_size=100, max_wait_ms=5)
+    loop.start()
+    deadline = time.monotonic() + 5
+    while loop.get_stats()['rows'] < 250 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    loop.stop()
+
+    assert [len(packets) for packets, _ in batches] == [100, 100, 50]
+    assert sum((packets for packets, _ in batches), []) == list(range(250))
+    stats = loop.get_stats()
+    assert (stats['batches'], stats['rows'], stats['dropped_rows']) == (3, 250, 0)
+
+def test_stop_drains_what_is_still_queued(monkeypatch):
+    batches, on_results = scored_batches(monkeypatch, lambda batch: ['ok'] * len(batch))
+    loop = detector.DetectionLoop(QueueSniffer(30), on_results, batch_size=8)
+    loop.stop()  # Never started: stop() still scores the queue
+    assert [len(packets) for packets, _ in batches] == [8, 8, 8, 6]
+
+def test_backpressure_retries_then_drops(monkeypatch):
+    calls = []
+
+    def busy_once(batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise PoolBusyError("busy")
+        return ['ok'] * len(batch)
+
+    batches, on_results = scored_batches(monkeypatch, busy_once)
+    loop = detector.DetectionLoop(QueueSniffer(4), on_results, batch_size=4, max_retries=2)
+    loop.drain()
+    assert calls == [4, 4] and len(batches) == 1
+    assert loop.get_stats()['backpressure_waits'] == 1
+
+    def always_busy(batch):
+        raise TimeoutError("saturated")
+
+    batches, on_results = scored_batches(monkeypatch, always_busy)
+    loop = detector.DetectionLoop(QueueSniffer(4), on_results, batch_size=4, max_retries=1)
+    loop.drain()
+    stats = loop.get_stats()
+    assert batches == [] and stats['dropped_rows'] == 4 and stats['backpressure_waits'] == 2
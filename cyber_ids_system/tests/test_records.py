@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import numpy as np
+
+from packet_queue import RecordQueue, DROP_OLDEST
+from records import (Categories, FEATURE_INDEX, NUM_FEATURES, RECORD_DTYPE, category_id, category_values,
+                     from_dict, sync_categories)
+
+def record(n):
+    features = [float(n)] * NUM_FEATURES
+    return (features, 1000.0 + n, '10.0.0.%d' % n, '10.0.0.254', 'tcp', 'http', 'SF', n, 0.5, 0.25)
+
+def test_categories_intern_in_first_seen_order():
+    categories = Categories()
+    assert [categories.id_for(value) for value in ('tcp', 'udp', 'tcp', 'icmp')] == [0, 1, 0, 2]
+    assert categories.values == ['tcp', 'udp', 'icmp']
+    assert len(categories) == 3
+
+def test_sync_categories_matches_ids_across_processes():
+    category_id('service', 'test-sync-a')
+    values = category_values()
+    values['service'] = values['service'] + ['test-sync-b']
+    sync_categories(values)
+    assert category_values()['service'] == values['service']
+    assert category_id('service', 'test-sync-b') == len(values['service']) - 1
+
+def test_from_dict_places_features_in_column_order():
+    traffic = {'duration': 2.5, 'src_bytes': 300, 'count': 7, 'dst_host_srv_rerror_rate': 0.5,
+               'protocol_type': 'tcp', 'service': 'http', 'flag': 'SF', 'src_ip': '10.0.0.1',
+               'timestamp': '2026-01-01T00:00:00', 'packets': 4, 'rqa_rr': 12.5}
+    row = from_dict(traffic)
+    features = row['features']
+
+    assert row.dtype == RECORD_DTYPE
+    assert features[FEATURE_INDEX['duration']] == 2.5
+    assert features[FEATURE_INDEX['src_bytes']] == 300
+    assert features[FEATURE_INDEX['count']] == 7
+    assert features[NUM_FEATURES - 1] == 0.5
+    assert features[FEATURE_INDEX['dst_bytes']] == 0  # Missing numeric features are 0
+    assert features[FEATURE_INDEX['service']] == category_id('service', 'http')
+    assert row['timestamp'] == datetime(2026, 1, 1).timestamp()
+    assert (row['src_ip'], row['service'], row['packets'], row['rqa_rr']) == ('10.0.0.1', 'http', 4, 12.5)
+
+def test_record_queue_returns_one_array_in_arrival_order():
+    queue = RecordQueue(maxsize=8)
+    for n in range(5):
+        queue.put(record(n))
+    batch = queue.get_batch(3, timeout=0)
+
+    assert isinstance(batch, np.ndarray) and batch.dtype == RECORD_DTYPE
+    assert list(batch['packets']) == [0, 1, 2]
+    assert batch['features'].shape == (3, NUM_FEATURES)
+    assert list(batch['src_ip']) == ['10.0.0.0', '10.0.0.1', '10.0.0.2']
+    assert queue.get_nowait()['packets'] == 3
+
+def test_record_queue_batches_survive_slot_reuse():
+    queue = RecordQueue(maxsize=4, policy=DROP_OLDEST)
+    for n in range(4):
+        queue.put(record(n))
+    batch = queue.get_batch(4, timeout=0)
+    for n in range(10, 16):  # Wraps around and evicts
+        queue.put(record(n))
+
+    assert list(batch['packets']) == [0, 1, 2, 3]  # Copied out, not a view of the slots
+    assert list(queue.get_batch(10, timeout=0)['packets']) == [12, 13, 14, 15]
+    assert queue.get_stats()['dropped'] == 2
+
+def test_empty_batch_is_an_empty_array():
+    batch = RecordQueue(maxsize=4).get_batch(4, timeout=0)
+    assert len(batch) == 0 and batch.dtype == RECORD_DTYPE
@@ -0,0 +1,86 @@
+import pytest
+from scapy.all import Ether, IP, TCP, Raw
+from scapy.utils import wrpcap
+
+import replay
+
+def connection(client_ip, start):
+    """A complete HTTP exchange from client_ip to 10.0.0.254, one packet every 10 ms."""
+    client = dict(src=client_ip, dst='10.0.0.254')
+    server = dict(src='10.0.0.254', dst=client_ip)
+    up = dict(sport=40000, dport=80)
+    down = dict(sport=80, dport=40000)
+    packets = [
+        Ether() / IP(**client) / TCP(flags='S', **up),
+        Ether() / IP(**server) / TCP(flags='SA', **down),
+        Ether() / IP(**client) / TCP(flags='A', **up),
+        Ether() / IP(**client) / TCP(flags='PA', **up) / Raw(b'G' * 200),
+        Ether() / IP(**server) / TCP(flags='PA', **down) / Raw(b'R' * 800),
+        Ether() / IP(**client) / TCP(flags='FA', **up),
+        Ether() / IP(**server) / TCP(flags='FA', **down),
+        Ether() / IP(**client) / TCP(flags='A', **up),
+    ]
+    for i, packet in enumerate(packets):
+        packet.time = start + i * 0.01
+    return packets
+
+@pytest.fixture
+def capture(tmp_path):
+    packets = []
+    for i in range(20):
+        packets += connection(f'10.0.0.{i + 1}', i * 0.1)
+    path = str(tmp_path / 'replay.pcap')
+    wrpcap(path, packets)
+    return path
+
+@pytest.fixture
+def scored(monkeypatch):
+    """Replaces the models: every flow from an even client address is a DoS."""
+    rows = []
+
+    def predict_records(batch):
+        predictions = []
+        for traffic in batch:
+            rows.append(traffic)
+            malicious = int(traffic['src_ip'].rsplit('.', 1)[1]) % 2 == 0
+            predictions.append({'prediction': 'DoS' if malicious else 'Normal', 'confidence': 0.9,
+                                'is_malicious': malicious})
+        return predictions
+
+    monkeypatch.setattr(replay, 'predict_records', predict_records)
+    return rows
+
+def test_every_connection_is_scored_once(capture, scored):
+    results = replay.replay(capture, log_to_db=False, batch_size=4)
+    assert results['packets'] == 160
+    assert results['flows'] == 20
+    assert results['dropped'] == 0
+    assert len(scored) == 20
+    assert results['verdicts'] == {'DoS': 10, 'Normal': 10}
+    assert results['stages']['parse']['count'] == 160
+    assert results['stages']['predict']['count'] == 20
+    assert results['stages']['log']['count'] == 0
+
+def test_limit_stops_early(capture, scored):
+    results = replay.replay(capture, log_to_db=False, limit=24)
+    assert results['packets'] == 24
+    assert results['flows'] == 3
+
+def test_logging_blocks_malicious_sources(capture, scored, monkeypatch):
+    logged, blocked = [], []
+    monkeypatch.setattr(replay.database, 'log_traffic', logged.append)
+    monkeypatch.setattr(replay.database, 'block_ip', lambda ip, reason=None: blocked.append((ip, reason)))
+    monkeypatch.setattr(replay.database, 'persist_stats', lambda: None)
+    monkeypatch.setattr(replay, 'make_log_entry', lambda traffic, prediction: {'prediction': prediction['prediction']})
+
+    results = replay.replay(capture, log_to_db=True)
+    assert len(logged) == 20
+    assert sum(entry.get('blocked', False) for entry in logged) == 10
+    assert sorted(blocked) == sorted((f'10.0.0.{i}', 'Detected DoS') for i in range(2, 21, 2))
+    assert results['stages']['log']['count'] == 20
+
+def test_speed_follows_the_capture_clock(capture, scored):
+    # The capture spans ~1.97 s; at 10x it should take at least ~0.2 s
+    results = replay.replay(capture, speed=10.0, log_to_db=False)
+    assert results['elapsed'] >= 0.19
+    assert results['flows'] == 20
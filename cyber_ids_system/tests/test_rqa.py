@@ -0,0 +1,142 @@
+import numpy as np
+
+from rqa import RQAAnalyzer, RQAStore, batch_rqa, sliding_windows, window_rr_det
+
+def series(n, seed=0):
+    # Packet sizes with repeated patterns, so there are diagonal lines to count
+    rng = np.random.default_rng(seed)
+    return np.tile(rng.choice([60, 60, 120, 1500, 576], 25), n // 25 + 1)[:n] + rng.integers(0, 40, n)
+
+def test_incremental_matches_the_full_matrix_as_the_window_slides():
+    incremental = RQAAnalyzer(window_size=20, epsilon=30)
+    full = RQAAnalyzer(window_size=20, epsilon=30, incremental=False)
+    for value in series(200):
+        incremental.add_data_point(value)
+        full.add_data_point(value)
+        assert incremental.calculate_rqa() == full.calculate_rqa()
+
+def test_window_keeps_the_latest_points_in_arrival_order():
+    rqa = RQAAnalyzer(window_size=4)
+    for value in range(1, 7):
+        rqa.add_data_point(value)
+    assert rqa.data_window.tolist() == [3, 4, 5, 6]
+
+def test_fewer_than_two_points_have_no_recurrence():
+    rqa = RQAAnalyzer(window_size=10)
+    assert rqa.calculate_rqa() == {'rr': 0.0, 'det': 0.0}
+    rqa.add_data_point(100)
+    assert rqa.calculate_rqa() == {'rr': 0.0, 'det': 0.0}
+
+def test_constant_series_is_fully_recurrent():
+    rqa = RQAAnalyzer(window_size=10, epsilon=1)
+    for _ in range(15):
+        rqa.add_data_point(64)
+    # Every off-diagonal point recurs; only the corner diagonals (one point each) are not lines
+    assert rqa.calculate_rqa() == {'rr': 100.0, 'det': round(88 / 90 * 100, 1)}
+
+def naive_rqa(window, epsilon, min_line=2):
+    """Textbook RQA with Python loops (main diagonal excluded)."""
+    n = len(window)
+    r = [[i != j and abs(window[i] - window[j]) < epsilon for j in range(n)] for i in range(n)]
+
+    def runs(cells):
+        lengths, run = [], 0
+        for cell in cells + [False]:
+            if cell:
+                run += 1
+            elif run:
+                lengths.append(run)
+                run = 0
+        return lengths
+
+    diagonal = [length for k in range(1, n) for length in runs([r[i][i + k] for i in range(n - k)])]
+    vertical = [length for j in range(n) for length in runs([r[i][j] for i in range(n)])]
+    recurrences = sum(map(sum, r))
+    lines = [length for length in diagonal if length >= min_line]
+    probs = np.bincount(lines) / len(lines) if lines else np.zeros(1)
+    probs = probs[probs > 0]
+    return {
+        'rr': recurrences / (n * n - n) * 100,
+        'det': 2 * sum(lines) / recurrences * 100 if recurrences else 0,
+        'lam': sum(length for length in vertical if length >= min_line) / recurrences * 100 if recurrences else 0,
+        'lmax': max(lines, default=0),
+        'entr': float(-(probs * np.log(probs)).sum())
+    }
+
+def test_batch_rqa_matches_the_textbook_definitions():
+    windows = sliding_windows(series(60, seed=3), 20, step=5)
+    metrics = batch_rqa(windows, 30)
+    for i, window in enumerate(windows):
+        expected = naive_rqa(window, 30)
+        for name in ('rr', 'det', 'lam', 'lmax', 'entr'):
+            assert np.isclose(metrics[name][i], expected[name]), (i, name)
+
+def test_batch_rqa_is_independent_of_the_chunk_size():
+    windows = sliding_windows(series(300, seed=4), 25)
+    whole = batch_rqa(windows, 30)
+    chunked = batch_rqa(windows, 30, chunk_size=7)
+    for name in whole:
+        np.testing.assert_array_equal(whole[name], chunked[name])
+
+def test_sliding_windows_shape():
+    assert sliding_windows(np.arange(10), 4, step=3).tolist() == [[0, 1, 2, 3], [3, 4, 5, 6], [6, 7, 8, 9]]
+    assert sliding_windows(np.arange(3), 4).shape == (0, 4)
+
+def test_window_rr_det_matches_batch_rqa():
+    for window in sliding_windows(series(120, seed=5), 30, step=10):
+        metrics = batch_rqa(window[None, :], 30)
+        rr, det = window_rr_det(window, 30)
+        assert np.isclose(rr, metrics['rr'][0]) and np.isclose(det, metrics['det'][0])
+
+def test_store_keeps_one_window_per_key():
+    store = RQAStore(window_size=5, epsilon=30)
+    reference = RQAAnalyzer(window_size=5, epsilon=30, incremental=False)
+    for i, value in enumerate(series(12, seed=6)):
+        store.add_data_point('a', value, now=float(i))
+        store.add_data_point('b', 1000 + i, now=float(i))
+        reference.add_data_point(value)
+        assert store.calculate_rqa('a') == reference.calculate_rqa()
+    assert store.get_window('b').tolist() == [1007, 1008, 1009, 1010, 1011]
+    assert store.calculate_rqa('missing') == {'rr': 0.0, 'det': 0.0}
+
+def test_store_evicts_least_recently_used_keys_beyond_max_keys():
+    store = RQAStore(max_keys=3, ttl=1000)
+    for key in 'abc':
+        store.add_data_point(key, 1, now=0.0)
+    store.add_data_point('a', 1, now=1.0)  # 'b' is now the least recently used
+    store.add_data_point('d', 1, now=2.0)
+    assert 'b' not in store and {'a', 'c', 'd'} <= set(store._slots)
+    assert store.get_stats()['lru_evictions'] == 1
+
+def test_store_expires_idle_keys():
+    store = RQAStore(ttl=10)
+    store.add_data_point('old', 1, now=0.0)
+    store.add_data_point('new', 1, now=5.0)
+    store.add_data_point('new', 1, now=12.0)
+    assert 'old' not in store and 'new' in store
+    assert store.get_stats()['ttl_evictions'] == 1
+
+def test_store_grows_its_slots_up_to_max_keys():
+    store = RQAStore(max_keys=3000, ttl=1000)
+    assert store.capacity == RQAStore.INITIAL_CAPACITY
+    for key in range(2500):
+        store.add_data_point(key, key, now=0.0)
+    assert store.capacity == 3000 and len(store) == 2500
+    assert store.get_window(0).tolist() == [0]
+
+def test_cached_metrics_follow_new_points():
+    store = RQAStore(window_size=10, epsilon=5)
+    for value in (100, 100, 100):
+        store.add_data_point('k', value, now=0.0)
+    assert store.calculate_rqa('k')['rr'] == 100.0
+    store.add_data_point('k', 900, now=0.0)
+    assert store.calculate_rqa('k')['rr'] == 50.0
+
+def test_calculate_all_scores_full_windows():
+    store = RQAStore(window_size=4, epsilon=30)
+    for value in (10, 20, 10, 20):
+        store.add_data_point('full', value, now=0.0)
+    store.add_data_point('short', 10, now=0.0)
+    keys, metrics = store.calculate_all()
+    assert keys == ['full']
+    assert metrics['rr'][0] == batch_rqa(np.array([[10, 20, 10, 20]]), 30)['rr'][0]
@@ -0,0 +1,74 @@
+from scapy.all import Ether, IP, TCP
+from scapy.utils import wrpcap
+
+import database
+from capture import open_capture_file, LINKTYPE_ETHERNET
+from sharded_pipeline import ShardedPipeline, shard_for
+
+def test_shard_for_is_stable_per_destination_host():
+    shards = {shard_for('10.0.0.%d' % n, 4) for n in range(50)}
+    assert shards <= {0, 1, 2, 3}
+    assert shard_for('10.0.0.7', 4) == shard_for('10.0.0.7', 4)
+
+def test_stop_persists_stats_when_logging_to_db(monkeypatch):
+    calls = []
+    monkeypatch.setattr(database, 'persist_stats', lambda: calls.append(True))
+
+    pipeline = ShardedPipeline(num_workers=1, log_to_db=True, score=False, start_timeout=60)
+    pipeline.start()
+    report = pipeline.stop()
+
+    assert calls == [True]
+    assert report['packets'] == 0 and report['dropped'] == 0
+
+def test_stop_leaves_stats_alone_without_db(monkeypatch):
+    calls = []
+    monkeypatch.setattr(database, 'persist_stats', lambda: calls.append(True))
+
+    pipeline = ShardedPipeline(num_workers=1, log_to_db=False, score=False, start_timeout=60)
+    pipeline.start()
+    pipeline.stop()
+
+    assert calls == []
+
+def frame(src, dst, sport, dport, flags):
+    return bytes(Ether() / IP(src=src, dst=dst) / TCP(sport=sport, dport=dport, flags=flags))
+
+def test_both_directions_follow_the_first_packet():
+    pipeline = ShardedPipeline(num_workers=4, log_to_db=False, score=False, batch_size=1000, max_routes=2)
+    for n in range(1, 9):
+        server = '10.0.1.%d' % n
+        pipeline.submit(0.0, frame('10.0.0.1', server, 40000, 80, 'S'), LINKTYPE_ETHERNET)
+        pipeline.submit(0.1, frame(server, '10.0.0.1', 80, 40000, 'SA'), LINKTYPE_ETHERNET)
+        shard = shard_for(server, 4)
+        assert [fields[1] for _, fields in pipeline._buffers[shard][-2:]] == [server, '10.0.0.1']
+
+    assert pipeline.packets == 16
+    assert sum(len(buffer) for buffer in pipeline._buffers) == 16
+    assert len(pipeline._routes) == 2  # Oldest routes forgotten
+
+def test_every_flow_is_scored_by_one_worker(tmp_path):
+    packets = []
+    for n in range(1, 11):
+        server = '10.0.1.%d' % n
+        for i, (src, dst, sport, dport, flags) in enumerate([
+                ('10.0.0.1', server, 40000, 80, 'S'), (server, '10.0.0.1', 80, 40000, 'SA'),
+                ('10.0.0.1', server, 40000, 80, 'A'), ('10.0.0.1', server, 40000, 80, 'FA'),
+                (server, '10.0.0.1', 80, 40000, 'FA'), ('10.0.0.1', server, 40000, 80, 'A')]):
+            packet = Ether() / IP(src=src, dst=dst) / TCP(sport=sport, dport=dport, flags=flags)
+            packet.time = n + i * 0.01
+            packets.append(packet)
+    path = str(tmp_path / 'sharded.pcap')
+    wrpcap(path, packets)
+
+    pipeline = ShardedPipeline(num_workers=2, log_to_db=False, score=False, batch_size=8, start_timeout=60)
+    pipeline.start()
+    capture = open_capture_file(path)
+    pipeline.run_capture(capture)
+    capture.close()
+    report = pipeline.stop()
+
+    assert report['packets'] == 60
+    assert report['flows'] == 10
+    assert report['verdicts'] == {'unscored': 10}
+    assert sum(stats['packets'] for stats in report['workers'].values()) == 60
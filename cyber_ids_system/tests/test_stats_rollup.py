@@ -0,0 +1,147 @@
+from collections import Counter
+
+import pytest
+
+import database
+from stats_rollup import TrafficStats
+
+class FakeDatabase:
+    """The rows and statements stats_rollup.py uses, shared by every TrafficStats like a MySQL server."""
+
+    def __init__(self, logs=(), rollup=None):
+        self.logs = list(logs)  # Prediction of each traffic_logs row
+        self.rollup = Counter(rollup or {})
+        self.built = False
+        self.blocked = 0
+
+    def connect(self):
+        return FakeConnection(self)
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+        self.rowcount = 0
+
+    def execute(self, sql, params=()):
+        db = self.db
+        if sql.startswith("INSERT IGNORE INTO traffic_stats_built"):
+            self.rowcount = 0 if db.built else 1
+            db.built = True
+        elif sql.startswith("DELETE FROM traffic_stats_rollup"):
+            db.rollup.clear()
+        elif "FROM traffic_logs GROUP BY prediction" in sql:
+            self.rows = list(Counter(db.logs).items())
+        elif "FROM traffic_stats_rollup" in sql:
+            self.rows = list(db.rollup.items())
+        elif "FROM blocked_ips" in sql:
+            self.rows = [(db.blocked,)]
+        elif sql.startswith("INSERT INTO traffic_logs"):
+            db.logs.append(params[5])
+        else:
+            raise AssertionError(f"Unexpected statement: {sql}")
+
+    def executemany(self, sql, rows):
+        if sql.startswith("INSERT INTO traffic_logs"):
+            self.db.logs.extend(row[5] for row in rows)
+            return
+        assert "count = count + VALUES(count)" in sql
+        for name, count in rows:
+            self.db.rollup[name] += count
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+    def start_transaction(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+def write(db, stats, predictions):
+    db.logs.extend(predictions)
+    stats.add_logs(predictions)
+
+def test_first_load_builds_the_rollup_from_a_full_count():
+    db = FakeDatabase(['Normal'] * 5 + ['smurf'] * 2, rollup={'Normal': 99})  # Stale pre-build rollup
+    stats = TrafficStats()
+    stats.load(db.connect())
+    assert stats.snapshot()['threat_distribution'] == {'Normal': 5, 'smurf': 2}
+    assert db.rollup == {'Normal': 5, 'smurf': 2}
+
+def test_processes_add_their_own_rows():
+    db = FakeDatabase(['Normal'] * 3)
+    dashboard, replay = TrafficStats(), TrafficStats()
+    dashboard.load(db.connect())
+    replay.load(db.connect())  # Already built: only reads
+    write(db, dashboard, ['Normal', 'smurf'])
+    write(db, replay, ['neptune'] * 4)
+    replay.persist(db.connect())
+    dashboard.persist(db.connect())
+
+    snapshot = dashboard.snapshot()
+    assert snapshot['threat_distribution'] == dict(Counter(db.logs))
+    assert snapshot['total_traffic'] == 9 and snapshot['malicious_count'] == 5
+    assert dashboard.pending == Counter()
+
+def test_rows_written_before_a_failed_load_are_not_counted_twice():
+    db = FakeDatabase(['Normal'] * 2)
+    stats = TrafficStats()
+    write(db, stats, ['Normal', 'Normal'])
+    stats.load(db.connect())
+    stats.persist(db.connect())
+    assert stats.snapshot()['threat_distribution'] == {'Normal': 4}
+
+def test_removed_partitions_are_subtracted_for_everyone():
+    db = FakeDatabase(['Normal'] * 6 + ['smurf'])
+    stats = TrafficStats()
+    stats.load(db.connect())
+    stats.remove_logs({'Normal': 6})
+    stats.persist(db.connect())
+    assert stats.snapshot()['threat_distribution'] == {'smurf': 1}
+    assert db.rollup['Normal'] == 0
+
+def test_blocked_count_follows_the_table():
+    db = FakeDatabase()
+    db.blocked = 3
+    stats = TrafficStats()
+    stats.load(db.connect())
+    stats.add_blocked()
+    assert stats.snapshot()['blocked_count'] == 4
+    db.blocked = 4
+    stats.persist(db.connect())
+    assert stats.snapshot()['blocked_count'] == 4
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeDatabase(['Normal'] * 2)
+    monkeypatch.setattr(database, 'traffic_stats', TrafficStats())
+    monkeypatch.setattr(database, 'log_writer', None)
+    monkeypatch.setattr(database, '_encode_row', lambda cursor, row: row)
+    monkeypatch.setattr(database, '_with_connection', lambda name, work: work(db.connect()))
+    return db
+
+def test_log_functions_load_the_stats_before_writing(fake_db):
+    database.log_traffic({'timestamp': None, 'src_ip': '10.0.0.1', 'dst_ip': '10.0.0.2', 'protocol': 'tcp',
+                          'service': 'http', 'prediction': 'smurf', 'confidence': 0.9, 'threat_level': 'High',
+                          'blocked': False})
+    assert fake_db.rollup == {'Normal': 2}  # Built before the insert
+    database.log_traffic_batch([(None, '10.0.0.1', '10.0.0.2', 'tcp', 'http', 'Normal', 0.5, 'Low', False)])
+    database.persist_stats()
+    assert database.get_stats()['threat_distribution'] == {'Normal': 3, 'smurf': 1}
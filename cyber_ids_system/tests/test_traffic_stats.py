@@ -0,0 +1,49 @@
+from traffic_stats import ConnectionStats, TRAFFIC_FEATURES
+from records import FEATURE_NAMES
+from sniffer import PacketSniffer
+from flows import SYN, ACK
+
+def test_time_window_counts_recent_connections_to_the_host():
+    stats = ConnectionStats(time_window=2.0, host_window=100)
+    stats.update(0.0, '10.0.0.2', 80, 'SF')
+    stats.update(1.0, '10.0.0.2', 80, 'S0')
+    features = stats.update(1.5, '10.0.0.2', 22, 'REJ')
+    assert features['count'] == 3
+    assert features['serror_rate'] == 0.33 and features['rerror_rate'] == 0.33
+    assert features['same_srv_rate'] == 0.33 and features['diff_srv_rate'] == 0.67
+
+    features = stats.update(3.2, '10.0.0.2', 80, 'SF')  # 0.0 and 1.0 left the window
+    assert features['count'] == 2
+    assert features['dst_host_count'] == 4
+
+def test_earlier_timestamps_do_not_move_the_window_back():
+    stats = ConnectionStats(time_window=2.0)
+    stats.update(100.0, '10.0.0.2', 80, 'SF')
+    stats.update(70.0, '10.0.0.3', 80, 'SF')  # A flow ending 30 s ago counts at 100.0
+    features = stats.update(101.0, '10.0.0.2', 80, 'SF')
+    assert features['count'] == 2 and features['srv_count'] == 3
+
+    features = stats.update(102.5, '10.0.0.3', 80, 'SF')
+    assert features['count'] == 1 and features['srv_count'] == 2
+
+def test_host_window_keeps_the_last_connections():
+    stats = ConnectionStats(host_window=3)
+    for n in range(5):
+        features = stats.update(float(n), '10.0.0.%d' % (n % 2), 80, 'SF', src_port=1000)
+    assert features['dst_host_count'] == 2 and features['dst_host_srv_count'] == 3
+    assert features['dst_host_same_src_port_rate'] == 1.0
+
+def test_update_returns_every_traffic_feature():
+    features = ConnectionStats().update(0.0, '10.0.0.2', 80, 'SF')
+    assert list(features) == list(TRAFFIC_FEATURES)
+    assert TRAFFIC_FEATURES[-1] == FEATURE_NAMES[-1]
+
+def test_flows_flushed_late_use_the_export_time():
+    sniffer = PacketSniffer(backend='pcap')
+    sniffer._handle_packet(0.0, '10.0.0.1', '10.0.0.2', 40000, 80, 'tcp', 'http', 60, 0, SYN)
+    sniffer._handle_packet(50.0, '10.0.0.3', '10.0.0.2', 40001, 80, 'tcp', 'http', 60, 0, ACK)
+    sniffer.stop()
+    records = [sniffer.get_packet() for _ in range(2)]
+    # The first flow ended at 0.0 but was exported at 50.0, together with the second
+    counts = sorted(int(record['features'][FEATURE_NAMES.index('count')]) for record in records)
+    assert counts == [1, 2]
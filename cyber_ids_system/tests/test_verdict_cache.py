@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+import detector
+from records import FEATURE_INDEX, NUM_FEATURES
+from verdict_cache import VerdictCache, quantize
+
+def row(**values):
+    features = np.zeros(NUM_FEATURES)
+    for name, value in values.items():
+        features[FEATURE_INDEX[name]] = value
+    return features
+
+def test_quantize_bins_near_identical_rows_together():
+    a, b = quantize([row(src_bytes=1000, serror_rate=0.51), row(src_bytes=1010, serror_rate=0.52)])
+    assert (a == b).all()
+    # Small counts and distinct categories stay apart
+    assert len({quantize([row(count=n)])[0].tobytes() for n in range(4)}) == 4
+    assert (quantize([row(service=3)]) != quantize([row(service=4)])).any()
+
+def test_ttl_expires_entries():
+    cache = VerdictCache(ttl=10.0)
+    cache.put_many([b'a'], ['verdict'], now=100.0)
+    assert cache.get_many([b'a'], now=110.0) == ['verdict']
+    assert cache.get_many([b'a'], now=110.5) == [None]
+    assert len(cache) == 0
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['expirations']) == (1, 1, 1)
+
+def test_ttl_counts_from_when_the_verdict_was_computed():
+    cache = VerdictCache(ttl=10.0)
+    cache.put_many([b'a'], ['verdict'], now=0.0)
+    for now in (4.0, 8.0):
+        assert cache.get_many([b'a'], now=now) == ['verdict']  # Hits do not refresh the entry
+    assert cache.get_many([b'a'], now=12.0) == [None]
+
+def test_lru_eviction_keeps_recently_used():
+    cache = VerdictCache(max_entries=2)
+    cache.put_many([b'a', b'b'], [1, 2], now=0.0)
+    cache.get_many([b'a'], now=0.0)
+    cache.put_many([b'c'], [3], now=0.0)
+    assert cache.get_many([b'a', b'b', b'c'], now=0.0) == [1, None, 3]
+    assert cache.get_stats()['evictions'] == 1
+
+def test_clear_invalidates():
+    cache = VerdictCache()
+    cache.put_many([b'a'], [1])
+    cache.clear()
+    assert cache.get_many([b'a']) == [None]
+    assert cache.get_stats()['invalidations'] == 1
+
+class Versioned:
+    def __init__(self, version):
+        self.version = version
+
+    def get(self, name):
+        return object()
+
+@pytest.fixture
+def scored(monkeypatch):
+    """Counts the rows that reach the models; every row scores Normal with 0.99."""
+    calls = []
+
+    def score_models(models, features, cascade, threshold):
+        calls.append(len(features))
+        n = len(features)
+        return np.zeros(n, dtype=np.int64), np.full(n, 0.99), np.zeros(n, dtype=np.int64), np.full(n, 0.99), \
+            np.zeros(n, dtype=bool)
+
+    monkeypatch.setattr(detector, '_score_models', score_models)
+    monkeypatch.setattr(detector, 'inference_pool', None)
+    monkeypatch.setattr(detector, 'models', Versioned('v1'))
+    monkeypatch.setattr(detector, 'verdict_cache', VerdictCache())
+    return calls
+
+def test_predict_batch_scores_only_cache_misses(scored, monkeypatch):
+    first = detector.predict_batch([row(src_bytes=500), row(src_bytes=90000)])
+    second = detector.predict_batch([row(src_bytes=505), row(src_bytes=7)])
+    assert scored == [2, 1]
+    assert [r['details']['tier'] for r in second] == ['cache', 'rf']
+    assert second[0]['prediction'] == first[0]['prediction']
+
+    # Verdicts of another model version are misses
+    monkeypatch.setattr(detector, 'models', Versioned('v2'))
+    third = detector.predict_batch([row(src_bytes=500)])
+    assert scored == [2, 1, 1]
+    assert third[0]['details']['model_version'] == 'v2'
+
+def test_use_cache_false_bypasses_the_cache(scored):
+    detector.predict_batch([row(src_bytes=500)])
+    detector.predict_batch([row(src_bytes=500)], use_cache=False)
+    assert scored == [1, 1]
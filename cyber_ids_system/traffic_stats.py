@@ -0,0 +1,145 @@
+from collections import deque
+
+from records import FEATURE_NAMES, FEATURE_INDEX
+
+# Columns ConnectionStats.update() returns (count .. dst_host_srv_rerror_rate), in FEATURE_NAMES order
+TRAFFIC_FEATURES = FEATURE_NAMES[FEATURE_INDEX['count']:]
+
+# KDD flag groups used by the *_serror_rate and *_rerror_rate features
+SYN_ERROR_FLAGS = {'S0', 'S1', 'S2', 'S3'}
+REJ_ERROR_FLAGS = {'REJ'}
+
+class _WindowCounters:
+    """Per-key connection counters (total, SYN errors, REJ errors) for one sliding window."""
+
+    def __init__(self):
+        self.total = {}
+        self.serror = {}
+        self.rerror = {}
+
+    def add(self, key, serror, rerror):
+        self.total[key] = self.total.get(key, 0) + 1
+        if serror:
+            self.serror[key] = self.serror.get(key, 0) + 1
+        if rerror:
+            self.rerror[key] = self.rerror.get(key, 0) + 1
+
+    def remove(self, key, serror, rerror):
+        _decrement(self.total, key)
+        if serror:
+            _decrement(self.serror, key)
+        if rerror:
+            _decrement(self.rerror, key)
+
+    def rates(self, key):
+        """Returns (count, serror_rate, rerror_rate) for a key."""
+        count = self.total.get(key, 0)
+        if count == 0:
+            return 0, 0.0, 0.0
+        return count, self.serror.get(key, 0) / count, self.rerror.get(key, 0) / count
+
+def _decrement(counter, key):
+    """Decrements a counter and drops the key at zero so idle keys do not accumulate."""
+    value = counter[key] - 1
+    if value:
+        counter[key] = value
+    else:
+        del counter[key]
+
+def _rate(part, whole):
+    return round(part / whole, 2) if whole else 0.0
+
+class ConnectionStats:
+    def __init__(self, time_window=2.0, host_window=100):
+        """
+        Streaming KDD traffic features, updated incrementally per connection.
+        :param time_window: Seconds covered by the time-based features (count, srv_count, ...).
+        :param host_window: Number of recent connections covered by the dst_host_* features.
+        """
+        self.time_window = time_window
+        self.host_window = host_window
+
+        # Time-based window: connections seen in the last `time_window` seconds
+        self._now = float('-inf')                # Latest timestamp seen; the window never moves back
+        self._recent = deque()
+        self._time_host = _WindowCounters()      # keyed by dst host
+        self._time_srv = _WindowCounters()       # keyed by service
+        self._time_host_srv = {}                 # keyed by (dst host, service)
+
+        # Host-based window: the last `host_window` connections
+        self._last = deque()
+        self._conn_host = _WindowCounters()
+        self._conn_srv = _WindowCounters()
+        self._conn_host_srv = {}
+        self._conn_srv_port = {}                 # keyed by (service, src port)
+
+    def _expire(self, now):
+        """Drops connections older than the time window (amortized O(1) per connection)."""
+        cutoff = now - self.time_window
+        while self._recent and self._recent[0][0] < cutoff:
+            _, dst, srv, serror, rerror = self._recent.popleft()
+            self._time_host.remove(dst, serror, rerror)
+            self._time_srv.remove(srv, serror, rerror)
+            _decrement(self._time_host_srv, (dst, srv))
+
+    def update(self, timestamp, dst_ip, service, flag, src_port=0):
+        """
+        Records one connection and returns its KDD time-based and host-based features.
+        :param timestamp: Connection time in seconds (e.g. flow export time); one earlier than a previous
+                          call counts as that time, keeping the window in order.
+        :param service: Service key of the connection (e.g. destination port).
+        :param flag: KDD connection flag (SF, S0, REJ, ...).
+        """
+        serror = flag in SYN_ERROR_FLAGS
+        rerror = flag in REJ_ERROR_FLAGS
+
+        # --- Time-based window (last 2 seconds) ---
+        timestamp = self._now = max(timestamp, self._now)
+        self._expire(timestamp)
+        self._recent.append((timestamp, dst_ip, service, serror, rerror))
+        self._time_host.add(dst_ip, serror, rerror)
+        self._time_srv.add(service, serror, rerror)
+        self._time_host_srv[(dst_ip, service)] = self._time_host_srv.get((dst_ip, service), 0) + 1
+
+        # --- Host-based window (last 100 connections) ---
+        if len(self._last) == self.host_window:
+            old_dst, old_srv, old_port, old_serror, old_rerror = self._last.popleft()
+            self._conn_host.remove(old_dst, old_serror, old_rerror)
+            self._conn_srv.remove(old_srv, old_serror, old_rerror)
+            _decrement(self._conn_host_srv, (old_dst, old_srv))
+            _decrement(self._conn_srv_port, (old_srv, old_port))
+        self._last.append((dst_ip, service, src_port, serror, rerror))
+        self._conn_host.add(dst_ip, serror, rerror)
+        self._conn_srv.add(service, serror, rerror)
+        self._conn_host_srv[(dst_ip, service)] = self._conn_host_srv.get((dst_ip, service), 0) + 1
+        self._conn_srv_port[(service, src_port)] = self._conn_srv_port.get((service, src_port), 0) + 1
+
+        count, serror_rate, rerror_rate = self._time_host.rates(dst_ip)
+        srv_count, srv_serror_rate, srv_rerror_rate = self._time_srv.rates(service)
+        same_srv = self._time_host_srv[(dst_ip, service)]
+
+        host_count, host_serror_rate, host_rerror_rate = self._conn_host.rates(dst_ip)
+        host_srv_count, host_srv_serror_rate, host_srv_rerror_rate = self._conn_srv.rates(service)
+        host_same_srv = self._conn_host_srv[(dst_ip, service)]
+
+        return {
+            'count': count,
+            'srv_count': srv_count,
+            'serror_rate': round(serror_rate, 2),
+            'srv_serror_rate': round(srv_serror_rate, 2),
+            'rerror_rate': round(rerror_rate, 2),
+            'srv_rerror_rate': round(srv_rerror_rate, 2),
+            'same_srv_rate': _rate(same_srv, count),
+            'diff_srv_rate': _rate(count - same_srv, count),
+            'srv_diff_host_rate': _rate(srv_count - same_srv, srv_count),
+            'dst_host_count': host_count,
+            'dst_host_srv_count': host_srv_count,
+            'dst_host_same_srv_rate': _rate(host_same_srv, host_count),
+            'dst_host_diff_srv_rate': _rate(host_count - host_same_srv, host_count),
+            'dst_host_same_src_port_rate': _rate(self._conn_srv_port[(service, src_port)], host_srv_count),
+            'dst_host_srv_diff_host_rate': _rate(host_srv_count - host_same_srv, host_srv_count),
+            'dst_host_serror_rate': round(host_serror_rate, 2),
+            'dst_host_srv_serror_rate': round(host_srv_serror_rate, 2),
+            'dst_host_rerror_rate': round(host_rerror_rate, 2),
+            'dst_host_srv_rerror_rate': round(host_srv_rerror_rate, 2)
+        }
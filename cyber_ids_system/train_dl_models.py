@@ -8,6 +8,9 @@ from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense, LSTM, Conv1D, MaxPooling1D, Flatten, Dropout
 import joblib
 import os
+from nn_runtime import export_keras_model
+from feature_encoder import save_vocabulary, KDD_TRAINING_DATA
+from artifacts import ArrayScaler
 
 # Set random seeds for reproducibility
 np.random.seed(42)
@@ -20,7 +23,7 @@ def create_directories():
 
 def load_and_preprocess_data():
     print("Loading KDDCup99 dataset...")
-    data = fetch_kddcup99(subset="SA", percent10=True, as_frame=True)
+    data = fetch_kddcup99(as_frame=True, **KDD_TRAINING_DATA)
     
     X = data.data
     y = data.target
@@ -30,8 +33,10 @@ def load_and_preprocess_data():
     
     # Encode categorical features
     print("Encoding features...")
+    encoders = {}
     for col in X.select_dtypes(include=["object"]).columns:
-        X.loc[:, col] = LabelEncoder().fit_transform(X[col])
+        encoders[col] = LabelEncoder()
+        X.loc[:, col] = encoders[col].fit_transform(X[col])
     
     # Encode labels
     # Map attack types to integers (Normal=0, Attack=1 for binary, or multi-class)
@@ -49,6 +54,8 @@ def load_and_preprocess_data():
     
     # Save scaler for app usage
     joblib.dump(scaler, "models/scaler_dl.pkl")
+    ArrayScaler.from_sklearn(scaler).save("models/scaler_dl")
+    save_vocabulary(encoders, "models/categorical_vocab_dl.pkl")
     
     # Reshape for DL models (samples, timesteps, features)
     # We treat the features as a sequence of 1 timestep
@@ -95,6 +102,8 @@ def train_models():
     cnn_model.fit(X_train, y_train, epochs=5, batch_size=64, validation_data=(X_test, y_test))
     cnn_model.save('models/cnn_ids_model.h5')
     print("✅ CNN Model saved to models/cnn_ids_model.h5")
+    export_keras_model('models/cnn_ids_model.h5', 'models/cnn_ids_model.npz')
+    print("✅ CNN weights exported to models/cnn_ids_model.npz and models/cnn_ids_model/")
     
     # Train LSTM
     lstm_model = build_lstm_model(input_shape, num_classes)
@@ -102,6 +111,8 @@ def train_models():
     lstm_model.fit(X_train, y_train, epochs=5, batch_size=64, validation_data=(X_test, y_test))
     lstm_model.save('models/lstm_ids_model.h5')
     print("✅ LSTM Model saved to models/lstm_ids_model.h5")
+    export_keras_model('models/lstm_ids_model.h5', 'models/lstm_ids_model.npz')
+    print("✅ LSTM weights exported to models/lstm_ids_model.npz and models/lstm_ids_model/")
 
 if __name__ == "__main__":
     train_models()
@@ -7,6 +7,9 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, confusion_matrix
 import joblib
 import os
+from feature_encoder import save_vocabulary, KDD_TRAINING_DATA
+from artifacts import ArrayScaler
+from forest import FlatForest
 
 def create_directories():
     dirs = ['models', 'logs', 'reports']
@@ -15,22 +18,25 @@ def create_directories():
 
 def load_dataset():
     print("Loading KDDCup99 dataset...")
-    data = fetch_kddcup99(subset="SA", percent10=True, as_frame=True)
+    data = fetch_kddcup99(as_frame=True, **KDD_TRAINING_DATA)
     
     X = data.data
     y = data.target
     
     X.columns = [col.replace(":", "_") for col in X.columns]
     
+    # Keep the fitted encoders: their vocabularies are persisted for the detector's FeatureEncoder
+    encoders = {}
     for col in X.select_dtypes(include=["object"]).columns:
-        X.loc[:, col] = LabelEncoder().fit_transform(X[col])
+        encoders[col] = LabelEncoder()
+        X.loc[:, col] = encoders[col].fit_transform(X[col])
     
     y = LabelEncoder().fit_transform(y)
     
-    return train_test_split(X, y, test_size=0.2, random_state=42)
+    return (*train_test_split(X, y, test_size=0.2, random_state=42), encoders)
 
 def federated_training(num_clients=3, rounds=5):
-    X_train, X_test, y_train, y_test = load_dataset()
+    X_train, X_test, y_train, y_test, encoders = load_dataset()
     
     scaler = StandardScaler()
     X_train_scaled = scaler.fit_transform(X_train)
@@ -75,11 +81,18 @@ def federated_training(num_clients=3, rounds=5):
     
     feature_names = X_train.columns.tolist()
     joblib.dump(feature_names, "models/feature_names.pkl")
+    save_vocabulary(encoders, "models/categorical_vocab.pkl")
+
+    # Memory-mappable copies the detector loads (shared between worker processes)
+    FlatForest.from_sklearn(global_model).save("models/fl_ids_model")
+    ArrayScaler.from_sklearn(scaler).save("models/scaler")
     
     print("\n✅ Model saved successfully!")
     print("   - models/fl_ids_model.pkl")
     print("   - models/scaler.pkl")
     print("   - models/feature_names.pkl")
+    print("   - models/categorical_vocab.pkl")
+    print("   - models/fl_ids_model/ and models/scaler/ (memory-mapped by the detector)")
     
     return global_model, scaler
 
@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from records import FEATURE_NAMES, CATEGORICAL_FEATURES
+
+# Rates in [0, 1] are binned linearly, everything else (bytes, counts, duration) logarithmically
+_RATE_COLUMNS = np.array([name.endswith('_rate') for name in FEATURE_NAMES])
+_EXACT_COLUMNS = np.array([name in CATEGORICAL_FEATURES for name in FEATURE_NAMES])
+
+def quantize(features, rate_step=0.05, log_bins_per_octave=4):
+    """
+    Maps feature rows to integer bins, so near-identical rows share a cache key.
+    Categorical codes stay exact; rates use rate_step-wide bins; other values use
+    log2 bins (log_bins_per_octave per doubling), which keeps 0, 1, 2, 3 distinct.
+    :param features: (N, 41) array in FEATURE_NAMES order.
+    :return: (N, 41) int64 array.
+    """
+    features = np.asarray(features, dtype=np.float64)
+    log_bins = np.sign(features) * np.floor(np.log2(1 + np.abs(features)) * log_bins_per_octave)
+    binned = np.where(_RATE_COLUMNS, np.round(features / rate_step), log_bins)
+    return np.where(_EXACT_COLUMNS, features, binned).astype(np.int64)
+
+class VerdictCache:
+    def __init__(self, max_entries=100000, ttl=60.0):
+        """
+        LRU + TTL cache of per-row model outputs, keyed by the quantized feature vector.
+        :param max_entries: Capacity; the least recently used entry is evicted beyond it.
+        :param ttl: Seconds a cached verdict stays valid after it was computed.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (stored_at, value), least recently used first
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def keys_for(features):
+        """One hashable key per row (the bytes of its quantized bins)."""
+        quantized = np.ascontiguousarray(quantize(features))
+        return [row.tobytes() for row in quantized]
+
+    def get_many(self, keys, now=None):
+        """
+        Looks up every key.
+        :return: List with the cached value, or None, per key.
+        """
+        now = time.monotonic() if now is None else now
+        results = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and now - entry[0] > self.ttl:
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+
+                if entry is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    results.append(entry[1])
+        return results
+
+    def put_many(self, keys, values, now=None):
+        """Stores one value per key, evicting least recently used entries beyond capacity."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            for key, value in zip(keys, values):
+                self._entries[key] = (now, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drops every entry (e.g. after the models were reloaded)."""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'capacity': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }